@@ -0,0 +1,72 @@
+"""
+Benchmark: fast EXIF header parser vs. Pillow's full _getexif decode.
+
+Generates a set of JPEG files carrying a realistic EXIF block and times
+reading DateTimeOriginal from each of them with both code paths.
+
+Usage:
+    python benchmarks/bench_exif.py [file_count] [repeats]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+from data.exif import read_exif_date, read_exif_date_pillow
+
+
+def generate_images(target_dir, count):
+    paths = []
+    for i in range(count):
+        exif = Image.Exif()
+        exif[0x010F] = 'Benchmark'                  # Make
+        exif[0x0110] = 'Camera %d' % (i % 7)       # Model
+        exif[0x0131] = 'photolist bench'           # Software
+        exif[0x010E] = 'x' * 512                   # ImageDescription, padding like real cameras
+        exif_ifd = exif.get_ifd(0x8769)
+        exif_ifd[0x9003] = '2019:%02d:%02d 12:00:00' % (i % 12 + 1, i % 28 + 1)
+        exif_ifd[0x9004] = exif_ifd[0x9003]        # DateTimeDigitized
+        exif_ifd[0x927C] = b'\x00' * 4096          # MakerNote blob
+        path = os.path.join(target_dir, 'img_%05d.jpg' % i)
+        Image.new('RGB', (320, 240), (i % 256, 64, 128)).save(path, exif=exif)
+        paths.append(path)
+    return paths
+
+
+def time_reader(reader, paths, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            reader(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(count=500, repeats=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_images(tmp, count)
+
+        # Sanity check: both paths must agree
+        for path in paths[:20]:
+            assert read_exif_date(path) == read_exif_date_pillow(path), path
+
+        fast = time_reader(read_exif_date, paths, repeats)
+        pillow = time_reader(read_exif_date_pillow, paths, repeats)
+
+    print(f"Files: {count}, best of {repeats}")
+    print(f"  Pillow _getexif : {pillow:.3f}s ({pillow / count * 1e6:.1f} us/file)")
+    print(f"  Fast parser     : {fast:.3f}s ({fast / count * 1e6:.1f} us/file)")
+    print(f"  Speedup         : {pillow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
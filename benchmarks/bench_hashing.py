@@ -0,0 +1,65 @@
+"""
+Benchmark: memory-mapped hashing vs. buffered reads, by file size.
+
+Writes one file per size and hashes it repeatedly through both paths of
+data.hashing.file_digest. The files stay in the page cache, so this measures
+the copy and call overhead of each path rather than the disk; the size where
+mmap starts winning is a sensible value for MMAP_THRESHOLD.
+
+Usage:
+    python benchmarks/bench_hashing.py [algorithm] [repeats]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.hashing import DEFAULT_HASH_ALGORITHM, file_digest
+
+SIZES_KB = (256, 1024, 4096, 16384, 65536)
+
+
+def time_digest(path, algorithm, mmap_threshold, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        file_digest(path, algorithm, mmap_threshold=mmap_threshold)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(algorithm=DEFAULT_HASH_ALGORITHM, repeats=5):
+    print(f"Algorithm: {algorithm}, best of {repeats}")
+    print(f"  {'size':>9}  {'buffered MB/s':>13}  {'mmap MB/s':>9}  {'mmap/buffered':>13}")
+    crossover = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_kb in SIZES_KB:
+            path = os.path.join(tmp, f'{size_kb}.bin')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size_kb * 1024))
+
+            # Sanity check: both paths must agree
+            assert file_digest(path, algorithm, mmap_threshold=None) == file_digest(path, algorithm, mmap_threshold=0)
+
+            buffered = time_digest(path, algorithm, None, repeats)
+            mapped = time_digest(path, algorithm, 0, repeats)
+            mb = size_kb / 1024
+            print(f"  {size_kb:>6} KB  {mb / buffered:>13.0f}  {mb / mapped:>9.0f}  {buffered / mapped:>12.2f}x")
+            if crossover is None and mapped < buffered:
+                crossover = size_kb
+
+    if crossover is None:
+        print("mmap was not faster at any measured size")
+    else:
+        print(f"mmap is faster from about {crossover} KB")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    main(args[0] if args else DEFAULT_HASH_ALGORITHM, *(int(a) for a in args[1:]))
@@ -0,0 +1,81 @@
+"""
+Benchmark: resident bytes per scanned file, old record layout vs. current.
+
+Builds the same synthetic scan (paths, sizes, modification times, MD5
+digests) twice and measures the growth of traced allocations: once with a
+replica of the original dict-based record (float date, copied filename, hex
+checksum) and once with data.ChecksumImageData. Path strings are created
+before tracing starts since both layouts share them.
+
+Usage:
+    python benchmarks/bench_memory.py [file_count]
+"""
+
+import hashlib
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.ChecksumImageData import ChecksumImageData
+
+
+class LegacyRecord:
+    """The record layout before __slots__: one __dict__ per file."""
+
+    def __init__(self, path, date, size, filename, exif_date, checksum, algorithm):
+        self.path = path
+        self.date = date
+        self.size = size
+        self.filename = filename
+        self.exif_date = exif_date
+        self._checksum = checksum
+        self.algorithm = algorithm
+
+
+def synthetic_scan(count):
+    """Inputs as they arrive from the workers: (path, mtime_ns, size, hex digest)."""
+    return [(f"/photos/{i // 1000:04d}/IMG_{i:07d}.JPG",
+             1_600_000_000_000_000_000 + i * 1_000_003,
+             2_000_000 + i,
+             hashlib.md5(i.to_bytes(8, 'little')).hexdigest())
+            for i in range(count)]
+
+
+def measure(build, inputs):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(inputs)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return (after - before) / len(inputs)
+
+
+def build_legacy(inputs):
+    # Workers used to send a float date and the digest as a fresh hex string
+    return [LegacyRecord(path, mtime_ns / 1e9, size, os.path.basename(path), None, bytes.fromhex(digest).hex(), 'md5')
+            for path, mtime_ns, size, digest in inputs]
+
+
+def build_compact(inputs):
+    return [ChecksumImageData(path, None, size, None, None, digest, 'md5', mtime_ns=mtime_ns)
+            for path, mtime_ns, size, digest in inputs]
+
+
+def main(count=200_000):
+    inputs = synthetic_scan(count)
+    legacy = measure(build_legacy, inputs)
+    compact = measure(build_compact, inputs)
+    print(f"{count} files, excluding the shared path strings")
+    print(f"  legacy __dict__ record: {legacy:7.1f} bytes/file")
+    print(f"  __slots__ record:       {compact:7.1f} bytes/file")
+    print(f"  saved:                  {legacy - compact:7.1f} bytes/file "
+          f"({(legacy - compact) * 5_000_000 / 2**20:.0f} MiB at 5M files)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -1,6 +1,7 @@
-import hashlib
 import os
+import sys
 from .ImageData import ImageData
+from .hashing import DEFAULT_HASH_ALGORITHM, file_digest, is_content_algorithm
 
 
 class ChecksumImageData(ImageData):
@@ -9,9 +10,15 @@ class ChecksumImageData(ImageData):
     
     This provides more accurate duplicate detection than metadata-based comparison,
     as it identifies files with identical content regardless of filename, date, or EXIF data.
+    
+    The digest is kept as raw bytes (16 bytes for MD5 instead of a 32-character
+    hex string); checksum still returns the hex form.
     """
     
-    def __init__(self, path=None, date=None, size=None, filename=None, exif_date=None, checksum=None):
+    __slots__ = ('_digest', 'algorithm')
+    
+    def __init__(self, path=None, date=None, size=None, filename=None, exif_date=None, checksum=None,
+                 algorithm=DEFAULT_HASH_ALGORITHM, mtime_ns=None):
         """
         Initialize ChecksumImageData.
         
@@ -21,74 +28,85 @@ class ChecksumImageData(ImageData):
             size: File size in bytes
             filename: Base filename
             exif_date: EXIF DateTimeOriginal if available
-            checksum: MD5 checksum of file content (calculated if None)
+            checksum: Hex digest of file content (calculated if None)
+            algorithm: Digest algorithm of the checksum (see data.hashing.HASH_ALGORITHMS),
+                or a content algorithm such as 'content-md5' (see data.content)
+            mtime_ns: File modification time in integer nanoseconds
         """
-        super().__init__(path, date, size, filename, exif_date)
+        super().__init__(path, date, size, filename, exif_date, mtime_ns)
         self._checksum = checksum
+        # Shared by every instance instead of one copy per unpickled worker result
+        self.algorithm = sys.intern(algorithm) if algorithm else algorithm
+    
+    @property
+    def _checksum(self):
+        """Hex checksum if already known (never calculates it)."""
+        digest = self._digest
+        return digest.hex() if isinstance(digest, bytes) else digest
+    
+    @_checksum.setter
+    def _checksum(self, value):
+        try:
+            self._digest = bytes.fromhex(value) if value is not None else None
+        except ValueError:
+            self._digest = value # Not hex, keep as is
         
     @property
     def checksum(self):
         """Get the checksum, calculating it if not already set."""
-        if self._checksum is None and self.path:
-            self._checksum = self.calculate_checksum(self.path)
+        if self._digest is None and self.path:
+            self._checksum = self.calculate_checksum(self.path, algorithm=self.algorithm)
         return self._checksum
     
     @staticmethod
-    def calculate_checksum(filepath, chunk_size=8192):
+    def calculate_checksum(filepath, chunk_size=None, algorithm=DEFAULT_HASH_ALGORITHM, cache=None):
         """
-        Calculate MD5 checksum of a file.
+        Calculate the checksum of a file.
         
         Args:
             filepath: Path to the file
-            chunk_size: Size of chunks to read (default 8KB for memory efficiency)
+            chunk_size: Unused, kept for backward compatibility (buffering is handled by data.hashing)
+            algorithm: Digest algorithm (default MD5)
+            cache: Optional ChecksumCache; unchanged files are answered from it without reading
             
         Returns:
-            MD5 checksum as hexadecimal string, or None if error
+            Checksum as hexadecimal string, or None if error
         """
         try:
-            md5_hash = hashlib.md5()
-            with open(filepath, 'rb') as f:
-                # Read file in chunks to handle large files efficiently
-                while chunk := f.read(chunk_size):
-                    md5_hash.update(chunk)
-            return md5_hash.hexdigest()
+            if cache is None:
+                return file_digest(filepath, algorithm)
+            # Stat before hashing: a file modified meanwhile gets a key that no longer matches
+            statinfo = os.stat(filepath)
+            checksum = cache.lookup(statinfo, algorithm)
+            if checksum is None:
+                checksum = file_digest(filepath, algorithm)
+                cache.store(filepath, statinfo, algorithm, checksum)
+            return checksum
         except Exception as e:
             print(f"Error calculating checksum for {filepath}: {e}")
             return None
     
-    def __eq__(self, other):
-        """
-        Compare based on checksum and size.
-        
-        Two images are considered equal if they have the same checksum and size.
-        This is more reliable than metadata-based comparison.
-        """
-        if not isinstance(other, ChecksumImageData):
-            return NotImplemented
-        elif self is other:
-            return True
-        else:
-            # Compare by checksum (content) and size
-            return (self.checksum == other.checksum and 
-                    self.size == other.size and 
-                    self.checksum is not None)
-    
-    def __hash__(self):
+    @property
+    def group_key(self):
         """
-        Hash based on checksum and size.
+        Key based on checksum and size.
         
-        This allows ChecksumImageData objects to be used as dictionary keys
-        and in sets, with duplicates being properly identified.
+        Two images are in one group if they have the same checksum and size.
+        This is more reliable than metadata-based comparison. The algorithm is
+        part of the key, so checksums from different algorithms never match.
+        Content digests ignore metadata, so their key leaves out the size.
+        Files without a checksum (unreadable, or never fully read by staged
+        detection) only match themselves; the key never reads the file.
         """
-        # Use checksum as primary hash component
-        if self.checksum:
-            return hash((self.checksum, self.size))
-        else:
-            # Fallback to parent class hash if checksum unavailable
-            return super().__hash__()
+        if self._digest is None:
+            return ('unhashed', self.path)
+        if is_content_algorithm(self.algorithm):
+            return (self.algorithm, self._digest)
+        return (self.algorithm, self._digest, self.size)
     
     def __str__(self):
         """String representation including checksum."""
         base_str = super().__str__()
-        checksum_str = self.checksum[:8] + "..." if self.checksum else "None"
+        checksum = self._checksum
+        checksum_str = checksum[:8] + "..." if checksum else "None"
         return f"{base_str}, checksum=[{checksum_str}]"
@@ -0,0 +1,490 @@
+import datetime
+import itertools
+import os
+from array import array
+from collections.abc import ItemsView, Mapping, Sequence, ValuesView
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .ImageData import ImageData
+from .ChecksumImageData import ChecksumImageData
+from .PerceptualImageData import PerceptualImageData
+from .ScanStats import ScanStats
+from .hashing import is_content_algorithm
+
+# Record kinds, i.e. which ImageData class a row converts back to
+KIND_METADATA = 0
+KIND_CHECKSUM = 1
+KIND_PERCEPTUAL = 2
+
+# Stands in for a missing size, mtime or EXIF timestamp
+MISSING = np.iinfo(np.int64).min
+# Stands in for a missing string pool id
+NO_STRING = -1
+
+_EXIF_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def record_dtype(digest_width):
+    """Row layout (little-endian, so it can be mapped from a file as is)."""
+    return np.dtype([('size', '<i8'), ('mtime_ns', '<i8'), ('exif_ts', '<i8'),
+                     ('dir_id', '<i4'), ('name_id', '<i4'), ('filename_id', '<i4'), ('exif_id', '<i4'),
+                     ('kind', 'u1'), ('digest_len', 'u1'), ('digest', 'u1', (digest_width,))])
+
+
+class StringPool:
+    """
+    Deduplicated strings (directories, file names, EXIF dates) in one UTF-8 blob.
+
+    String i is blob[offsets[i]:offsets[i + 1]]. The blob may be any buffer,
+    e.g. a slice of a memory-mapped file.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings):
+        """Pack a list of distinct strings."""
+        encoded = [s.encode('utf-8', 'surrogateescape') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(b''.join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8', 'surrogateescape')
+
+
+class ColumnarScanResult:
+    """
+    Array-backed alternative to ScanResult.
+
+    One row per scanned file, stored column-wise in a NumPy structured array:
+    size, mtime_ns, EXIF timestamp, record kind, digest and ids into a
+    StringPool for the directory, file name, filename override and EXIF text.
+    Groups are CSR-style offsets: the files of group g are rows
+    group_offsets[g]:group_offsets[g + 1] and the first row is the group's key.
+    A group of one row is a unique file.
+
+    Grouping is a lexsort over the key columns plus run detection, and counts
+    and aggregates are O(1) or single NumPy reductions instead of walks over
+    Python dicts. uniques and duplicates are read-only views that decode a
+    row into ImageData only when it is touched, so the result can be handed
+    to ResultsPanel, CopyService and ScanResultStorage unchanged, and a result
+    mapped from disk (see data.binary_format) opens without decoding anything.
+    """
+
+    def __init__(self, records, strings, group_offsets,
+                 scanned_paths: List[str], extension: str, detection_mode: str, timestamp: float = None,
+                 stats: Optional[ScanStats] = None, hash_algorithm: Optional[str] = None,
+                 hardlinks: Optional[Dict[str, Set[str]]] = None, perceptual_method: Optional[str] = None,
+                 directory_fingerprints: Optional[Dict[str, Tuple[int, int]]] = None,
+                 base_filtered: bool = False):
+        """
+        Use from_items or from_scan_result instead of calling this directly.
+
+        Args:
+            records: Structured array of record_dtype, one row per file, in group order
+            strings: StringPool referenced by the records' *_id columns
+            group_offsets: int64 array of group start rows, ending with the row count
+            scanned_paths, extension, detection_mode, timestamp, stats, hash_algorithm, hardlinks:
+                As in ScanResult
+            perceptual_method: Hash method of perceptual rows
+            directory_fingerprints, base_filtered: As in ScanResult
+        """
+        self.records = records
+        self.strings = strings
+        self.group_offsets = group_offsets
+        self.scanned_paths = scanned_paths
+        self.extension = extension
+        self.detection_mode = detection_mode
+        self.timestamp = timestamp if timestamp is not None else datetime.datetime.now().timestamp()
+        self.stats = stats
+        self.hash_algorithm = hash_algorithm
+        self.hardlinks = hardlinks if hardlinks is not None else {}
+        self.perceptual_method = perceptual_method
+        self.directory_fingerprints = directory_fingerprints if directory_fingerprints is not None else {}
+        self.base_filtered = base_filtered
+
+        self.group_sizes = np.diff(group_offsets)
+        self._duplicate_groups = int(np.count_nonzero(self.group_sizes > 1))
+        self._uniques = None
+        self._duplicates = None
+
+    @classmethod
+    def from_items(cls, items, scanned_paths, extension, detection_mode, timestamp=None, stats=None,
+                   hash_algorithm=None, hardlinks=None):
+        """
+        Group per-file ImageData records with a vectorized sort.
+
+        Files are grouped exactly as their group_key would group them, e.g. by
+        (digest, size) for checksums and by (EXIF date, size) or (filename,
+        mtime, size) for metadata. Within a group the input order is kept, so
+        the first item of each group becomes its key.
+
+        Args:
+            items: Iterable of ImageData (or subclasses), one per file
+            Others: As in ScanResult
+
+        Returns:
+            ColumnarScanResult
+        """
+        records, strings, method = cls._columns((img, img.path) for img in items)
+        count = len(records)
+        kind = records['kind']
+        hashed = kind != KIND_METADATA
+        meta = ~hashed
+        has_exif = meta & (records['exif_id'] != NO_STRING)
+        fs_match = meta & ~has_exif
+        unhashed = hashed & (records['digest_len'] == 0)
+        size_free = (kind == KIND_PERCEPTUAL) | ((kind == KIND_CHECKSUM) & is_content_algorithm(hash_algorithm))
+        # Pool ids are per distinct string, so equal filenames share an id
+        filename_ids = np.where(records['filename_id'] != NO_STRING, records['filename_id'], records['name_id'])
+
+        keys = [
+            kind.astype(np.int64),
+            np.where(unhashed, np.arange(1, count + 1), 0),  # unhashed files only match themselves
+            np.where(meta, records['exif_id'], NO_STRING),
+            np.where(fs_match, filename_ids, NO_STRING),
+            np.where(fs_match, records['mtime_ns'], 0),
+            np.where(size_free | unhashed, 0, records['size']),
+        ]
+        if records['digest'].shape[1]:
+            words = np.ascontiguousarray(records['digest']).view('>u8')
+            keys.extend(np.where(hashed, words[:, i], 0) for i in range(words.shape[1]))
+
+        # lexsort is stable and sorts by its last key first
+        order = np.lexsort(keys[::-1])
+        if count:
+            changed = np.zeros(count - 1, dtype=bool)
+            for key in keys:
+                column = key[order]
+                changed |= column[1:] != column[:-1]
+            starts = np.flatnonzero(np.concatenate(([True], changed)))
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        group_offsets = np.append(starts, count).astype('<i8')
+
+        return cls(records[order], strings, group_offsets, scanned_paths, extension, detection_mode,
+                   timestamp, stats, hash_algorithm, hardlinks, method)
+
+    @classmethod
+    def from_scan_result(cls, result):
+        """
+        Convert a ScanResult, keeping its groups as they are (including perceptual clusters).
+
+        Duplicate paths other than the key's share the key's columns, since the
+        object model keeps no per-file metadata for them.
+        """
+        if isinstance(result, ColumnarScanResult):
+            return result
+        groups = itertools.chain(((img, {img.path}) for img in result.uniques), result.duplicates.items())
+        return cls.from_groups(groups, result.scanned_paths, result.extension, result.detection_mode,
+                               result.timestamp, result.stats, result.hash_algorithm, result.hardlinks,
+                               result.directory_fingerprints, result.base_filtered)
+
+    @classmethod
+    def from_groups(cls, groups, scanned_paths, extension, detection_mode, timestamp=None, stats=None,
+                    hash_algorithm=None, hardlinks=None, directory_fingerprints=None, base_filtered=False):
+        """
+        Build a result from a stream of already formed groups, keeping them as they are.
+
+        Each group is packed into rows as it arrives and its ImageData is not
+        kept, so a stream such as ExternalGroupingIndex.iter_groups() becomes a
+        result in a single pass, holding only the compact columns. Paths other
+        than the key's share the key's columns. Memory still grows with the
+        number of files: one row each, and one pooled string per distinct file
+        name (a dict entry while building, its UTF-8 bytes afterwards).
+
+        Args:
+            groups: Iterable of (key ImageData, set of paths); one path for a unique file
+            Others: As in ScanResult
+
+        Returns:
+            ColumnarScanResult
+        """
+        builder = _ColumnBuilder()
+        starts = array('q')
+        for key, paths in groups:
+            starts.append(len(builder))
+            first = key.path if key.path in paths else min(paths)
+            builder.add(key, first)
+            for path in sorted(paths):
+                if path != first:
+                    builder.add(key, path)
+        starts.append(len(builder))
+        records, strings, method = builder.build()
+        return cls(records, strings, np.array(starts, dtype='<i8'), scanned_paths, extension, detection_mode,
+                   timestamp, stats, hash_algorithm, hardlinks, method, directory_fingerprints, base_filtered)
+
+    def to_scan_result(self):
+        """Convert back to the object model."""
+        from .ScanResult import ScanResult
+        return ScanResult(list(self.uniques), dict(self.duplicates.items()), self.scanned_paths, self.extension,
+                          self.detection_mode, self.timestamp, self.stats, self.hash_algorithm, self.hardlinks,
+                          self.directory_fingerprints, self.base_filtered)
+
+    @staticmethod
+    def _columns(pairs):
+        """Build the row columns and string pool from (ImageData, path) pairs."""
+        builder = _ColumnBuilder()
+        for img, path in pairs:
+            builder.add(img, path)
+        return builder.build()
+
+    def _string(self, string_id):
+        return self.strings[string_id] if string_id != NO_STRING else None
+
+    def path(self, row):
+        """Path of the file in the given row."""
+        record = self.records[row]
+        name = self.strings[record['name_id']]
+        if record['dir_id'] == NO_STRING:
+            return name
+        return os.path.join(self.strings[record['dir_id']], name)
+
+    def group_paths(self, group):
+        """Paths of all files of the given group, key first."""
+        return [self.path(row) for row in range(self.group_offsets[group], self.group_offsets[group + 1])]
+
+    def image_data(self, row):
+        """Build the ImageData (or subclass) of a row."""
+        record = self.records[row]
+        path = self.path(row)
+        size = int(record['size']) if record['size'] != MISSING else None
+        mtime_ns = int(record['mtime_ns']) if record['mtime_ns'] != MISSING else None
+        exif_date = self._string(record['exif_id'])
+        filename = self._string(record['filename_id'])
+        digest = record['digest'][:record['digest_len']].tobytes() if record['digest_len'] else None
+
+        if record['kind'] == KIND_PERCEPTUAL:
+            value = int.from_bytes(digest, 'big') if digest is not None else None
+            return PerceptualImageData(path, None, size, filename, exif_date, value, self.perceptual_method,
+                                       mtime_ns=mtime_ns)
+        if record['kind'] == KIND_CHECKSUM:
+            return ChecksumImageData(path, None, size, filename, exif_date,
+                                     digest.hex() if digest is not None else None, self.hash_algorithm,
+                                     mtime_ns=mtime_ns)
+        return ImageData(path, None, size, filename, exif_date, mtime_ns=mtime_ns)
+
+    @property
+    def uniques(self) -> Sequence:
+        """Unique files as a sequence of ImageData, decoded on access."""
+        if self._uniques is None:
+            self._uniques = _UniqueView(self)
+        return self._uniques
+
+    @property
+    def duplicates(self) -> Mapping:
+        """Duplicate groups as a mapping of key ImageData to paths, decoded on access."""
+        if self._duplicates is None:
+            self._duplicates = _DuplicateView(self)
+        return self._duplicates
+
+    @property
+    def total_files_scanned(self) -> int:
+        return len(self.records)
+
+    @property
+    def group_count(self) -> int:
+        return len(self.group_sizes)
+
+    @property
+    def duplicate_groups_count(self) -> int:
+        return self._duplicate_groups
+
+    @property
+    def unique_count(self) -> int:
+        return self.group_count - self._duplicate_groups
+
+    @property
+    def hardlink_count(self) -> int:
+        """Number of extra hardlink paths (not counted in total_files_scanned)."""
+        return sum(len(paths) for paths in self.hardlinks.values())
+
+    @property
+    def duplicate_file_count(self) -> int:
+        """Number of files that belong to a duplicate group."""
+        return int(self.group_sizes[self.group_sizes > 1].sum())
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of all scanned files."""
+        sizes = self.records['size']
+        return int(sizes[sizes != MISSING].sum())
+
+    @property
+    def reclaimable_bytes(self) -> int:
+        """Size of all duplicates beyond the first file of each group."""
+        extra = np.ones(len(self.records), dtype=bool)
+        extra[self.group_offsets[:-1]] = False
+        sizes = self.records['size']
+        return int(sizes[extra & (sizes != MISSING)].sum())
+
+
+class _ColumnBuilder:
+    """
+    Packs (ImageData, path) rows into compact typed arrays as they are added.
+
+    Only the column values are kept (plus one pool entry per distinct
+    string), never the ImageData, so rows can be streamed in without holding
+    the objects they came from.
+    """
+
+    def __init__(self):
+        self._pool = {}
+        self._sizes = array('q')
+        self._mtimes = array('q')
+        self._ids = array('i')  # dir, name, filename and EXIF ids of each row
+        self._kinds = array('B')
+        self._digest_lens = array('B')
+        self._digests = bytearray()
+        self.method = None
+
+    def _string_id(self, text):
+        if text is None:
+            return NO_STRING
+        return self._pool.setdefault(text, len(self._pool))
+
+    def add(self, img, path):
+        directory, name = os.path.split(path)
+        if os.path.join(directory, name) != path:
+            directory, name = None, path  # not rebuilt exactly by a join, keep it whole
+        filename = img.filename
+        if filename == os.path.basename(path):
+            filename = None
+        self._ids.extend((self._string_id(directory), self._string_id(name), self._string_id(filename),
+                          self._string_id(img.exif_date or None)))
+        if isinstance(img, PerceptualImageData):
+            self.method = img.method
+            value = img.perceptual_hash
+            digest = value.to_bytes(8, 'big') if value is not None else b''
+            kind = KIND_PERCEPTUAL
+        elif isinstance(img, ChecksumImageData):
+            # Non-hex checksums are kept by their UTF-8 bytes
+            digest = img._digest
+            digest = digest.encode('utf-8') if isinstance(digest, str) else digest or b''
+            kind = KIND_CHECKSUM
+        else:
+            digest = b''
+            kind = KIND_METADATA
+        self._sizes.append(img.size if img.size is not None else MISSING)
+        self._mtimes.append(img.mtime_ns if img.mtime_ns is not None else MISSING)
+        self._kinds.append(kind)
+        self._digest_lens.append(len(digest))
+        self._digests += digest
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def build(self):
+        """Return (records, StringPool, perceptual method) of all rows added."""
+        count = len(self)
+        lens = np.array(self._digest_lens, dtype=np.int64)
+        # Digests are padded to whole 64-bit words so they can be compared as integers
+        width = -(-int(lens.max(initial=0)) // 8) * 8
+        records = np.zeros(count, dtype=record_dtype(width))
+        records['size'] = np.array(self._sizes, dtype=np.int64)
+        records['mtime_ns'] = np.array(self._mtimes, dtype=np.int64)
+        if count:
+            id_columns = np.array(self._ids, dtype=np.int32).reshape(count, 4)
+            for i, field in enumerate(('dir_id', 'name_id', 'filename_id', 'exif_id')):
+                records[field] = id_columns[:, i]
+        records['kind'] = np.array(self._kinds, dtype=np.uint8)
+        records['digest_len'] = lens
+        if width and count:
+            # Scatter the concatenated digests into their rows
+            blob = np.frombuffer(bytes(self._digests), dtype=np.uint8)
+            starts = np.cumsum(lens) - lens
+            rows = np.repeat(np.arange(count), lens)
+            columns = np.arange(len(blob)) - np.repeat(starts, lens)
+            records['digest'][rows, columns] = blob
+
+        strings = list(self._pool)
+        # Parse each distinct EXIF text once
+        exif_ids = records['exif_id']
+        timestamps = np.full(len(strings) + 1, MISSING, dtype=np.int64)  # index -1 stays MISSING
+        for string_id in np.unique(exif_ids[exif_ids != NO_STRING]).tolist():
+            timestamps[string_id] = _exif_timestamp(strings[string_id])
+        records['exif_ts'] = timestamps[exif_ids]
+        return records, StringPool.build(strings), self.method
+
+
+class _UniqueView(Sequence):
+    """Single-file groups of a ColumnarScanResult as ImageData."""
+
+    def __init__(self, result):
+        self._result = result
+        self._groups = np.flatnonzero(result.group_sizes == 1)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._result.image_data(self._result.group_offsets[self._groups[i]])
+
+    def __eq__(self, other):
+        return isinstance(other, (Sequence, list)) and list(self) == list(other)
+
+
+class _DuplicateView(Mapping):
+    """Multi-file groups of a ColumnarScanResult as key ImageData -> set of paths."""
+
+    def __init__(self, result):
+        self._result = result
+        self._groups = np.flatnonzero(result.group_sizes > 1)
+        self._by_key = None
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __iter__(self):
+        result = self._result
+        return (result.image_data(result.group_offsets[group]) for group in self._groups)
+
+    def items(self):
+        """ItemsView of (key ImageData, set of paths); each iteration decodes the groups again."""
+        return _DuplicateItems(self)
+
+    def values(self):
+        return _DuplicateValues(self)
+
+    def __getitem__(self, key):
+        if self._by_key is None:
+            # Built on the first lookup only; iteration never needs it
+            result = self._result
+            self._by_key = {result.image_data(result.group_offsets[g]).group_key: g for g in self._groups}
+        return set(self._result.group_paths(self._by_key[key.group_key]))
+
+
+class _DuplicateItems(ItemsView):
+    """items() of a _DuplicateView, decoding each group's key and paths in one step."""
+
+    def __iter__(self):
+        result = self._mapping._result
+        for group in self._mapping._groups:
+            yield result.image_data(result.group_offsets[group]), set(result.group_paths(group))
+
+
+class _DuplicateValues(ValuesView):
+    """values() of a _DuplicateView, decoding only the paths."""
+
+    def __iter__(self):
+        result = self._mapping._result
+        return (set(result.group_paths(group)) for group in self._mapping._groups)
+
+
+def _exif_timestamp(text):
+    """EXIF date string as Unix seconds (taken as UTC), or MISSING if it does not parse."""
+    try:
+        dt = datetime.datetime.strptime(text, _EXIF_FORMAT)
+    except (TypeError, ValueError):
+        return MISSING
+    return int(dt.replace(tzinfo=datetime.timezone.utc).timestamp())
@@ -0,0 +1,50 @@
+import os
+import threading
+
+
+class DirectoryFingerprints:
+    """
+    Thread-safe record of directory fingerprints (mtime_ns, entry count) taken during a walk.
+
+    Compared with the fingerprints of a previous scan, it tells the walker which
+    directories are unchanged, so their files are neither stat'ed nor processed
+    again and the previous scan's items for them can be carried over.
+
+    A directory's mtime changes when an entry is added, removed or renamed in
+    it, but not when something changes further down the tree, so the
+    subdirectories of an unchanged directory are still listed. Files rewritten
+    in place keep their directory's mtime and are not noticed.
+    """
+
+    def __init__(self, previous=None):
+        """
+        Args:
+            previous: Optional mapping of directory path -> (mtime_ns, entry count) from an earlier scan
+        """
+        self.previous = {path: tuple(fingerprint) for path, fingerprint in (previous or {}).items()}
+        self.current = {}  # directory path -> (mtime_ns, entry count) of this walk
+        self.unchanged = set()  # directories whose fingerprint matches the previous scan
+        self._lock = threading.Lock()
+
+    def check(self, dir_path, entry_count):
+        """
+        Record the fingerprint of a directory that was just listed.
+
+        Args:
+            dir_path: Absolute path of the directory
+            entry_count: Number of entries the listing returned
+
+        Returns:
+            True if the directory is unchanged since the previous scan
+        """
+        try:
+            # Taken after the listing: an entry added in between changes the next fingerprint
+            fingerprint = (os.stat(dir_path).st_mtime_ns, entry_count)
+        except OSError:
+            return False
+        unchanged = self.previous.get(dir_path) == fingerprint
+        with self._lock:
+            self.current[dir_path] = fingerprint
+            if unchanged:
+                self.unchanged.add(dir_path)
+        return unchanged
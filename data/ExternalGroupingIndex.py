@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import os
+import pickle
+import tempfile
+import threading
+from operator import itemgetter
+
+
+class ExternalGroupingIndex:
+    """
+    GroupingIndex that spills to disk, for collections larger than RAM.
+
+    Files are buffered as (key, path, ImageData) records. Whenever the buffer
+    exceeds the memory budget it is sorted by key and written to a temporary
+    run file, so memory use stays bounded however many files are added.
+    Iterating merges all runs (an external merge sort) and emits one group at
+    a time, so duplicate groups can be consumed as a stream without ever
+    holding the whole index in memory.
+
+    Buffered records each hold their file's ImageData, but when a run is
+    written only the first record of each key keeps it; the other records
+    of the group are written as bare paths. The interface matches
+    GroupingIndex, so it can be passed wherever a shared index is accepted.
+    Records must all be added before iterating.
+    """
+
+    DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+    # Rough cost of a buffered record on top of the key and path strings (tuple, ImageData, list slot)
+    RECORD_OVERHEAD = 200
+    # Records per pickled chunk in a run file
+    CHUNK_RECORDS = 4096
+    # Runs merged at once; more runs are first merged into larger runs
+    MAX_MERGE_FANIN = 64
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None):
+        """
+        Args:
+            memory_budget: Approximate bytes of buffered records before a run is written
+            spill_dir: Directory for the temporary run files (system default if None)
+        """
+        self.memory_budget = memory_budget
+        self._tmp = tempfile.TemporaryDirectory(prefix='dedup-runs-', dir=spill_dir)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._runs = []
+        self._count = 0
+        self.spilled_runs = 0
+
+    def add(self, img_data, paths=None):
+        """
+        Insert one file (or an already formed group).
+
+        Args:
+            img_data: ImageData describing the file; it becomes the group key if
+                      its record is the first of the group
+            paths: Optional iterable of paths belonging to img_data's group
+                   (defaults to img_data.path)
+        """
+        key = repr(img_data.group_key)
+        paths = [img_data.path] if paths is None else list(paths)
+        with self._lock:
+            for i, path in enumerate(paths):
+                self._buffer.append((key, path, img_data if i == 0 else None))
+                self._buffer_bytes += len(key) + len(path) + self.RECORD_OVERHEAD
+            self._count += len(paths)
+            if self._buffer_bytes > self.memory_budget:
+                self._spill()
+
+    def _spill(self):
+        """Sort the buffer and write it out as a run (lock held)."""
+        self._buffer.sort(key=itemgetter(0))
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+        self._buffer_bytes = 0
+        self.spilled_runs += 1
+
+    def _write_run(self, records):
+        """Write key-ordered records, dropping the ImageData of all but the first record of a key."""
+        fd, run_path = tempfile.mkstemp(suffix='.run', dir=self._tmp.name)
+        with os.fdopen(fd, 'wb') as f:
+            chunk = []
+            previous = None
+            for key, path, img_data in records:
+                chunk.append((key, path, img_data if key != previous else None))
+                previous = key
+                if len(chunk) == self.CHUNK_RECORDS:
+                    pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+                    chunk = []
+            if chunk:
+                pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+        return run_path
+
+    @staticmethod
+    def _read_run(run_path):
+        with open(run_path, 'rb') as f:
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    return
+                yield from chunk
+
+    def _merged_records(self):
+        """All records in key order, merging at most MAX_MERGE_FANIN runs at once."""
+        with self._lock:
+            while len(self._runs) > self.MAX_MERGE_FANIN:
+                batch, self._runs = self._runs[:self.MAX_MERGE_FANIN], self._runs[self.MAX_MERGE_FANIN:]
+                merged = heapq.merge(*(self._read_run(run) for run in batch), key=itemgetter(0))
+                self._runs.append(self._write_run(merged))
+                for run in batch:
+                    os.remove(run)
+            self._buffer.sort(key=itemgetter(0))
+            sources = [self._read_run(run) for run in self._runs] + [iter(list(self._buffer))]
+        # heapq.merge is stable, so a key's first record (the one with ImageData) stays first
+        return heapq.merge(*sources, key=itemgetter(0))
+
+    def iter_groups(self):
+        """
+        Stream all groups in key order.
+
+        Yields:
+            Tuples of (key ImageData, set of paths)
+        """
+        for _, records in itertools.groupby(self._merged_records(), key=itemgetter(0)):
+            first = next(records)
+            paths = {first[1]}
+            paths.update(record[1] for record in records)
+            yield first[2], paths
+
+    def iter_duplicates(self):
+        """Stream only the multi-file groups, as (key ImageData, set of paths)."""
+        return ((img_data, paths) for img_data, paths in self.iter_groups() if len(paths) > 1)
+
+    def uniques(self):
+        """Return a list of the ImageData of all single-file groups."""
+        return [img_data for img_data, paths in self.iter_groups() if len(paths) == 1]
+
+    def duplicates(self):
+        """Return a dict mapping the key ImageData of every multi-file group to its paths."""
+        return dict(self.iter_duplicates())
+
+    def __len__(self):
+        """Number of files in the index."""
+        with self._lock:
+            return self._count
+
+    def close(self):
+        """Delete the run files."""
+        self._tmp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,100 @@
+import threading
+
+
+class GroupingIndex:
+    """
+    Thread-safe, sharded index grouping scanned files by their group_key.
+
+    Every producer inserts results as they arrive, so files from all scanned
+    folders end up grouped in one place and no merge phase is needed at the end
+    of a scan. Each file is stored once: a group with a single file keeps just
+    its ImageData, and only groups that turn out to be duplicates get a set of
+    paths. The unique and duplicate views are computed on demand.
+
+    Groups are looked up by the plain key tuples, computed once per insert, so
+    dict probes never call back into ImageData.__eq__. Shards have their own
+    lock, so concurrent inserts only contend when their keys land in the same
+    shard.
+    """
+
+    DEFAULT_SHARD_COUNT = 16
+
+    def __init__(self, shard_count=DEFAULT_SHARD_COUNT):
+        """
+        Args:
+            shard_count: Number of independently locked shards
+        """
+        self._shards = [({}, threading.Lock()) for _ in range(shard_count)]
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def add(self, img_data, paths=None):
+        """
+        Insert one file (or an already formed group) into its group.
+
+        Args:
+            img_data: ImageData describing the file; it becomes the group key if
+                      the group is new
+            paths: Optional iterable of paths belonging to img_data's group
+                   (defaults to img_data.path)
+        """
+        paths = None if paths is None else set(paths)
+        key = img_data.group_key
+        groups, lock = self._shard(key)
+        with lock:
+            entry = groups.get(key)
+            if entry is None:
+                # First file of the group: the object itself is the entry, its path is implied
+                groups[key] = img_data if paths is None or paths == {img_data.path} else [img_data, paths]
+            elif isinstance(entry, list):
+                entry[1].update(paths if paths is not None else (img_data.path,))
+            else:
+                groups[key] = [entry, {entry.path} | (paths if paths is not None else {img_data.path})]
+
+    def uniques(self):
+        """Return a list of the ImageData of all single-file groups."""
+        result = []
+        for groups, lock in self._shards:
+            with lock:
+                result.extend(entry if not isinstance(entry, list) else entry[0]
+                              for entry in groups.values()
+                              if not isinstance(entry, list) or len(entry[1]) == 1)
+        return result
+
+    def duplicates(self):
+        """
+        Return a dict mapping the key ImageData of every multi-file group to its paths.
+
+        The path sets are the index's own, so no group is copied.
+        """
+        result = {}
+        for groups, lock in self._shards:
+            with lock:
+                result.update((entry[0], entry[1]) for entry in groups.values()
+                              if isinstance(entry, list) and len(entry[1]) > 1)
+        return result
+
+    def iter_groups(self):
+        """
+        Stream all groups, one shard at a time (as ExternalGroupingIndex.iter_groups).
+
+        Yields:
+            Tuples of (key ImageData, set of paths)
+        """
+        for groups, lock in self._shards:
+            with lock:
+                entries = list(groups.values())
+            for entry in entries:
+                if isinstance(entry, list):
+                    yield entry[0], entry[1]
+                else:
+                    yield entry, {entry.path}
+
+    def __len__(self):
+        """Number of files in the index."""
+        count = 0
+        for groups, lock in self._shards:
+            with lock:
+                count += sum(len(entry[1]) if isinstance(entry, list) else 1 for entry in groups.values())
+        return count
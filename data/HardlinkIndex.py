@@ -0,0 +1,116 @@
+import os
+import threading
+
+
+class HardlinkIndex:
+    """
+    Thread-safe registry of file identities (st_dev, st_ino) seen during a scan.
+
+    The first path found for an inode becomes its primary path and is the only
+    one that gets opened, parsed and hashed. Further hardlinks to the same inode
+    are recorded under the primary path instead of being reported as copies, so
+    they neither cost I/O nor count as reclaimable space.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._primary = {}
+        self._identities = {}  # path -> identity, for every claimed hardlinked path
+        self.links = {}  # primary path -> set of further hardlinked paths
+
+    def claim(self, abs_path, statinfo):
+        """
+        Register a path and decide whether it has to be processed.
+
+        Args:
+            abs_path: Absolute path of the file
+            statinfo: os.stat_result of the file (or None)
+
+        Returns:
+            True if the path must be processed, False if it is another hardlink
+            to an inode that was already claimed
+        """
+        # st_ino is 0 where the platform does not report stable inode numbers
+        if statinfo is None or statinfo.st_nlink <= 1 or not statinfo.st_ino:
+            return True
+
+        identity = (statinfo.st_dev, statinfo.st_ino)
+        with self._lock:
+            self._identities[abs_path] = identity
+            primary = self._primary.setdefault(identity, abs_path)
+            if primary == abs_path:
+                return True
+            self.links.setdefault(primary, set()).add(abs_path)
+            return False
+
+    def release(self, abs_path):
+        """
+        Forget a path that was removed (for a watch mode keeping results current).
+
+        A removed link is dropped from its primary's links. When a primary is
+        removed, one of its remaining links takes its place; with no links left
+        the identity is forgotten, so a new file on the same inode is claimed again.
+
+        Args:
+            abs_path: Absolute path of the removed file
+
+        Returns:
+            The link promoted to primary, which now has to be processed, or None
+        """
+        with self._lock:
+            identity = self._identities.pop(abs_path, None)
+            if identity is None:
+                return None
+            primary = self._primary[identity]
+            if primary != abs_path:
+                links = self.links.get(primary)
+                if links is not None:
+                    links.discard(abs_path)
+                    if not links:
+                        del self.links[primary]
+                return None
+            links = self.links.pop(abs_path, set())
+            if not links:
+                del self._primary[identity]
+                return None
+            successor = min(links)
+            links.discard(successor)
+            self._primary[identity] = successor
+            if links:
+                self.links[successor] = links
+            return successor
+
+    def primary_of(self, abs_path, statinfo):
+        """
+        Primary path of the identity a claimed path belongs to.
+
+        Args:
+            abs_path: Absolute path of the file
+            statinfo: Current os.stat_result of the file
+
+        Returns:
+            The primary path (abs_path itself for a primary), or None if the path
+            was not claimed or now is another file
+        """
+        with self._lock:
+            identity = self._identities.get(abs_path)
+            if identity is None or identity != (statinfo.st_dev, statinfo.st_ino):
+                return None
+            return self._primary[identity]
+
+    def paths_under(self, top):
+        """List the claimed hardlinked paths that are top itself or lie below it."""
+        prefix = os.path.join(top, '')
+        with self._lock:
+            return [path for path in self._identities if path == top or path.startswith(prefix)]
+
+    def __contains__(self, abs_path):
+        """True if abs_path was claimed as one of several hardlinks to a file."""
+        with self._lock:
+            return abs_path in self._identities
+
+    @property
+    def link_count(self):
+        """Number of skipped hardlink paths."""
+        with self._lock:
+            return sum(len(paths) for paths in self.links.values())
@@ -1,10 +1,13 @@
-import glob
 import os
 import sys
-import concurrent.futures
+import queue
 from functools import reduce
-from PIL import Image, UnidentifiedImageError
-from PIL.ExifTags import TAGS
+from PIL import Image
+from .hashing import DEFAULT_HASH_ALGORITHM
+from .GroupingIndex import GroupingIndex
+from .HardlinkIndex import HardlinkIndex
+from .workers import ScanExecutor, extract_record
+from .walker import entry_stat, normalize_extensions, walk_files
 
 # Disable DecompressionBombWarning
 Image.MAX_IMAGE_PIXELS = None
@@ -12,24 +15,23 @@ Image.MAX_IMAGE_PIXELS = None
 class ProcessingCancelled(Exception):
     pass
 
-def collect_paths(root_dir, ext, visited_paths, controller=None):
-    paths = []
-    path_mask = root_dir + '/**/*.' + ext
+def collect_paths(root_dir, ext, visited_dirs, controller=None):
+    """
+    Collect absolute paths of all files under root_dir matching the extension(s).
+
+    Args:
+        root_dir: Root directory to scan
+        ext: File extension (string) or list of extensions to match
+        visited_dirs: Set of absolute directory paths already walked; updated in place
+        controller: Optional GuiRunController for pause/cancel support
+
+    Returns:
+        List of absolute file paths
+    """
     print(f"Scanning root: {root_dir}")
-    for path in glob.iglob(path_mask, recursive=True):
-        if controller:
-            controller.check()
-            
-        abs_path = os.path.abspath(path)
-        if not os.path.isfile(abs_path):
-            continue
-        if abs_path in visited_paths:
-            continue
-        visited_paths.add(abs_path)
-        paths.append(abs_path)
-    return paths
-
-def process_image(abs_path, controller=None, use_checksum=False):
+    return [entry.path for entry in walk_files(root_dir, ext, visited_dirs, controller)]
+
+def process_image(abs_path, controller=None, use_checksum=False, statinfo=None):
     """
     Process an image file and create ImageData or ChecksumImageData object.
     
@@ -37,143 +39,312 @@ def process_image(abs_path, controller=None, use_checksum=False):
         abs_path: Absolute path to the image file
         controller: Optional GuiRunController for pause/cancel support
         use_checksum: If True, create ChecksumImageData with content hash
+        statinfo: Optional os.stat_result already known for the file (e.g. from the walker)
         
     Returns:
         ImageData or ChecksumImageData object, or None if processing fails
     """
-    if controller:
-        controller.check()
+    stat_fields = (statinfo.st_mtime_ns, statinfo.st_size) if statinfo is not None else None
+    return image_data_from_record(extract_record(abs_path, stat_fields, controller=controller), use_checksum)
+
+def image_data_from_record(record, use_checksum=False, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Build ImageData or ChecksumImageData from a worker record tuple.
+    
+    Args:
+        record: Tuple (path, mtime_ns, size, exif_date, checksum, ...) as returned by extract_record, or None
+        use_checksum: If True, create ChecksumImageData (checksum stays lazy if the record has none)
+        hash_algorithm: Digest algorithm of the record's checksum
         
-    try:
-        with Image.open(abs_path) as img:
-            exif_date = None
-            try:
-                exif_data = img._getexif()
-                if exif_data:
-                    for tag, value in exif_data.items():
-                        if TAGS.get(tag) == 'DateTimeOriginal':
-                            exif_date = value
-                            break
-            except Exception:
-                pass # EXIF extraction failed, treat as None
-
-            statinfo = os.stat(abs_path)
-            
-            if use_checksum:
-                # Import here to avoid circular dependency
-                from .ChecksumImageData import ChecksumImageData
-                return ChecksumImageData(abs_path, statinfo.st_mtime, statinfo.st_size, 
-                                        os.path.basename(abs_path), exif_date)
-            else:
-                return ImageData(abs_path, statinfo.st_mtime, statinfo.st_size, 
-                               os.path.basename(abs_path), exif_date)
-    except UnidentifiedImageError:
-        return None # Not a valid image
-    except Exception as e:
-        print(f"Error processing {abs_path}: {e}")
+    Returns:
+        ImageData or ChecksumImageData object, or None if record is None
+    """
+    if record is None:
+        return None
+    path, mtime_ns, size, exif_date, checksum = record[:5]
+    if use_checksum:
+        # Import here to avoid circular dependency
+        from .ChecksumImageData import ChecksumImageData
+        return ChecksumImageData(path, None, size, None, exif_date, checksum, hash_algorithm, mtime_ns=mtime_ns)
+    return ImageData(path, None, size, None, exif_date, mtime_ns=mtime_ns)
+
+def _to_mtime_ns(date):
+    """Convert a modification date in seconds (int or float) to integer nanoseconds."""
+    if date is None:
         return None
+    if isinstance(date, int):
+        return date * 1_000_000_000
+    return round(date * 1e9)
+
 # ChecksumImageData subclass is imported inside process_image to avoid circular imports
 class ImageData:
-    def __init__(self, path=None, date=None, size=None, filename=None, exif_date=None):
+    """
+    Metadata of one scanned file.
+    
+    Millions of these are alive during a large scan, so the layout is compact:
+    __slots__ instead of a per-object __dict__, the modification time as an
+    integer mtime_ns, and no separate filename string when it is just the last
+    component of path (see benchmarks/bench_memory.py).
+    """
+    
+    __slots__ = ('path', 'size', 'exif_date', 'mtime_ns', '_filename')
+    
+    def __init__(self, path=None, date=None, size=None, filename=None, exif_date=None, mtime_ns=None):
+        """
+        Args:
+            path: File path
+            date: File modification date in seconds (ignored if mtime_ns is given)
+            size: File size in bytes
+            filename: Base filename (derived from path if None)
+            exif_date: EXIF DateTimeOriginal if available
+            mtime_ns: File modification time in integer nanoseconds (e.g. st_mtime_ns)
+        """
         self.path = path
-        self.date = date
         self.size = size
-        self.filename = filename
         self.exif_date = exif_date
+        self.mtime_ns = mtime_ns if mtime_ns is not None else _to_mtime_ns(date)
+        self.filename = filename
+
+    @property
+    def date(self):
+        """Modification date in seconds since the epoch (float)."""
+        return self.mtime_ns / 1e9 if self.mtime_ns is not None else None
+
+    @date.setter
+    def date(self, value):
+        self.mtime_ns = _to_mtime_ns(value)
+
+    @property
+    def filename(self):
+        """Base filename, sliced from path unless it was set to something else."""
+        if self._filename is not None or self.path is None:
+            return self._filename
+        return os.path.basename(self.path)
+
+    @filename.setter
+    def filename(self, value):
+        # Only keep a separate string when it differs from the path's last component
+        if value is not None and self.path is not None and value == os.path.basename(self.path):
+            value = None
+        self._filename = value
+
+    @property
+    def group_key(self) -> tuple:
+        """
+        Immutable key identifying the group this file belongs to.
+        
+        Grouping (see GroupingIndex) runs on these tuples directly, and __eq__ and
+        __hash__ are both defined by it, so they always agree. Subclasses for
+        other detection modes override only this property.
+        """
+        # With an EXIF date, renamed copies still match: date + size identify the shot
+        if self.exif_date:
+            return ('exif', self.exif_date, self.size)
+        # Fallback to loose filename/date match if EXIF missing
+        return ('fs', self.filename, self.mtime_ns, self.size)
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, ImageData):
             return NotImplemented
-        elif self is other:
-            return True
-        else:
-            # If both have EXIF date, prioritize that for equality check alongside size
-            if self.exif_date and other.exif_date:
-                 return self.exif_date == other.exif_date and self.size == other.size
-            
-            # Fallback to loose filename/date match if EXIF missing
-            return self.filename == other.filename and self.date == other.date and self.size == other.size
+        return self is other or self.group_key == other.group_key
 
     def __str__(self):
         return 'file:[' + self.filename + '], path:[' + self.path + '], date=[' + str(self.date) + '], size=[' + str(
             self.size) + '], exif_date=[' + str(self.exif_date) + ']'
 
     def __hash__(self) -> int:
-        # Use EXIF date in hash if available, otherwise FS date
-        date_key = self.exif_date if self.exif_date else self.date
-        # Include filename in hash ONLY if we don't have EXIF. 
-        # Rationale: Duplicate images might be renamed. If they have same EXIF date + Size, they are likely dupes.
-        # But to be safe and stick to previous logic:
-        return hash((date_key, self.size, self.filename))
+        return hash(self.group_key)
 
 
-def find_duplicates(roots, ext, progress_callback=None, controller=None, use_checksum=False):
+def find_duplicates(roots, ext, progress_callback=None, controller=None, use_checksum=False,
+                    metadata_cache=None, scan_executor=None, stats=None,
+                    hash_algorithm=DEFAULT_HASH_ALGORITHM, hardlink_index=None, grouping_index=None,
+                    checkpoint=None, fingerprints=None):
     """
     Find duplicate images across multiple root directories.
     
+    Runs as a bounded streaming pipeline: the directory walk feeds files to the
+    executor while earlier files are still being processed, at most
+    scan_executor.max_pending files are in flight at any time, and finished
+    results go straight into grouping. Memory therefore does not grow with the
+    number of queued files, and cancelling drops whatever is still queued.
+    
+    In checksum mode the digest is computed by the workers as a separate, timed
+    stage, so grouping never hashes on the calling thread.
+    
+    Hardlinks to one inode are read only once: the first path found represents
+    the file, the others are recorded in hardlink_index and are not reported
+    as duplicates.
+    
+    With a shared grouping_index, results are inserted into it as they arrive
+    (e.g. by several folder producers at once) and the returned lists stay
+    empty; the caller reads the grouping from the index.
+    
+    With a checkpoint, every result is recorded in it and files it already
+    holds unchanged (same stat) are not processed again. When resuming
+    (checkpoint.resume), roots the checkpoint marks as finished are not walked:
+    their checkpointed files are re-checked by stat instead.
+    
+    With fingerprints, the files of directories that are unchanged since the
+    previous scan are skipped; the caller carries their items over.
+    
     Args:
         roots: List of root directories to scan
-        ext: File extension to search for (e.g., 'jpg')
-        progress_callback: Optional callback function(current, total) for progress updates
+        ext: File extension (e.g., 'jpg') or list of extensions to search for
+        progress_callback: Optional callback function(current, total) for progress updates;
+                           total grows while the walk is still discovering files
         controller: Optional GuiRunController for pause/cancel support
         use_checksum: If True, use content-based checksum comparison (slower but more accurate)
+        metadata_cache: Optional MetadataCache consulted before opening a file and updated afterwards
+        scan_executor: Optional shared ScanExecutor (a private thread-backed one is used if None)
+        stats: Optional ScanStats collecting stage timings and counters
+        hash_algorithm: Digest algorithm for checksum mode (see data.hashing.HASH_ALGORITHMS)
+        hardlink_index: Optional HardlinkIndex shared between calls (a private one is used if None)
+        grouping_index: Optional GroupingIndex shared between calls that receives the results
+        checkpoint: Optional ScanCheckpoint to record progress in and resume from
+        fingerprints: Optional DirectoryFingerprints shared between calls (see walk_files)
         
     Returns:
-        Tuple of (uniques_list, duplicates_dict)
+        Tuple of (uniques_list, duplicates_dict); both empty when grouping_index is given
     """
-    visited_paths = set()
-    all_paths = []
-    
-    # Step 1: Collect all paths (fast)
-    for root_dir in roots:
-        if controller: controller.check()
-        all_paths.extend(collect_paths(root_dir, ext, visited_paths, controller))
-
-    total_files = len(all_paths)
-    all_files = []
+    visited_dirs = set()
+    if hardlink_index is None:
+        hardlink_index = HardlinkIndex()
+    suffixes = normalize_extensions(ext)
+    shared_index = grouping_index is not None
+    found_files = grouping_index if shared_index else GroupingIndex(shard_count=1)
     
     mode_str = "checksum-based" if use_checksum else "metadata-based"
     print(f"Using {mode_str} duplicate detection")
     
-    # Step 2: Process images (parallel)
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Submit all tasks
-        futures = {executor.submit(process_image, path, controller, use_checksum): path for path in all_paths}
+    discovered = 0
+    completed = 0
+    pending = 0
+    done_queue = queue.SimpleQueue() # (future, statinfo) of finished tasks
+    
+    def add_result(img_data, statinfo, store, store_checkpoint=True):
+        nonlocal completed
+        completed += 1
+        if progress_callback:
+            progress_callback(completed, discovered)
+        if not img_data:
+            return
         
-        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+        found_files.add(img_data)
+        
+        if store and metadata_cache:
+            metadata_cache.store(img_data, statinfo)
+        if store_checkpoint and checkpoint is not None:
+            checkpoint.record(img_data, statinfo)
+    
+    def take_result(block):
+        nonlocal pending
+        while True:
             if controller: controller.check()
-            
-            if progress_callback:
-                progress_callback(i + 1, total_files) # i is 0-indexed
-            
             try:
-                img_data = future.result()
-                if img_data:
-                    all_files.append(img_data)
-            except Exception as exc:
-                print(f'Generated an exception: {exc}')
+                future, statinfo = done_queue.get(timeout=0.1) if block else done_queue.get_nowait()
+                break
+            except queue.Empty:
+                if not block:
+                    return False
+        pending -= 1
+        
+        try:
+            record = future.result()
+            img_data = image_data_from_record(record, use_checksum, hash_algorithm)
+            if stats and record:
+                stats.add('processed_files')
+                stats.add('parse_seconds', record[5])
+                if use_checksum:
+                    stats.add('hashed_files')
+                    stats.add('hash_seconds', record[6])
+        except Exception as exc:
+            print(f'Generated an exception: {exc}')
+            img_data = None
+        add_result(img_data, statinfo, True)
+        return True
+    
+    own_executor = scan_executor is None
+    if own_executor:
+        scan_executor = ScanExecutor(controller=controller)
+    try:
+        # Producer: single scandir pass per root, all extensions at once
+        for root_dir in roots:
+            if controller: controller.check()
+            if checkpoint is not None and checkpoint.resume and checkpoint.root_done(root_dir):
+                print(f"Resuming finished root from checkpoint: {root_dir}")
+                files = _checkpointed_files(checkpoint.root_files(root_dir), controller)
+            else:
+                print(f"Scanning root: {root_dir}")
+                files = ((entry.path, entry_stat(entry))
+                         for entry in walk_files(root_dir, suffixes, visited_dirs, controller, fingerprints))
+            
+            for path, statinfo in files:
+                if not hardlink_index.claim(path, statinfo):
+                    if stats: stats.add('hardlinks_skipped')
+                    continue
+                discovered += 1
+                
+                # Files finished before an interrupted run are taken from the checkpoint
+                restored = (checkpoint.lookup(path, statinfo, use_checksum, hash_algorithm)
+                            if checkpoint is not None else None)
+                if restored:
+                    if stats: stats.add('checkpoint_hits')
+                    add_result(restored, statinfo, False, False)
+                    continue
+                
+                # Unchanged files are answered from the metadata cache without opening them
+                cached = (metadata_cache.lookup(path, statinfo, use_checksum, hash_algorithm)
+                          if metadata_cache else None)
+                if cached and (not use_checksum or cached._checksum is not None):
+                    if stats: stats.add('cache_hits')
+                    add_result(cached, statinfo, False)
+                    continue
+                
+                while pending >= scan_executor.max_pending:
+                    take_result(block=True)
+                
+                future = scan_executor.submit(path, statinfo, use_checksum, hash_algorithm)
+                pending += 1
+                future.add_done_callback(lambda f, st=statinfo: done_queue.put((f, st)))
+                
+                # Consume whatever finished meanwhile
+                while take_result(block=False):
+                    pass
+        
+        # Drain the remaining in-flight work
+        while pending:
+            take_result(block=True)
+        if checkpoint is not None:
+            for root_dir in roots:
+                checkpoint.mark_root_done(root_dir)
+    finally:
+        if own_executor:
+            # Drops queued work when leaving early (e.g. cancelled)
+            scan_executor.shutdown(cancel_futures=True)
+        if checkpoint is not None:
+            # Keeps everything finished so far, also when cancelled
+            checkpoint.flush()
             
     if progress_callback:
-        progress_callback(total_files, total_files)
-
-    found_files = {}
+        progress_callback(discovered, discovered)
 
-    for img in all_files:
-        if img in found_files:
-            found_files[img].add(img.path)
-        else:
-            found_files[img] = {img.path}
+    if metadata_cache:
+        metadata_cache.flush()
+    
+    if shared_index:
+        return [], {}
+    return found_files.uniques(), found_files.duplicates()
 
-    duplicates = {}
-    uniques = []
 
-    for img_key, paths in found_files.items():
-        if len(paths) > 1:
-            duplicates[img_key] = paths
-        else:
-            uniques.append(img_key)
-            
-    return uniques, duplicates
+def _checkpointed_files(paths, controller=None):
+    """Yield (path, statinfo) for checkpointed paths that still exist."""
+    for path in paths:
+        if controller: controller.check()
+        try:
+            yield path, os.stat(path)
+        except OSError:
+            continue # Removed since the checkpoint
 
 
 def calculate_distinct_size(uniques, duplicates):
@@ -0,0 +1,110 @@
+import os
+import threading
+
+from .GroupingIndex import GroupingIndex
+
+
+class LiveGroupingIndex(GroupingIndex):
+    """
+    GroupingIndex that files can also be removed from, for a watch mode that keeps it current.
+
+    The ImageData of every file is kept by path, so a file can be removed or
+    replaced without knowing its group, and a group whose key file goes away
+    is re-keyed by one of its remaining files. The index therefore holds
+    single files only: every path is added with its own ImageData.
+
+    Any number of producers may add files (e.g. during the initial scan);
+    replacing and removing files is meant for one writer at a time.
+    """
+
+    def __init__(self, shard_count=GroupingIndex.DEFAULT_SHARD_COUNT):
+        super().__init__(shard_count)
+        self._files = {}  # path -> ImageData
+        self._files_lock = threading.Lock()
+
+    def add(self, img_data, paths=None):
+        """
+        Insert one file, replacing an earlier version of the same path.
+
+        Args:
+            img_data: ImageData describing the file
+            paths: Accepted for compatibility; must be None or just img_data.path
+        """
+        if paths is not None and set(paths) != {img_data.path}:
+            raise ValueError("LiveGroupingIndex holds single files; add every path with its own ImageData")
+        with self._files_lock:
+            previous = self._files.get(img_data.path)
+            self._files[img_data.path] = img_data
+        if previous is not None:
+            self._leave_group(previous)
+        super().add(img_data)
+
+    def remove(self, path):
+        """
+        Remove one file.
+
+        Returns:
+            The removed file's ImageData, or None if the path was not indexed
+        """
+        with self._files_lock:
+            img_data = self._files.pop(path, None)
+        if img_data is not None:
+            self._leave_group(img_data)
+        return img_data
+
+    def get(self, path):
+        """ImageData of an indexed path, or None."""
+        with self._files_lock:
+            return self._files.get(path)
+
+    def paths_under(self, directory):
+        """List the indexed paths below a directory."""
+        prefix = os.path.join(directory, '')
+        with self._files_lock:
+            return [path for path in self._files if path.startswith(prefix)]
+
+    def group(self, key):
+        """
+        Current state of a group.
+
+        Args:
+            key: A group_key tuple
+
+        Returns:
+            (key ImageData, set of paths) with a copy of the paths, or None if the group is empty
+        """
+        groups, lock = self._shard(key)
+        with lock:
+            entry = groups.get(key)
+            if entry is None:
+                return None
+            if isinstance(entry, list):
+                return entry[0], set(entry[1])
+            return entry, {entry.path}
+
+    def __contains__(self, path):
+        with self._files_lock:
+            return path in self._files
+
+    def _leave_group(self, img_data):
+        key = img_data.group_key
+        groups, lock = self._shard(key)
+        with lock:
+            entry = groups.get(key)
+            if entry is None:
+                return
+            if not isinstance(entry, list):
+                if entry.path == img_data.path:
+                    del groups[key]
+                return
+            paths = entry[1]
+            paths.discard(img_data.path)
+            if not paths:
+                del groups[key]
+                return
+            if entry[0].path == img_data.path:
+                # The key file is gone: a remaining file becomes the key
+                with self._files_lock:
+                    entry[0] = self._files[min(paths)]
+            if len(paths) == 1:
+                groups[key] = entry[0]
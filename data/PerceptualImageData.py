@@ -0,0 +1,43 @@
+from .ImageData import ImageData
+
+
+class PerceptualImageData(ImageData):
+    """
+    ImageData carrying a 64-bit perceptual hash.
+
+    Used as the key of a near-duplicate group: the group members are only
+    similar, not identical, so equality is defined by the hash of the group's
+    representative image rather than by metadata.
+    """
+
+    __slots__ = ('perceptual_hash', 'method')
+
+    def __init__(self, path=None, date=None, size=None, filename=None, exif_date=None, perceptual_hash=None,
+                 method=None, mtime_ns=None):
+        """
+        Initialize PerceptualImageData.
+
+        Args:
+            path: File path
+            date: File modification date
+            size: File size in bytes
+            filename: Base filename
+            exif_date: EXIF DateTimeOriginal if available
+            perceptual_hash: 64-bit hash as int (see data.perceptual)
+            method: Hash method, 'dhash' or 'phash'
+            mtime_ns: File modification time in integer nanoseconds
+        """
+        super().__init__(path, date, size, filename, exif_date, mtime_ns)
+        self.perceptual_hash = perceptual_hash
+        self.method = method
+
+    @property
+    def group_key(self):
+        """Key of the perceptual hash; images that could not be hashed only match themselves."""
+        if self.perceptual_hash is None:
+            return ('unhashed', self.path)
+        return (self.method, self.perceptual_hash)
+
+    def __str__(self):
+        hash_str = f"{self.perceptual_hash:016x}" if self.perceptual_hash is not None else "None"
+        return f"{super().__str__()}, {self.method}=[{hash_str}]"
@@ -1,6 +1,15 @@
 from datetime import datetime
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Optional, Tuple
 from .ImageData import ImageData
+from .ScanStats import ScanStats
+
+# Duplicate detection modes
+MODE_METADATA = 'metadata'
+MODE_CHECKSUM = 'checksum'
+MODE_STAGED = 'staged'   # checksum accuracy, reading only size/partial-hash collisions
+MODE_PERCEPTUAL = 'perceptual'   # near duplicates (resized/recompressed) by perceptual hash
+MODE_CONTENT = 'content'   # exact image content, ignoring EXIF/XMP and other metadata segments
+DETECTION_MODES = (MODE_METADATA, MODE_CHECKSUM, MODE_STAGED, MODE_PERCEPTUAL, MODE_CONTENT)
 
 class ScanResult:
     """
@@ -12,7 +21,12 @@ class ScanResult:
                  scanned_paths: List[str],
                  extension: str,
                  detection_mode: str,
-                 timestamp: float = None):
+                 timestamp: float = None,
+                 stats: Optional[ScanStats] = None,
+                 hash_algorithm: Optional[str] = None,
+                 hardlinks: Optional[Dict[str, Set[str]]] = None,
+                 directory_fingerprints: Optional[Dict[str, Tuple[int, int]]] = None,
+                 base_filtered: bool = False):
         """
         Initialize a ScanResult.
 
@@ -21,8 +35,16 @@ class ScanResult:
             duplicates: Dictionary mapping ImageData to a set of duplicate file paths.
             scanned_paths: List of root folder paths that were scanned.
             extension: The file extension that was filtered for.
-            detection_mode: 'checksum' or 'metadata'.
+            detection_mode: One of DETECTION_MODES (e.g. 'checksum' or 'metadata').
             timestamp: Unix timestamp of the scan. Defaults to current time.
+            stats: Optional ScanStats with stage timings and counters (not persisted).
+            hash_algorithm: Digest algorithm of the checksums (None for metadata scans).
+            hardlinks: Dictionary mapping a scanned path to the other hardlinks of the same
+                inode. These paths are not part of uniques/duplicates and are no copies.
+            directory_fingerprints: Dictionary mapping each scanned directory to its
+                (mtime_ns, entry count), used by incremental rescans to skip unchanged ones.
+            base_filtered: True if groups already in a base result were dropped (merge scan);
+                such a result lacks files and cannot be the previous result of a rescan.
         """
         self.uniques = uniques
         self.duplicates = duplicates
@@ -30,6 +52,11 @@ class ScanResult:
         self.extension = extension
         self.detection_mode = detection_mode
         self.timestamp = timestamp if timestamp is not None else datetime.now().timestamp()
+        self.stats = stats
+        self.hash_algorithm = hash_algorithm
+        self.hardlinks = hardlinks if hardlinks is not None else {}
+        self.directory_fingerprints = directory_fingerprints if directory_fingerprints is not None else {}
+        self.base_filtered = base_filtered
 
     @property
     def total_files_scanned(self) -> int:
@@ -41,3 +68,8 @@ class ScanResult:
     @property
     def duplicate_groups_count(self) -> int:
         return len(self.duplicates)
+
+    @property
+    def hardlink_count(self) -> int:
+        """Number of extra hardlink paths (not counted in total_files_scanned)."""
+        return sum(len(paths) for paths in self.hardlinks.values())
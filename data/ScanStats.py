@@ -0,0 +1,34 @@
+import threading
+
+
+class ScanStats:
+    """
+    Thread-safe counters and stage timings collected while a scan runs.
+
+    Counters are plain named numbers (e.g. 'parse_seconds', 'hash_seconds',
+    'hashed_files'), so each pipeline stage can report what it did without
+    the scanner having to know every stage up front.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def add(self, name, value=1):
+        """Add value to the named counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name, default=0):
+        """Return the current value of the named counter."""
+        with self._lock:
+            return self._counters.get(name, default)
+
+    def as_dict(self):
+        """Return a snapshot of all counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    def __str__(self):
+        return ', '.join(f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+                         for name, value in sorted(self.as_dict().items()))
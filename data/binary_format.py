@@ -0,0 +1,142 @@
+"""
+Versioned binary scan-result format, opened with mmap.
+
+Layout (little-endian):
+    header     MAGIC, format version, digest width, then (offset, count) of each
+               section and (offset, length) of the metadata
+    records    fixed-width record table (see ColumnarScanResult.record_dtype)
+    groups     int64 group offsets into the record table (CSR)
+    strings    int64 offsets into the string blob
+    blob       deduplicated UTF-8 strings: directories, file names, EXIF dates
+    metadata   JSON: scanned paths, mode, algorithm, timestamp, hardlinks, directory fingerprints,
+               base filter flag
+
+Sections are 8-byte aligned, so they map straight into NumPy arrays without
+copying. Opening a file only parses the header and the metadata; records are
+decoded into ImageData when a result view touches them.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .ColumnarScanResult import ColumnarScanResult, StringPool, record_dtype
+
+MAGIC = b'DEDUPRES'
+FORMAT_VERSION = 1
+BINARY_EXTENSION = '.dedup'
+
+_SECTIONS = ('records', 'groups', 'strings', 'blob')
+# magic, version, digest width, (offset, count) per section, metadata (offset, length)
+_HEADER = struct.Struct('<8sII' + 'QQ' * len(_SECTIONS) + 'QQ')
+_ALIGNMENT = 8
+
+
+def is_binary_file(filepath):
+    """True if the file starts with the binary format's magic bytes."""
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_binary(scan_result, filepath):
+    """
+    Write a ScanResult (or ColumnarScanResult) in the binary format.
+
+    Args:
+        scan_result: Result to write; object results are converted to columns first
+        filepath: Target file
+    """
+    result = ColumnarScanResult.from_scan_result(scan_result)
+    strings = result.strings
+    sections = [
+        (result.records, len(result.records)),
+        (np.ascontiguousarray(result.group_offsets, dtype='<i8'), len(result.group_offsets)),
+        (np.ascontiguousarray(strings.offsets, dtype='<i8'), len(strings.offsets)),
+        (bytes(strings.blob), len(strings.blob)),
+    ]
+    metadata = json.dumps({
+        'timestamp': result.timestamp,
+        'scanned_paths': result.scanned_paths,
+        'extension': result.extension,
+        'detection_mode': result.detection_mode,
+        'hash_algorithm': result.hash_algorithm,
+        'perceptual_method': result.perceptual_method,
+        'hardlinks': {path: sorted(links) for path, links in result.hardlinks.items()},
+        'directories': result.directory_fingerprints,
+        'base_filtered': result.base_filtered,
+    }, ensure_ascii=False).encode('utf-8')
+
+    with open(filepath, 'wb') as f:
+        f.write(b'\0' * _HEADER.size)
+        locations = []
+        for data, count in sections:
+            _pad(f)
+            locations += [f.tell(), count]
+            f.write(data.tobytes() if isinstance(data, np.ndarray) else data)
+        metadata_offset = f.tell()
+        f.write(metadata)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, result.records.dtype['digest'].shape[0],
+                             *locations, metadata_offset, len(metadata)))
+
+
+def open_binary(filepath):
+    """
+    Map a binary result file.
+
+    Args:
+        filepath: File written by write_binary
+
+    Returns:
+        ColumnarScanResult whose arrays are views of the mapped file
+
+    Raises:
+        ValueError: If the file is not in the binary format, has an unsupported
+                    version or is truncated
+    """
+    with open(filepath, 'rb') as f:
+        # The mapping stays valid after the file is closed; it is released with the arrays
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < _HEADER.size or mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a binary scan result: {filepath}")
+    header = _HEADER.unpack_from(mapped)
+    version, digest_width = header[1], header[2]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary scan result version {version} (expected {FORMAT_VERSION})")
+    locations = dict(zip(_SECTIONS, zip(header[3::2], header[4::2])))
+    metadata_offset, metadata_length = header[-2:]
+    if metadata_offset + metadata_length > len(mapped):
+        raise ValueError(f"Truncated binary scan result: {filepath}")
+
+    def array(section, dtype):
+        offset, count = locations[section]
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+
+    blob_offset, blob_length = locations['blob']
+    strings = StringPool(memoryview(mapped)[blob_offset:blob_offset + blob_length], array('strings', '<i8'))
+    metadata = json.loads(mapped[metadata_offset:metadata_offset + metadata_length].decode('utf-8'))
+    return ColumnarScanResult(
+        array('records', record_dtype(digest_width)),
+        strings,
+        array('groups', '<i8'),
+        scanned_paths=metadata.get('scanned_paths', []),
+        extension=metadata.get('extension', ''),
+        detection_mode=metadata.get('detection_mode', 'unknown'),
+        timestamp=metadata.get('timestamp'),
+        hash_algorithm=metadata.get('hash_algorithm'),
+        hardlinks={path: set(links) for path, links in metadata.get('hardlinks', {}).items()},
+        perceptual_method=metadata.get('perceptual_method'),
+        directory_fingerprints={path: tuple(fingerprint)
+                                for path, fingerprint in metadata.get('directories', {}).items()},
+        base_filtered=metadata.get('base_filtered', False),
+    )
+
+
+def _pad(f):
+    f.write(b'\0' * (-f.tell() % _ALIGNMENT))
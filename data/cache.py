@@ -0,0 +1,346 @@
+import os
+import sqlite3
+import threading
+from .hashing import DEFAULT_HASH_ALGORITHM
+from .paths import user_cache_dir
+
+
+class MetadataCache:
+    """
+    Persistent per-file metadata cache stored in a local SQLite file (by default
+    in the per-user cache directory, see data.paths).
+
+    Entries are keyed by (st_dev, st_ino, size, mtime_ns), so a file that has not
+    been touched since the previous scan is recognised from its stat result alone
+    and never has to be opened again. New entries are buffered and written back
+    in batches.
+    """
+
+    DEFAULT_CACHE_PATH = os.path.join(user_cache_dir(), 'metadata_cache.sqlite')
+
+    def __init__(self, filepath=None, batch_size=1000):
+        """
+        Open (or create) the cache.
+
+        Args:
+            filepath: Path to the SQLite file (uses DEFAULT_CACHE_PATH in the per-user
+                      cache directory if None)
+            batch_size: Number of pending entries that triggers a write-back
+        """
+        if filepath is None:
+            filepath = MetadataCache.DEFAULT_CACHE_PATH
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        # Shared between scanner worker threads, access is serialized by _lock
+        self._conn = sqlite3.connect(self.filepath, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS metadata ('
+            ' dev INTEGER NOT NULL, ino INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,'
+            ' filename TEXT, date REAL, exif_date TEXT, checksum TEXT, checksum_algorithm TEXT,'
+            ' PRIMARY KEY (dev, ino, size, mtime_ns)) WITHOUT ROWID'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(metadata)')}
+        if 'checksum_algorithm' not in columns:
+            # Caches written before algorithms were selectable only hold MD5 checksums
+            self._conn.execute("ALTER TABLE metadata ADD COLUMN checksum_algorithm TEXT DEFAULT 'md5'")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(statinfo):
+        """
+        Build the cache key for a stat result.
+
+        Returns:
+            Tuple (st_dev, st_ino, size, mtime_ns), or None if the file system
+            does not provide stable inode numbers
+        """
+        if statinfo is None or not statinfo.st_ino:
+            return None
+        return (statinfo.st_dev, statinfo.st_ino, statinfo.st_size, statinfo.st_mtime_ns)
+
+    def lookup(self, abs_path, statinfo, use_checksum=False, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """
+        Return a cached ImageData for the file, or None on a cache miss.
+
+        Args:
+            abs_path: Absolute path of the file (the cached entry may belong to a hardlink or rename)
+            statinfo: Current os.stat_result of the file
+            use_checksum: If True, return a ChecksumImageData (with checksum if cached)
+            hash_algorithm: Only a checksum computed with this algorithm is returned
+        """
+        key = self.make_key(statinfo)
+        if key is None:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT date, exif_date, checksum, checksum_algorithm FROM metadata'
+                ' WHERE dev=? AND ino=? AND size=? AND mtime_ns=?', key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        date, exif_date, checksum, checksum_algorithm = row
+        if checksum_algorithm != hash_algorithm:
+            checksum = None
+        # The filename always follows the current path: renames keep inode and mtime
+        filename = os.path.basename(abs_path)
+        if use_checksum:
+            from .ChecksumImageData import ChecksumImageData
+            return ChecksumImageData(abs_path, None, statinfo.st_size, filename, exif_date, checksum, hash_algorithm,
+                                     mtime_ns=statinfo.st_mtime_ns)
+
+        from .ImageData import ImageData
+        return ImageData(abs_path, None, statinfo.st_size, filename, exif_date, mtime_ns=statinfo.st_mtime_ns)
+
+    def store(self, img_data, statinfo):
+        """
+        Queue an entry for write-back; flushes automatically once batch_size is reached.
+
+        Args:
+            img_data: ImageData or ChecksumImageData describing the file
+            statinfo: os.stat_result the metadata was extracted from
+        """
+        key = self.make_key(statinfo)
+        if key is None:
+            return
+
+        checksum = getattr(img_data, '_checksum', None)
+        algorithm = getattr(img_data, 'algorithm', None) if checksum is not None else None
+        with self._lock:
+            self._pending.append(key + (img_data.filename, img_data.date, img_data.exif_date, checksum, algorithm))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write all pending entries to disk."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        try:
+            # Never overwrite a known checksum with NULL
+            self._conn.executemany(
+                'INSERT INTO metadata (dev, ino, size, mtime_ns, filename, date, exif_date, checksum, checksum_algorithm)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (dev, ino, size, mtime_ns) DO UPDATE SET'
+                ' filename=excluded.filename, date=excluded.date, exif_date=excluded.exif_date,'
+                ' checksum=COALESCE(excluded.checksum, metadata.checksum),'
+                ' checksum_algorithm=COALESCE(excluded.checksum_algorithm, metadata.checksum_algorithm)',
+                self._pending
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing metadata cache: {e}")
+        self._pending = []
+
+    def close(self):
+        """Flush pending entries and close the database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+class ChecksumCache:
+    """
+    Persistent content-digest cache stored in a local SQLite file (by default
+    in the per-user cache directory, see data.paths).
+
+    Digests are keyed by (st_dev, st_ino, size, mtime_ns, algorithm), so
+    re-verifying an unchanged archive only hashes the files that changed since
+    they were last seen. The path is stored alongside for prune(). New entries
+    are buffered and written back in batches.
+
+    Instances can be handed to process-pool workers: they pickle by file path,
+    and each worker process reopens one shared connection per file that is
+    flushed when the worker exits.
+    """
+
+    DEFAULT_CACHE_PATH = os.path.join(user_cache_dir(), 'checksum_cache.sqlite')
+
+    def __init__(self, filepath=None, batch_size=1000):
+        """
+        Open (or create) the cache.
+
+        Args:
+            filepath: Path to the SQLite file (uses DEFAULT_CACHE_PATH in the per-user
+                      cache directory if None)
+            batch_size: Number of pending entries that triggers a write-back
+        """
+        if filepath is None:
+            filepath = ChecksumCache.DEFAULT_CACHE_PATH
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Shared between hashing threads, access is serialized by _lock
+        self._conn = sqlite3.connect(self.filepath, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS checksums ('
+            ' dev INTEGER NOT NULL, ino INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, algorithm TEXT NOT NULL,'
+            ' path TEXT, digest TEXT NOT NULL,'
+            ' PRIMARY KEY (dev, ino, size, mtime_ns, algorithm)) WITHOUT ROWID'
+        )
+        self._conn.commit()
+
+    def __reduce__(self):
+        return _open_worker_checksum_cache, (self.filepath, self.batch_size)
+
+    def lookup(self, statinfo, algorithm=DEFAULT_HASH_ALGORITHM):
+        """
+        Return the cached digest for a stat result, or None on a cache miss.
+
+        Args:
+            statinfo: Current os.stat_result of the file
+            algorithm: Digest algorithm the checksum must have been computed with
+        """
+        key = MetadataCache.make_key(statinfo)
+        if key is None:
+            return None
+
+        key += (algorithm,)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.hits += 1
+                return pending[1]
+            row = self._conn.execute(
+                'SELECT digest FROM checksums'
+                ' WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm=?', key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def store(self, abs_path, statinfo, algorithm, digest):
+        """
+        Queue a digest for write-back; flushes automatically once batch_size is reached.
+
+        Args:
+            abs_path: Path the digest was computed from
+            statinfo: os.stat_result taken before hashing
+            algorithm: Digest algorithm
+            digest: Hexadecimal digest
+        """
+        key = MetadataCache.make_key(statinfo)
+        if key is None or digest is None:
+            return
+
+        with self._lock:
+            self._pending[key + (algorithm,)] = (abs_path, digest)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write all pending entries to disk."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        try:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO checksums (dev, ino, size, mtime_ns, algorithm, path, digest)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [key + value for key, value in self._pending.items()]
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing checksum cache: {e}")
+        self._pending = {}
+
+    def prune(self):
+        """
+        Delete entries whose file is gone or has changed since it was hashed.
+
+        Returns:
+            Number of entries removed
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute('SELECT dev, ino, size, mtime_ns, algorithm, path FROM checksums').fetchall()
+
+        stale = []
+        for row in rows:
+            try:
+                key = MetadataCache.make_key(os.stat(row[5]))
+            except (OSError, TypeError, ValueError):
+                key = None
+            if key != row[:4]:
+                stale.append(row[:5])
+
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM checksums WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm=?', stale
+            )
+            self._conn.commit()
+        return len(stale)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM checksums').fetchone()[0] + len(self._pending)
+
+    def close(self):
+        """Flush pending entries and close the database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+# ChecksumCache instances opened in this process by unpickling (see ChecksumCache.__reduce__)
+_worker_checksum_caches = {}
+
+
+def _open_worker_checksum_cache(filepath, batch_size):
+    cache = _worker_checksum_caches.get(filepath)
+    if cache is None:
+        import multiprocessing.util
+        cache = _worker_checksum_caches[filepath] = ChecksumCache(filepath, batch_size)
+        # Pool workers skip atexit, but run multiprocessing finalizers on a clean exit
+        multiprocessing.util.Finalize(None, cache.close, exitpriority=10)
+    return cache
+
+
+def main(argv=None):
+    """Command line maintenance for the checksum cache."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Maintain the persistent checksum cache.")
+    parser.add_argument('command', choices=['prune', 'stats'],
+                        help="prune: drop entries of missing or changed files; stats: print the entry count")
+    parser.add_argument('--db', default=None, help="Path to the cache file (default: in the user cache directory)")
+    args = parser.parse_args(argv)
+
+    cache = ChecksumCache(args.db)
+    try:
+        if args.command == 'prune':
+            removed = cache.prune()
+            print(f"Removed {removed} stale entries, {len(cache)} remain.")
+        else:
+            print(f"{len(cache)} entries in {cache.filepath}")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
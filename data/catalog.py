@@ -0,0 +1,367 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from .ImageData import ImageData
+from .ChecksumImageData import ChecksumImageData
+from .PerceptualImageData import PerceptualImageData
+from .ScanResult import ScanResult
+from .paths import user_data_dir
+
+# items.kind values
+KIND_METADATA = 'metadata'
+KIND_CHECKSUM = 'checksum'
+KIND_PERCEPTUAL = 'perceptual'
+
+_ITEM_COLUMNS = ('id, scan_id, kind, path, filename, size, mtime_ns, exif_date, digest, algorithm, copies')
+# Items per query batch; also bounds the number of SQL variables in the paths lookup
+_QUERY_BATCH = 500
+
+
+class ScanCatalog:
+    """
+    Local SQLite catalog holding any number of scan results (by default in the
+    per-user data directory, see data.paths).
+
+    Every scan is a row in scans; each of its groups (a unique file or the key
+    of a duplicate group) is a row in items, and the files of a group are rows
+    in paths. Items are indexed by digest, size, EXIF date and filename, so
+    questions such as "which scans contain this checksum" or "groups with more
+    than 5 copies" are answered by SQLite without loading any result into
+    Python.
+    """
+
+    DEFAULT_CATALOG_PATH = os.path.join(user_data_dir(), 'scan_catalog.sqlite')
+
+    def __init__(self, filepath=None, batch_size=10000):
+        """
+        Open (or create) the catalog.
+
+        Args:
+            filepath: Path to the SQLite file (uses DEFAULT_CATALOG_PATH in the per-user
+                      data directory if None)
+            batch_size: Number of rows inserted per executemany call
+        """
+        if filepath is None:
+            filepath = ScanCatalog.DEFAULT_CATALOG_PATH
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        # Shared between the GUI and scanner threads, access is serialized by _lock
+        self._conn = sqlite3.connect(self.filepath, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS scans ('
+            ' id INTEGER PRIMARY KEY, name TEXT, timestamp REAL, scanned_paths TEXT, extension TEXT,'
+            ' detection_mode TEXT, hash_algorithm TEXT, hardlinks TEXT, base_filtered INTEGER NOT NULL DEFAULT 0);'
+            'CREATE TABLE IF NOT EXISTS items ('
+            ' id INTEGER PRIMARY KEY, scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,'
+            ' kind TEXT NOT NULL, path TEXT, filename TEXT, size INTEGER, mtime_ns INTEGER, exif_date TEXT,'
+            ' digest BLOB, algorithm TEXT, copies INTEGER NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS paths ('
+            ' item_id INTEGER NOT NULL REFERENCES items(id) ON DELETE CASCADE, path TEXT NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS directories ('
+            ' scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE, path TEXT NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL, entries INTEGER NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS items_digest ON items(digest);'
+            'CREATE INDEX IF NOT EXISTS items_size ON items(size);'
+            'CREATE INDEX IF NOT EXISTS items_exif_date ON items(exif_date);'
+            'CREATE INDEX IF NOT EXISTS items_filename ON items(filename);'
+            'CREATE INDEX IF NOT EXISTS items_scan_copies ON items(scan_id, copies);'
+            'CREATE INDEX IF NOT EXISTS paths_item ON paths(item_id);'
+            'CREATE INDEX IF NOT EXISTS paths_path ON paths(path);'
+            'CREATE INDEX IF NOT EXISTS directories_scan ON directories(scan_id);'
+        )
+        # Catalogs created before the column was added
+        if 'base_filtered' not in [row[1] for row in self._conn.execute('PRAGMA table_info(scans)')]:
+            self._conn.execute('ALTER TABLE scans ADD COLUMN base_filtered INTEGER NOT NULL DEFAULT 0')
+        self._conn.commit()
+
+    def add_scan(self, scan_result, name=None):
+        """
+        Store a scan result.
+
+        Groups are streamed from the result into the catalog in batches, so
+        results of any size can be added.
+
+        Args:
+            scan_result: ScanResult (or ColumnarScanResult) to store
+            name: Optional label for the scan
+
+        Returns:
+            The new scan id
+        """
+        hardlinks = {path: sorted(links) for path, links in scan_result.hardlinks.items()}
+        with self._lock, self._conn:
+            scan_id = self._conn.execute(
+                'INSERT INTO scans (name, timestamp, scanned_paths, extension, detection_mode, hash_algorithm,'
+                ' hardlinks, base_filtered) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (name, scan_result.timestamp, json.dumps(scan_result.scanned_paths), scan_result.extension,
+                 scan_result.detection_mode, scan_result.hash_algorithm, json.dumps(hardlinks),
+                 int(scan_result.base_filtered))
+            ).lastrowid
+            # Item ids are assigned here, so paths can reference them without a round trip per item
+            item_id = self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM items').fetchone()[0]
+            items = []
+            paths = []
+            groups = itertools.chain(((img, [img.path]) for img in scan_result.uniques),
+                                     ((img, sorted(group)) for img, group in scan_result.duplicates.items()))
+            for img, group in groups:
+                item_id += 1
+                items.append((item_id, scan_id) + _item_fields(img) + (len(group),))
+                paths.extend((item_id, path) for path in group)
+                if len(items) >= self.batch_size or len(paths) >= self.batch_size:
+                    self._insert(items, paths)
+                    items, paths = [], []
+            self._insert(items, paths)
+            # Directory fingerprints let a loaded scan serve as previous_result of an incremental scan
+            self._conn.executemany(
+                'INSERT INTO directories (scan_id, path, mtime_ns, entries) VALUES (?, ?, ?, ?)',
+                ((scan_id, path, mtime_ns, entries)
+                 for path, (mtime_ns, entries) in scan_result.directory_fingerprints.items()))
+        return scan_id
+
+    def _insert(self, items, paths):
+        self._conn.executemany(f'INSERT INTO items ({_ITEM_COLUMNS}) VALUES ({", ".join("?" * 11)})', items)
+        self._conn.executemany('INSERT INTO paths (item_id, path) VALUES (?, ?)', paths)
+
+    def scans(self):
+        """
+        List the stored scans, newest first.
+
+        Returns:
+            List of dicts with id, name, timestamp, scanned_paths, detection_mode,
+            hash_algorithm, items and files
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT s.id, s.name, s.timestamp, s.scanned_paths, s.detection_mode, s.hash_algorithm,'
+                ' COUNT(i.id), COALESCE(SUM(i.copies), 0)'
+                ' FROM scans s LEFT JOIN items i ON i.scan_id = s.id GROUP BY s.id ORDER BY s.timestamp DESC'
+            ).fetchall()
+        return [{'id': row[0], 'name': row[1], 'timestamp': row[2], 'scanned_paths': json.loads(row[3]),
+                 'detection_mode': row[4], 'hash_algorithm': row[5], 'items': row[6], 'files': row[7]}
+                for row in rows]
+
+    def load_scan(self, scan_id):
+        """
+        Rebuild a stored scan as a ScanResult.
+
+        The directory fingerprints are restored too, so the result can be the
+        previous_result of an incremental scan.
+
+        Returns:
+            ScanResult, or None if there is no scan with that id
+        """
+        with self._lock:
+            scan = self._conn.execute(
+                'SELECT timestamp, scanned_paths, extension, detection_mode, hash_algorithm, hardlinks,'
+                ' base_filtered FROM scans WHERE id=?', (scan_id,)
+            ).fetchone()
+            directories = self._conn.execute(
+                'SELECT path, mtime_ns, entries FROM directories WHERE scan_id=?', (scan_id,)
+            ).fetchall()
+        if scan is None:
+            return None
+        uniques = []
+        duplicates = {}
+        for _, img, group in self.query(scan_id=scan_id):
+            if len(group) == 1:
+                uniques.append(img)
+            else:
+                duplicates[img] = group
+        return ScanResult(uniques, duplicates, json.loads(scan[1]), scan[2], scan[3], timestamp=scan[0],
+                          hash_algorithm=scan[4],
+                          hardlinks={path: set(links) for path, links in json.loads(scan[5] or '{}').items()},
+                          directory_fingerprints={path: (mtime_ns, entries) for path, mtime_ns, entries in directories},
+                          base_filtered=bool(scan[6]))
+
+    def delete_scan(self, scan_id):
+        """Remove a scan with all its items and paths. Returns True if it existed."""
+        with self._lock, self._conn:
+            return self._conn.execute('DELETE FROM scans WHERE id=?', (scan_id,)).rowcount > 0
+
+    def query(self, scan_id=None, digest=None, algorithm=None, min_copies=None, min_size=None, max_size=None,
+              year=None, filename=None, path=None, limit=None):
+        """
+        Find groups matching all given filters.
+
+        Args:
+            scan_id: Only groups of this scan
+            digest: Hex checksum (or perceptual hash) of the group
+            algorithm: Digest algorithm (or perceptual method) of the group
+            min_copies: Groups with at least this many files (2 for duplicates only)
+            min_size, max_size: File size bounds in bytes
+            year: Files taken (EXIF date) or, without EXIF date, modified in this year
+            filename: Exact filename of the group's key file
+            path: Groups that contain this path
+            limit: Maximum number of groups
+
+        Yields:
+            Tuples of (scan_id, key ImageData, set of paths), in insertion order
+        """
+        where, params = [], []
+        if scan_id is not None:
+            where.append('scan_id = ?')
+            params.append(scan_id)
+        if digest is not None:
+            where.append('digest = ?')
+            params.append(bytes.fromhex(digest))
+        if algorithm is not None:
+            where.append('algorithm = ?')
+            params.append(algorithm)
+        if min_copies is not None:
+            where.append('copies >= ?')
+            params.append(min_copies)
+        if min_size is not None:
+            where.append('size >= ?')
+            params.append(min_size)
+        if max_size is not None:
+            where.append('size <= ?')
+            params.append(max_size)
+        if year is not None:
+            # EXIF dates ('YYYY:MM:DD HH:MM:SS') sort as text, so the range can use the index
+            start = int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+            end = int(datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+            where.append('((exif_date >= ? AND exif_date < ?)'
+                         ' OR (exif_date IS NULL AND mtime_ns >= ? AND mtime_ns < ?))')
+            params += [f'{year:04d}:', f'{year + 1:04d}:', start, end]
+        if filename is not None:
+            where.append('filename = ?')
+            params.append(filename)
+        if path is not None:
+            where.append('id IN (SELECT item_id FROM paths WHERE path = ?)')
+            params.append(path)
+
+        sql = f'SELECT {_ITEM_COLUMNS} FROM items'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        # Items and their paths are fetched a batch at a time, so large answers stream
+        while True:
+            with self._lock:
+                batch = cursor.fetchmany(_QUERY_BATCH)
+                if not batch:
+                    return
+                groups = {row[0]: set() for row in batch}
+                for item_id, member in self._conn.execute(
+                        f'SELECT item_id, path FROM paths WHERE item_id IN ({", ".join("?" * len(batch))})',
+                        list(groups)):
+                    groups[item_id].add(member)
+            for row in batch:
+                yield row[1], _image_data(row), groups[row[0]]
+
+    def scans_containing(self, digest, algorithm=None):
+        """Return the ids of all scans with a group of the given hex digest."""
+        with self._lock:
+            sql = 'SELECT DISTINCT scan_id FROM items WHERE digest = ?'
+            params = [bytes.fromhex(digest)]
+            if algorithm is not None:
+                sql += ' AND algorithm = ?'
+                params.append(algorithm)
+            return [row[0] for row in self._conn.execute(sql + ' ORDER BY scan_id', params)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _item_fields(img):
+    """(kind, path, filename, size, mtime_ns, exif_date, digest, algorithm) of a group key."""
+    if isinstance(img, PerceptualImageData):
+        value = img.perceptual_hash
+        kind, digest, algorithm = KIND_PERCEPTUAL, value.to_bytes(8, 'big') if value is not None else None, img.method
+    elif isinstance(img, ChecksumImageData):
+        digest = img._digest
+        kind, algorithm = KIND_CHECKSUM, img.algorithm
+        if isinstance(digest, str):
+            digest = digest.encode('utf-8')  # not hex, kept by its UTF-8 bytes
+    else:
+        kind, digest, algorithm = KIND_METADATA, None, None
+    return (kind, img.path, img.filename, img.size, img.mtime_ns, img.exif_date or None, digest, algorithm)
+
+
+def _image_data(row):
+    """Rebuild the key ImageData of an items row."""
+    _, _, kind, path, filename, size, mtime_ns, exif_date, digest, algorithm, _ = row
+    if kind == KIND_PERCEPTUAL:
+        value = int.from_bytes(digest, 'big') if digest is not None else None
+        return PerceptualImageData(path, None, size, filename, exif_date, value, algorithm, mtime_ns=mtime_ns)
+    if kind == KIND_CHECKSUM:
+        return ChecksumImageData(path, None, size, filename, exif_date, digest.hex() if digest is not None else None,
+                                 algorithm, mtime_ns=mtime_ns)
+    return ImageData(path, None, size, filename, exif_date, mtime_ns=mtime_ns)
+
+
+def main(argv=None):
+    """Command line access to the scan catalog."""
+    import argparse
+    from .storage import ScanResultStorage
+    parser = argparse.ArgumentParser(description="Store and query scan results in the scan catalog.")
+    parser.add_argument('--db', default=None, help="Path to the catalog file (default: in the user data directory)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="add a saved result file (JSON or binary)")
+    add.add_argument('file')
+    add.add_argument('--name', default=None)
+    commands.add_parser('scans', help="list the stored scans")
+    delete = commands.add_parser('delete', help="remove a stored scan")
+    delete.add_argument('scan_id', type=int)
+    contains = commands.add_parser('contains', help="list the scans with a group of this checksum")
+    contains.add_argument('digest')
+    query = commands.add_parser('query', help="list groups matching all filters")
+    query.add_argument('--scan', type=int, default=None)
+    query.add_argument('--digest', default=None)
+    query.add_argument('--min-copies', type=int, default=None)
+    query.add_argument('--min-mb', type=float, default=None, help="minimum file size in MB")
+    query.add_argument('--max-mb', type=float, default=None, help="maximum file size in MB")
+    query.add_argument('--year', type=int, default=None)
+    query.add_argument('--filename', default=None)
+    query.add_argument('--path', default=None, help="groups containing this path")
+    query.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    catalog = ScanCatalog(args.db)
+    try:
+        if args.command == 'add':
+            result = ScanResultStorage.load_results(args.file)
+            if result is None:
+                return 1
+            print(f"Added scan {catalog.add_scan(result, args.name)} ({result.total_files_scanned} files)")
+        elif args.command == 'scans':
+            for scan in catalog.scans():
+                when = datetime.fromtimestamp(scan['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+                print(f"{scan['id']:>5}  {when}  {scan['detection_mode']:<10} {scan['files']:>10} files"
+                      f"  {scan['name'] or ', '.join(scan['scanned_paths'])}")
+        elif args.command == 'delete':
+            print("Deleted." if catalog.delete_scan(args.scan_id) else f"No scan {args.scan_id}.")
+        elif args.command == 'contains':
+            print('\n'.join(str(scan_id) for scan_id in catalog.scans_containing(args.digest)))
+        else:
+            mb = 1024 * 1024
+            groups = catalog.query(
+                scan_id=args.scan, digest=args.digest, min_copies=args.min_copies,
+                min_size=int(args.min_mb * mb) if args.min_mb is not None else None,
+                max_size=int(args.max_mb * mb) if args.max_mb is not None else None,
+                year=args.year, filename=args.filename, path=args.path, limit=args.limit)
+            for scan_id, img, paths in groups:
+                print(f"[scan {scan_id}] {img.filename} ({img.size} bytes, {len(paths)} files)")
+                for member in sorted(paths):
+                    print(f"    {member}")
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from .hashing import DEFAULT_HASH_ALGORITHM
+
+
+class ScanCheckpoint:
+    """
+    Progress of one scan, saved periodically so it can be resumed.
+
+    Holds the scan parameters, every completed file with its extracted
+    metadata and digest, and the scan roots that were fully processed. Results
+    are buffered and committed in one SQLite transaction per checkpoint, so the
+    file on disk always holds a consistent state: after a cancel or a crash at
+    most the last interval of work is lost.
+
+    On resume, finished roots are not walked again: their files are taken from
+    the checkpoint after a stat confirms they are unchanged. In unfinished roots
+    each file found by the walk is looked up by path and stat before it is
+    queued for processing. Only a checkpoint opened with resume=True skips
+    finished roots; a new scan walks every root, and a scan with other
+    parameters starts from an empty checkpoint.
+    """
+
+    def __init__(self, filepath, interval=30.0, batch_size=5000, resume=False):
+        """
+        Open (or create) a checkpoint file.
+
+        Args:
+            filepath: Path to the SQLite checkpoint file
+            interval: Seconds between checkpoints while results arrive
+            batch_size: Buffered results that force a checkpoint before the interval is over
+            resume: True to continue the stored scan, so the roots it finished are not walked again
+        """
+        self.filepath = filepath
+        self.interval = interval
+        self.resume = resume
+        self.batch_size = batch_size
+        self.hits = 0
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        # Written by all folder producers of a scan, access is serialized by _lock
+        self._conn = sqlite3.connect(filepath, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS params (key TEXT PRIMARY KEY, value TEXT);'
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY, dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,'
+            ' exif_date TEXT, checksum TEXT, algorithm TEXT);'
+            'CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY);'
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);'
+        )
+        self._conn.commit()
+
+    @property
+    def params(self):
+        """Scan parameters stored by save_params (empty dict for a new checkpoint)."""
+        with self._lock:
+            return {key: json.loads(value) for key, value in self._conn.execute('SELECT key, value FROM params')}
+
+    def save_params(self, params):
+        """
+        Store the scan parameters (JSON-serializable values) needed to resume.
+
+        Files and finished roots recorded for other parameters are dropped, as
+        they would hold the wrong extensions or digests. Unless the checkpoint
+        was opened to resume, the finished roots are forgotten as well, so the
+        new scan walks every root again (files recorded before still spare
+        their processing if their stat is unchanged).
+        """
+        fingerprint = _params_fingerprint(params)
+        with self._lock, self._conn:
+            stored = self._conn.execute("SELECT value FROM meta WHERE key='params'").fetchone()
+            if stored is None or stored[0] != fingerprint:
+                self._pending.clear()
+                self._conn.execute('DELETE FROM files')
+                self._conn.execute('DELETE FROM roots')
+                self._conn.execute('DELETE FROM params')
+            elif not self.resume:
+                self._conn.execute('DELETE FROM roots')
+            self._conn.executemany('INSERT OR REPLACE INTO params (key, value) VALUES (?, ?)',
+                                   [(key, json.dumps(value)) for key, value in params.items()])
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)", (fingerprint,))
+
+    def reset(self):
+        """Empty the checkpoint once its scan has completed; there is nothing left to resume."""
+        with self._lock, self._conn:
+            self._pending.clear()
+            for table in ('files', 'roots', 'params', 'meta'):
+                self._conn.execute(f'DELETE FROM {table}')
+
+    def lookup(self, abs_path, statinfo, use_checksum=False, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """
+        Return the checkpointed ImageData of an unchanged file, or None.
+
+        Args:
+            abs_path: Absolute path of the file
+            statinfo: Current os.stat_result; size, mtime and inode must match the checkpoint
+            use_checksum: If True, only an entry with a checksum of hash_algorithm is returned
+            hash_algorithm: Digest algorithm of the scan
+        """
+        with self._lock:
+            row = self._pending.get(abs_path)
+            if row is None:
+                row = self._conn.execute(
+                    'SELECT dev, ino, size, mtime_ns, exif_date, checksum, algorithm FROM files WHERE path=?',
+                    (abs_path,)
+                ).fetchone()
+        if row is None or tuple(row[:4]) != _stat_key(statinfo):
+            return None
+        if use_checksum and (row[5] is None or row[6] != hash_algorithm):
+            return None
+        self.hits += 1
+        return _image_data(abs_path, row, use_checksum, hash_algorithm)
+
+    def record(self, img_data, statinfo):
+        """Add a completed file; a checkpoint is written when the interval or batch size is reached."""
+        checksum = getattr(img_data, '_checksum', None)
+        row = _stat_key(statinfo) + (img_data.exif_date, checksum,
+                                     getattr(img_data, 'algorithm', None) if checksum is not None else None)
+        with self._lock:
+            self._pending[img_data.path] = row
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.interval):
+                self._flush_locked()
+
+    def mark_root_done(self, root):
+        """Record that every file below root is in the checkpoint."""
+        with self._lock:
+            self._flush_locked(done_root=os.path.abspath(root))
+
+    def root_done(self, root):
+        """True if root was fully processed before."""
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM roots WHERE path=?', (os.path.abspath(root),)).fetchone() is not None
+
+    def root_files(self, root):
+        """
+        Stream the checkpointed paths below a finished root (verify each with lookup).
+
+        Yields:
+            Absolute paths, in sorted order
+        """
+        prefix = os.path.join(os.path.abspath(root), '')
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            self._flush_locked()
+        last = prefix
+        while True:
+            # Paths are the TEXT primary key, so each page is an index range scan
+            with self._lock:
+                page = [row[0] for row in self._conn.execute(
+                    'SELECT path FROM files WHERE path > ? AND path < ? ORDER BY path LIMIT ?',
+                    (last, end, self.batch_size))]
+            if not page:
+                return
+            yield from page
+            last = page[-1]
+
+    def flush(self):
+        """Write a checkpoint of everything recorded so far."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self, done_root=None):
+        with self._conn:
+            if self._pending:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO files (path, dev, ino, size, mtime_ns, exif_date, checksum, algorithm)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(path,) + row for path, row in self._pending.items()]
+                )
+            if done_root is not None:
+                self._conn.execute('INSERT OR IGNORE INTO roots (path) VALUES (?)', (done_root,))
+        self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        """Number of completed files in the checkpoint."""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def discard(self):
+        """Close and delete the checkpoint (e.g. once the scan result is saved)."""
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.filepath + suffix):
+                os.remove(self.filepath + suffix)
+
+
+def _params_fingerprint(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _stat_key(statinfo):
+    return (statinfo.st_dev, statinfo.st_ino, statinfo.st_size, statinfo.st_mtime_ns)
+
+
+def _image_data(abs_path, row, use_checksum, hash_algorithm):
+    _, _, size, mtime_ns, exif_date, checksum, _ = row
+    if use_checksum:
+        # Import here to avoid circular dependency
+        from .ChecksumImageData import ChecksumImageData
+        return ChecksumImageData(abs_path, None, size, None, exif_date, checksum, hash_algorithm, mtime_ns=mtime_ns)
+    from .ImageData import ImageData
+    return ImageData(abs_path, None, size, None, exif_date, mtime_ns=mtime_ns)
@@ -0,0 +1,95 @@
+import os
+import struct
+from PIL import Image
+from .exif import _STANDALONE_MARKERS
+from .hashing import DEFAULT_HASH_ALGORITHM, new_hasher, update_from_file
+
+# Metadata-only JPEG segments: APP0-APP15 (EXIF, XMP, ICC, ...) and comments
+_METADATA_MARKERS = set(range(0xE0, 0xF0)) | {0xFE}
+SOS = 0xDA
+EOI = b'\xff\xd9'
+
+# Bytes at the end of a JPEG searched for the EOI marker (skips vendor trailers)
+EOI_SEARCH_SIZE = 64 * 1024
+
+
+def content_digest(filepath, algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Digest the image content of a file, ignoring metadata.
+
+    For JPEG no pixels are decoded: the segment headers are walked, metadata
+    segments (APPn, COM) are skipped, and the segments that define decoding
+    (quantization and Huffman tables, frame header, restart interval) are
+    hashed together with the entropy-coded data from the first SOS marker up to
+    EOI. Retagging a photo therefore leaves the digest unchanged, at close to
+    raw read speed. Other formats fall back to hashing the decoded pixels.
+
+    Args:
+        filepath: Path to the image file
+        algorithm: One of data.hashing.HASH_ALGORITHMS
+
+    Returns:
+        Hexadecimal digest string
+
+    Raises:
+        PIL.UnidentifiedImageError: If the file is not an image
+    """
+    with open(filepath, 'rb') as f:
+        if f.read(2) == b'\xff\xd8':
+            hasher = new_hasher(algorithm)
+            if _hash_jpeg_image_data(f, hasher):
+                return hasher.hexdigest()
+    return _pixel_digest(filepath, algorithm)
+
+
+def _hash_jpeg_image_data(f, hasher):
+    """Hash decoding segments and scan data of a JPEG; returns False if the structure is malformed."""
+    while True:
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return False
+        marker = header[1]
+        if marker == 0xFF:
+            # Fill byte, resynchronize on the next one
+            f.seek(-3, 1)
+            continue
+        if marker in _STANDALONE_MARKERS:
+            f.seek(-2, 1)
+            continue
+        if marker == 0xD9:
+            return False # EOI before any scan
+        if marker == SOS:
+            start = f.tell() - 4
+            end = _find_eoi(f, start)
+            return update_from_file(hasher, f, start, end - start) == end - start
+
+        length = struct.unpack('>H', header[2:])[0]
+        if length < 2:
+            return False
+        if marker in _METADATA_MARKERS:
+            f.seek(length - 2, 1)
+            continue
+        segment = f.read(length - 2)
+        if len(segment) < length - 2:
+            return False
+        hasher.update(header)
+        hasher.update(segment)
+
+
+def _find_eoi(f, start):
+    """Offset just past the last EOI marker near the end of the file (or the file end)."""
+    size = os.fstat(f.fileno()).st_size
+    tail_start = max(start, size - EOI_SEARCH_SIZE)
+    f.seek(tail_start)
+    pos = f.read().rfind(EOI)
+    return tail_start + pos + 2 if pos >= 0 else size
+
+
+def _pixel_digest(filepath, algorithm):
+    """Hash the decoded pixel buffer together with mode and dimensions."""
+    hasher = new_hasher(algorithm)
+    with Image.open(filepath) as img:
+        img.load()
+        hasher.update(f"{img.mode}:{img.width}x{img.height}:".encode('ascii'))
+        hasher.update(img.tobytes())
+    return hasher.hexdigest()
@@ -0,0 +1,222 @@
+import struct
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+# TIFF tags needed to reach DateTimeOriginal
+EXIF_IFD_POINTER = 0x8769
+DATE_TIME_ORIGINAL = 0x9003
+
+# Largest possible JPEG segment (length field is 16 bit)
+MAX_SEGMENT_SIZE = 0xFFFF
+# JPEG markers without a length field
+_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7}
+_MAX_IFD_ENTRIES = 1024
+
+
+class UnsupportedFormat(Exception):
+    """Raised when the fast parser does not understand the file format."""
+    pass
+
+
+class InvalidJpeg(Exception):
+    """Raised when the JPEG marker structure is broken before the start of scan."""
+    pass
+
+
+class TruncatedData(InvalidJpeg):
+    """Raised when the data ends inside the JPEG segments the parser has to read."""
+    pass
+
+
+def read_exif_date(path):
+    """
+    Read EXIF DateTimeOriginal without decoding the whole EXIF block.
+
+    Only JPEG and TIFF files are understood. For JPEG, the parser walks segment
+    headers up to the start of scan, reading just the APP1 "Exif" segment; for
+    TIFF it seeks straight through IFD0 to the Exif IFD. Only tag 0x9003 is decoded.
+
+    Args:
+        path: Path to the image file
+
+    Returns:
+        DateTimeOriginal string (e.g. "2023:12:31 14:30:00"), or None if absent or malformed
+
+    Raises:
+        UnsupportedFormat: If the file is neither JPEG nor TIFF
+    """
+    with open(path, 'rb') as f:
+        try:
+            return read_exif_date_from(f, path)
+        except InvalidJpeg:
+            return None  # Broken or truncated JPEG
+
+
+def read_exif_date_from(f, name=None):
+    """
+    Same as read_exif_date, for an already opened binary file object.
+
+    The file object only needs read/seek, so an io.BytesIO holding the first
+    bytes of a JPEG (see HEADER_READ_SIZE in data.workers) works as well.
+
+    Raises:
+        UnsupportedFormat: If the data is neither JPEG nor TIFF
+        InvalidJpeg: If the JPEG segments before the start of scan are broken
+        TruncatedData: If the JPEG data ends before the start of scan, e.g. because
+            only the first bytes of a larger file were given (an InvalidJpeg)
+    """
+    head = f.read(4)
+    if head[:2] == b'\xff\xd8':
+        tiff = _find_jpeg_exif(f)
+        if tiff is None:
+            return None
+        return _find_date_in_tiff(lambda offset, size: tiff[offset:offset + size])
+    if head in (b'II*\x00', b'MM\x00*'):
+        def read_at(offset, size):
+            f.seek(offset)
+            return f.read(size)
+        return _find_date_in_tiff(read_at)
+    raise UnsupportedFormat(name)
+
+
+def read_exif_date_pillow(path):
+    """
+    Read EXIF DateTimeOriginal through Pillow's full EXIF decode.
+
+    Used as the fallback for formats the fast parser does not understand.
+
+    Raises:
+        PIL.UnidentifiedImageError: If the file is not an image
+    """
+    with Image.open(path) as img:
+        try:
+            exif_data = img._getexif()
+            if exif_data:
+                for tag, value in exif_data.items():
+                    if TAGS.get(tag) == 'DateTimeOriginal':
+                        return value
+        except Exception:
+            pass # EXIF extraction failed, treat as None
+    return None
+
+
+def get_exif_date(path):
+    """
+    Read EXIF DateTimeOriginal, using the fast parser and falling back to Pillow.
+
+    Pillow also decides about JPEGs whose segments the fast parser cannot walk
+    to the start of scan, so corrupt and truncated files are rejected as before.
+
+    Raises:
+        PIL.UnidentifiedImageError: If the file is not an image
+    """
+    try:
+        with open(path, 'rb') as f:
+            return read_exif_date_from(f, path)
+    except (UnsupportedFormat, InvalidJpeg):
+        return read_exif_date_pillow(path)
+
+
+def _find_jpeg_exif(f):
+    """
+    Walk JPEG segment headers to the start of scan and return the TIFF block of
+    the Exif APP1 segment (None if there is none).
+
+    Reaching the start of scan through well-formed segments is the cheap
+    validity check that stands in for Pillow opening the file.
+    """
+    f.seek(2)
+    tiff = None
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            raise TruncatedData("JPEG data ends before the start of scan")
+        if header[0] != 0xFF:
+            raise InvalidJpeg("JPEG marker expected")
+        marker = header[1]
+        if marker == 0xFF:
+            # Fill byte, resynchronize on the next one
+            f.seek(-3, 1)
+            continue
+        if marker in _STANDALONE_MARKERS:
+            f.seek(-2, 1)
+            continue
+        if marker == 0xDA:
+            # Start of scan: metadata segments come before this
+            return tiff
+        if marker == 0xD9:
+            raise InvalidJpeg("JPEG ends before the start of scan")
+        length = struct.unpack('>H', header[2:])[0]
+        if length < 2:
+            raise InvalidJpeg("JPEG segment length out of range")
+        if marker == 0xE1 and tiff is None:
+            segment = f.read(min(length - 2, MAX_SEGMENT_SIZE))
+            if len(segment) < length - 2:
+                raise TruncatedData("JPEG data ends inside the APP1 segment")
+            if segment[:6] == b'Exif\x00\x00':
+                tiff = segment[6:]
+        else:
+            f.seek(length - 2, 1)
+
+
+def _find_date_in_tiff(read_at):
+    """Follow IFD0 -> Exif IFD -> DateTimeOriginal in a TIFF structure."""
+    header = read_at(0, 8)
+    if len(header) < 8:
+        return None
+    if header[:2] == b'II':
+        endian = '<'
+    elif header[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+
+    ifd0_offset = struct.unpack(endian + 'I', header[4:8])[0]
+    entry = _find_ifd_entry(read_at, endian, ifd0_offset, (EXIF_IFD_POINTER, DATE_TIME_ORIGINAL))
+    if entry is None:
+        return None
+    if entry[0] == EXIF_IFD_POINTER:
+        exif_offset = _entry_value(read_at, endian, entry)
+        if not isinstance(exif_offset, int):
+            return None
+        entry = _find_ifd_entry(read_at, endian, exif_offset, (DATE_TIME_ORIGINAL,))
+        if entry is None:
+            return None
+
+    value = _entry_value(read_at, endian, entry)
+    return value if isinstance(value, str) and value else None
+
+
+def _find_ifd_entry(read_at, endian, offset, wanted):
+    """Return (tag, type, count, raw_value) of the first entry in the IFD whose tag is wanted."""
+    count_data = read_at(offset, 2)
+    if len(count_data) < 2:
+        return None
+    count = struct.unpack(endian + 'H', count_data)[0]
+    if count > _MAX_IFD_ENTRIES:
+        return None
+
+    entries = read_at(offset + 2, count * 12)
+    if len(entries) < count * 12:
+        return None
+    for i in range(count):
+        tag, typ, n = struct.unpack_from(endian + 'HHI', entries, i * 12)
+        if tag in wanted:
+            return tag, typ, n, entries[i * 12 + 8:i * 12 + 12]
+    return None
+
+
+def _entry_value(read_at, endian, entry):
+    """Decode an ASCII or LONG/SHORT IFD entry value."""
+    tag, typ, n, raw = entry
+    if typ == 4:
+        return struct.unpack(endian + 'I', raw)[0]
+    if typ == 3:
+        return struct.unpack(endian + 'H', raw[:2])[0]
+    if typ != 2:
+        return None
+
+    # ASCII values are one byte per character and stored inline when they fit
+    data = raw[:n] if n <= 4 else read_at(struct.unpack(endian + 'I', raw)[0], n)
+    # Same as Pillow: latin-1 decode without the NUL terminator
+    return data.split(b'\x00', 1)[0].decode('latin-1', 'replace')
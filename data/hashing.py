@@ -0,0 +1,178 @@
+import hashlib
+import mmap
+import os
+import threading
+
+# Supported digest algorithms. MD5 stays the default so older results remain comparable.
+HASH_ALGORITHMS = ('md5', 'sha256', 'blake2b', 'blake2s')
+DEFAULT_HASH_ALGORITHM = 'md5'
+
+# Prefix marking a metadata-insensitive image content digest (e.g. 'content-md5', see data.content)
+CONTENT_PREFIX = 'content-'
+
+# Read buffer for the readinto() loop, allocated once per thread
+BUFFER_SIZE = 1024 * 1024
+
+# Files at least this large are hashed from a memory map instead of buffered reads
+# (see benchmarks/bench_hashing.py for the crossover on a given machine)
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# Bytes of the mapping handed to the hasher per update() call
+MMAP_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Bytes hashed from each end of a file for the partial (pre-filter) digest
+PARTIAL_BLOCK_SIZE = 64 * 1024
+
+_buffers = threading.local()
+
+
+def new_hasher(algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Create a hashlib object for one of HASH_ALGORITHMS.
+
+    Raises:
+        ValueError: If the algorithm is not supported
+    """
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}. Expected one of {HASH_ALGORITHMS}")
+    return hashlib.new(algorithm)
+
+
+def content_algorithm(algorithm=DEFAULT_HASH_ALGORITHM):
+    """Return the name of the image content digest built on algorithm (e.g. 'content-md5')."""
+    new_hasher(algorithm)  # validate
+    return CONTENT_PREFIX + algorithm
+
+
+def is_content_algorithm(algorithm):
+    """True if algorithm names an image content digest rather than a whole-file digest."""
+    return bool(algorithm) and algorithm.startswith(CONTENT_PREFIX)
+
+
+def file_digest(filepath, algorithm=DEFAULT_HASH_ALGORITHM, mmap_threshold=MMAP_THRESHOLD):
+    """
+    Calculate the digest of a whole file.
+
+    Files of at least mmap_threshold bytes are memory-mapped and the mapping is
+    fed to the hasher directly, so no bytes are copied into Python buffers.
+    Smaller files, and files that cannot be mapped, use hashlib.file_digest
+    (Python 3.11+), which hashes straight from the file descriptor into a reused
+    buffer. On older versions a per-thread preallocated buffer is filled with
+    readinto() and passed to the hasher through a memoryview, so no bytes object
+    is created per chunk.
+
+    Content algorithms (see content_algorithm) are delegated to
+    data.content.content_digest.
+
+    Args:
+        filepath: Path to the file
+        algorithm: One of HASH_ALGORITHMS, or a content algorithm
+        mmap_threshold: Minimum size in bytes for the mmap path (None disables it)
+
+    Returns:
+        Hexadecimal digest string
+    """
+    if is_content_algorithm(algorithm):
+        from .content import content_digest
+        return content_digest(filepath, algorithm[len(CONTENT_PREFIX):])
+
+    hasher = new_hasher(algorithm)
+    with open(filepath, 'rb', buffering=0) as f:
+        if mmap_threshold is not None:
+            size = os.fstat(f.fileno()).st_size
+            if size and size >= mmap_threshold:
+                digest = _mmap_digest(f, hasher)
+                if digest is not None:
+                    return digest
+                hasher = new_hasher(algorithm)
+                f.seek(0)
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, lambda: hasher).hexdigest()
+        view = _buffer()
+        while n := f.readinto(view):
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def _mmap_digest(f, hasher):
+    """Hash a file through a read-only mapping; returns None if it cannot be mapped."""
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None # e.g. pipes, some network file systems
+    with mapped:
+        if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            # Read-ahead aggressively and drop pages behind us
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        try:
+            for offset in range(0, len(view), MMAP_CHUNK_SIZE):
+                hasher.update(view[offset:offset + MMAP_CHUNK_SIZE])
+        finally:
+            # The mapping cannot be closed while a view still exports it
+            view.release()
+    return hasher.hexdigest()
+
+
+def update_from_file(hasher, f, offset, length):
+    """
+    Feed length bytes of a binary file, starting at offset, to a hasher.
+
+    Uses the same per-thread readinto() buffer as file_digest.
+
+    Returns:
+        Number of bytes hashed (less than length if the file is shorter)
+    """
+    f.seek(offset)
+    view = _buffer()
+    remaining = length
+    while remaining > 0:
+        n = f.readinto(view[:min(remaining, len(view))])
+        if not n:
+            break
+        hasher.update(view[:n])
+        remaining -= n
+    return length - remaining
+
+
+def _buffer():
+    view = getattr(_buffers, 'view', None)
+    if view is None:
+        view = _buffers.view = memoryview(bytearray(BUFFER_SIZE))
+    return view
+
+
+def partial_checksum(filepath, size=None, block_size=PARTIAL_BLOCK_SIZE, algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Calculate a cheap digest over the first and last block_size bytes of a file.
+
+    Files no larger than 2 * block_size are hashed completely, in which case the
+    result equals the full-content checksum.
+
+    Args:
+        filepath: Path to the file
+        size: File size in bytes (stat'ed if None)
+        block_size: Bytes read from each end of the file
+        algorithm: One of HASH_ALGORITHMS
+
+    Returns:
+        Tuple (hexdigest, bytes_read), or (None, 0) if error
+    """
+    try:
+        if size is None:
+            size = os.path.getsize(filepath)
+        hasher = new_hasher(algorithm)
+        with open(filepath, 'rb') as f:
+            if size <= 2 * block_size:
+                data = f.read()
+                hasher.update(data)
+                return hasher.hexdigest(), len(data)
+            head = f.read(block_size)
+            f.seek(-block_size, os.SEEK_END)
+            tail = f.read(block_size)
+        hasher.update(head)
+        hasher.update(tail)
+        return hasher.hexdigest(), len(head) + len(tail)
+    except Exception as e:
+        print(f"Error calculating partial checksum for {filepath}: {e}")
+        return None, 0
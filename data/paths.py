@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Directory name below the per-user cache/data directories
+APP_DIR_NAME = 'duplicate-image-finder'
+
+
+def user_cache_dir():
+    """
+    Return the per-user cache directory of the application (not created).
+
+    Uses %LOCALAPPDATA% on Windows, ~/Library/Caches on macOS and
+    $XDG_CACHE_HOME (default ~/.cache) elsewhere.
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        return os.path.join(base, APP_DIR_NAME, 'Cache')
+    if sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, APP_DIR_NAME)
+
+
+
+def user_data_dir():
+    """
+    Return the per-user data directory of the application (not created).
+
+    Uses %LOCALAPPDATA% on Windows, ~/Library/Application Support on macOS
+    and $XDG_DATA_HOME (default ~/.local/share) elsewhere.
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        return os.path.join(base, APP_DIR_NAME, 'Data')
+    if sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Application Support'))
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser(os.path.join('~', '.local', 'share'))
+    return os.path.join(base, APP_DIR_NAME)
@@ -0,0 +1,237 @@
+import numpy as np
+from PIL import Image
+from .PerceptualImageData import PerceptualImageData
+from .exif import get_exif_date
+from .staged import zip_results
+
+# Perceptual hash methods
+METHOD_DHASH = 'dhash'   # gradient sign between neighbouring pixels, cheapest
+METHOD_PHASH = 'phash'   # low-frequency DCT coefficients, more robust to recompression
+PERCEPTUAL_METHODS = (METHOD_DHASH, METHOD_PHASH)
+DEFAULT_PERCEPTUAL_METHOD = METHOD_PHASH
+
+# Hashes are 8x8 bits
+HASH_SIZE = 8
+# pHash takes the DCT of a 32x32 thumbnail
+PHASH_IMAGE_SIZE = 32
+
+# JPEG draft decoding stops at this multiple of the hash grid, so the final
+# downscale is an area average over several decoded pixels
+DRAFT_OVERSAMPLE = 4
+
+# Largest Hamming distance (of 64 bits) still treated as the same photo
+DEFAULT_MAX_DISTANCE = 6
+
+_dct_matrix = None
+
+
+def image_hash(path, method=DEFAULT_PERCEPTUAL_METHOD):
+    """
+    Compute the 64-bit perceptual hash of an image.
+
+    JPEGs are decoded in draft mode, i.e. the decoder scales down by up to 8x
+    while decoding, so a full-resolution bitmap is never built. The remaining
+    downscale and the DCT run vectorized in NumPy.
+
+    Args:
+        path: Path to the image file
+        method: One of PERCEPTUAL_METHODS
+
+    Returns:
+        Hash as int, or None if the file cannot be decoded
+    """
+    if method not in PERCEPTUAL_METHODS:
+        raise ValueError(f"Unknown perceptual hash method: {method}. Expected one of {PERCEPTUAL_METHODS}")
+
+    if method == METHOD_DHASH:
+        width, height = HASH_SIZE + 1, HASH_SIZE
+    else:
+        width = height = PHASH_IMAGE_SIZE
+
+    try:
+        pixels = _load_grayscale(path, width, height)
+    except Exception as e:
+        print(f"Error hashing {path}: {e}")
+        return None
+
+    if method == METHOD_DHASH:
+        bits = pixels[:, 1:] > pixels[:, :-1]
+    else:
+        dct = _dct(PHASH_IMAGE_SIZE)
+        low = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE]
+        # The DC term only reflects overall brightness
+        bits = low > np.median(low.ravel()[1:])
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with Hamming distance.
+
+    A search with radius r only descends into children whose edge distance lies
+    within r of the query's distance to the node (triangle inequality), so
+    lookups touch a small part of the tree instead of every stored hash.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, item, {distance: child}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item):
+        """Insert a hash with an associated item."""
+        self._size += 1
+        if self._root is None:
+            self._root = [value, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """
+        Find all stored items within max_distance of value.
+
+        Returns:
+            List of (distance, item), nearest first
+        """
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[1]))
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda match: match[0])
+        return found
+
+
+def find_duplicates_perceptual(items, scan_executor, controller=None, stats=None,
+                               method=DEFAULT_PERCEPTUAL_METHOD, max_distance=DEFAULT_MAX_DISTANCE,
+                               read_exif=False):
+    """
+    Group visually similar images (resized, recompressed or re-exported copies).
+
+    Every image is hashed on the executor. Images are then clustered greedily
+    in path order: each one joins the group of the nearest representative
+    within max_distance, found through a BK-tree of representatives, or starts
+    a new group. Comparing against representatives only keeps groups from
+    chaining into each other. Clustering waits for all hashes, so the groups do
+    not depend on the order in which the workers finish.
+
+    Args:
+        items: Iterable of ImageData, one per file
+        scan_executor: ScanExecutor running the hashing
+        controller: Optional GuiRunController for pause/cancel support
+        stats: Optional ScanStats receiving 'perceptual_hashed' and 'perceptual_failed'
+        method: One of PERCEPTUAL_METHODS
+        max_distance: Largest Hamming distance grouped together
+        read_exif: Also read each file's EXIF date while hashing (for items listed
+                   by a plain walk, without a metadata pass)
+
+    Returns:
+        Tuple of (uniques_list, duplicates_dict) of PerceptualImageData objects;
+        each group is keyed by its representative image
+    """
+    items = sorted(items, key=lambda img: img.path)
+    uniques = []
+    groups = []  # [representative, set of paths]
+    representatives = BKTree()
+    hashed = failed = 0
+
+    hashes = [None] * len(items)
+    exif_dates = [img.exif_date for img in items]
+    fn = _hash_with_exif_date if read_exif else image_hash
+    args_list = [(img.path, method) for img in items]
+    for i, value in zip_results(range(len(items)), scan_executor, fn, args_list, controller):
+        if read_exif:
+            value, exif_dates[i] = value
+        hashes[i] = value
+
+    for img, value, exif_date in zip(items, hashes, exif_dates):
+        if value is None:
+            failed += 1
+            uniques.append(_with_hash(img, None, method, exif_date))
+            continue
+        hashed += 1
+
+        matches = representatives.search(value, max_distance)
+        if matches:
+            groups[matches[0][1]][1].add(img.path)
+        else:
+            representatives.add(value, len(groups))
+            groups.append([_with_hash(img, value, method, exif_date), {img.path}])
+
+    duplicates = {}
+    for representative, paths in groups:
+        if len(paths) > 1:
+            duplicates[representative] = paths
+        else:
+            uniques.append(representative)
+
+    if stats:
+        stats.add('perceptual_hashed', hashed)
+        stats.add('perceptual_failed', failed)
+
+    return uniques, duplicates
+
+
+def _hash_with_exif_date(path, method):
+    """image_hash plus the file's EXIF date (None if it has none or cannot be read)."""
+    value = image_hash(path, method)
+    try:
+        exif_date = get_exif_date(path) if value is not None else None
+    except Exception:
+        exif_date = None
+    return value, exif_date
+
+
+def _with_hash(img, value, method, exif_date):
+    return PerceptualImageData(img.path, None, img.size, img.filename, exif_date, value, method,
+                               mtime_ns=img.mtime_ns)
+
+
+def _load_grayscale(path, width, height):
+    """Decode an image as a height x width float array of luminance values."""
+    with Image.open(path) as img:
+        # JPEG only: let the decoder scale down, keeping DRAFT_OVERSAMPLE x the target size
+        img.draft('L', (width * DRAFT_OVERSAMPLE, height * DRAFT_OVERSAMPLE))
+        gray = img.convert('L')
+    if gray.width < width or gray.height < height:
+        gray = gray.resize((max(gray.width, width), max(gray.height, height)), Image.NEAREST)
+    return _area_resize(np.asarray(gray, dtype=np.float32), width, height)
+
+
+def _area_resize(pixels, width, height):
+    """Downscale by averaging each output pixel's source area (rows, then columns)."""
+    rows = np.arange(height) * pixels.shape[0] // height
+    pixels = np.add.reduceat(pixels, rows, axis=0) / np.diff(np.append(rows, pixels.shape[0]))[:, None]
+    cols = np.arange(width) * pixels.shape[1] // width
+    return np.add.reduceat(pixels, cols, axis=1) / np.diff(np.append(cols, pixels.shape[1]))[None, :]
+
+
+def _dct(n):
+    """Orthonormal DCT-II matrix of size n x n (built once)."""
+    global _dct_matrix
+    if _dct_matrix is None or _dct_matrix.shape[0] != n:
+        k = np.arange(n)[:, None]
+        x = np.arange(n)[None, :]
+        matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+        matrix[0] /= np.sqrt(2.0)
+        _dct_matrix = matrix.astype(np.float32)
+    return _dct_matrix
@@ -0,0 +1,173 @@
+import concurrent.futures
+import os
+from .ChecksumImageData import ChecksumImageData
+from .GroupingIndex import GroupingIndex
+from .hashing import DEFAULT_HASH_ALGORITHM, file_digest, partial_checksum, PARTIAL_BLOCK_SIZE
+
+
+def find_duplicates_staged(items, scan_executor, controller=None, stats=None, block_size=PARTIAL_BLOCK_SIZE,
+                           hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Find content duplicates with as little reading as possible.
+
+    Stage 1 groups files by size: a file with a unique size cannot have a content
+    duplicate and is never read. Stage 2 computes a partial digest (first and last
+    block_size bytes) only inside size collisions. Stage 3 computes the full
+    checksum only inside partial-digest collisions. The final groups are the same
+    as in checksum mode.
+
+    ChecksumImageData items of hash_algorithm are results of an earlier staged
+    detection (e.g. carried over by an incremental scan) and are not read again
+    where avoidable: a size bucket holding only such items was compared before
+    and is kept as it is. In a bucket with new files, items with a digest keep
+    it and the other files are hashed in full, since a partial digest cannot be
+    compared to a full one.
+
+    Args:
+        items: Iterable of ImageData (or ChecksumImageData from an earlier detection), one per file
+        scan_executor: ScanExecutor running the hashing stages
+        controller: Optional GuiRunController for pause/cancel support
+        stats: Optional ScanStats receiving byte counters per stage
+        block_size: Bytes read from each end of a file for the partial digest
+        hash_algorithm: Digest algorithm for the partial and full digests
+
+    Returns:
+        Tuple of (uniques_list, duplicates_dict) of ChecksumImageData objects; uniques
+        that were never fully read carry no checksum
+    """
+    uniques = []
+    total_bytes = 0
+    avoided_by_size = 0
+    avoided_by_partial = 0
+    read_partial = 0
+    read_full = 0
+
+    # Stage 1: bucket by size
+    by_size = {}
+    for img in items:
+        by_size.setdefault(img.size, []).append(img)
+
+    size_candidates = []
+    hashed = []
+    full_candidates = []
+    for size, group in by_size.items():
+        total_bytes += size * len(group)
+        if len(group) == 1 and not _is_earlier(group[0], hash_algorithm):
+            uniques.append(_with_checksum(group[0], None, hash_algorithm))
+            avoided_by_size += size
+        elif all(_is_earlier(img, hash_algorithm) for img in group):
+            avoided_by_size += size * len(group)
+            for img in group:
+                (uniques if img._digest is None else hashed).append(img)
+        elif any(_is_earlier(img, hash_algorithm) and img._digest is not None for img in group):
+            for img in group:
+                known = _is_earlier(img, hash_algorithm) and img._digest is not None
+                (hashed if known else full_candidates).append(img)
+        else:
+            size_candidates.extend(group)
+
+    # Stage 2: partial digest inside size collisions
+    by_partial = {}
+    partial_args = [(img.path, img.size, block_size, hash_algorithm) for img in size_candidates]
+    for img, (digest, bytes_read) in zip_results(size_candidates, scan_executor, partial_checksum,
+                                                 partial_args, controller):
+        read_partial += bytes_read
+        if digest is None:
+            uniques.append(_with_checksum(img, None, hash_algorithm))
+            continue
+        by_partial.setdefault((img.size, digest), []).append(img)
+
+    for (size, digest), group in by_partial.items():
+        if len(group) == 1:
+            uniques.append(_with_checksum(group[0], None, hash_algorithm))
+            avoided_by_partial += max(size - 2 * block_size, 0)
+        elif size <= 2 * block_size:
+            # The partial digest already covered the whole file
+            hashed.extend(_with_checksum(img, digest, hash_algorithm) for img in group)
+        else:
+            full_candidates.extend(group)
+
+    # Stage 3: full checksum inside partial collisions
+    full_args = [(img.path, hash_algorithm, scan_executor.checksum_cache) for img in full_candidates]
+    for img, (checksum, bytes_read) in zip_results(full_candidates, scan_executor, _full_checksum,
+                                                   full_args, controller):
+        read_full += bytes_read
+        hashed.append(_with_checksum(img, checksum, hash_algorithm))
+
+    found_files = GroupingIndex(shard_count=1)
+    for img in hashed:
+        if img._checksum is None:
+            uniques.append(img)
+        else:
+            found_files.add(img)
+    uniques.extend(found_files.uniques())
+    duplicates = found_files.duplicates()
+
+    if stats:
+        stats.add('bytes_total', total_bytes)
+        stats.add('bytes_read_partial', read_partial)
+        stats.add('bytes_read_full', read_full)
+        stats.add('bytes_avoided_by_size', avoided_by_size)
+        stats.add('bytes_avoided_by_partial', avoided_by_partial)
+
+    return uniques, duplicates
+
+
+def zip_results(items, scan_executor, fn, args_list, controller=None):
+    """
+    Run fn(*args) on the executor for every item and yield (item, result) as they finish.
+
+    At most scan_executor.max_pending calls are in flight at any time.
+    """
+    pending = {}
+    for item, args in zip(items, args_list):
+        if len(pending) >= scan_executor.max_pending:
+            yield from _take_done(pending, controller)
+        pending[scan_executor.submit_call(fn, *args)] = item
+    while pending:
+        yield from _take_done(pending, controller)
+
+
+def _take_done(pending, controller):
+    while True:
+        if controller:
+            controller.check()
+        done, _ = concurrent.futures.wait(pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED)
+        if done:
+            break
+    for future in done:
+        item = pending.pop(future)
+        yield item, future.result()
+
+
+def _full_checksum(filepath, hash_algorithm, cache=None):
+    """
+    Calculate the full checksum of a file, answered from cache if it knows the file.
+
+    Returns:
+        Tuple (checksum, bytes_read); bytes_read is 0 if the checksum came from
+        the cache, and (None, 0) if error
+    """
+    try:
+        if cache is not None:
+            # Stat before hashing: a file modified meanwhile gets a key that no longer matches
+            statinfo = os.stat(filepath)
+            checksum = cache.lookup(statinfo, hash_algorithm)
+            if checksum is not None:
+                return checksum, 0
+        checksum = file_digest(filepath, hash_algorithm)
+        if cache is not None:
+            cache.store(filepath, statinfo, hash_algorithm, checksum)
+        return checksum, os.path.getsize(filepath)
+    except Exception as e:
+        print(f"Error calculating checksum for {filepath}: {e}")
+        return None, 0
+
+
+def _is_earlier(img, hash_algorithm):
+    return isinstance(img, ChecksumImageData) and img.algorithm == hash_algorithm
+
+
+def _with_checksum(img, checksum, hash_algorithm):
+    return ChecksumImageData(img.path, None, img.size, img.filename, img.exif_date, checksum, hash_algorithm,
+                             mtime_ns=img.mtime_ns)
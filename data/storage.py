@@ -1,21 +1,35 @@
 
 import json
 import os
-from typing import Dict, List, Set, Tuple, Optional
+import types
+from typing import Dict, Iterator, List, Set, Tuple, Optional
 from . import ImageData as ImgData
-from .ScanResult import ScanResult
+from .ScanResult import ScanResult, MODE_METADATA, MODE_PERCEPTUAL
+from .hashing import DEFAULT_HASH_ALGORITHM
+from .binary_format import BINARY_EXTENSION, is_binary_file, open_binary, write_binary
+from .catalog import ScanCatalog
 
 class ScanResultStorage:
-    """Manages persistent storage of ScanResult objects in JSON format."""
+    """
+    Manages persistent storage of ScanResult objects.
+    
+    Results are saved as JSON, or in the memory-mapped binary format (see
+    data.binary_format) when the file name ends with BINARY_EXTENSION.
+    Loading detects the format from the file itself.
+    """
     
     DEFAULT_STORAGE_PATH = os.path.join(os.path.dirname(__file__), 'scan_results.json')
     
+    # Top-level arrays that are read and written one element at a time
+    _STREAMED_ARRAYS = ('uniques', 'duplicates', 'hardlinks', 'directories')
+    
     @staticmethod
     def _serialize_image_data(img_data):
         """Convert ImageData object to dictionary for JSON serialization."""
         data = {
             'path': img_data.path,
             'date': img_data.date,
+            'mtime_ns': img_data.mtime_ns,
             'size': img_data.size,
             'filename': img_data.filename,
             'exif_date': img_data.exif_date
@@ -25,13 +39,30 @@ class ScanResultStorage:
         if hasattr(img_data, '_checksum') and img_data._checksum is not None:
             data['checksum'] = img_data._checksum
         
+        # Include perceptual hash if available (for PerceptualImageData)
+        if getattr(img_data, 'perceptual_hash', None) is not None:
+            data['perceptual_hash'] = f"{img_data.perceptual_hash:016x}"
+            data['perceptual_method'] = img_data.method
+        
         return data
     
     @staticmethod
-    def _deserialize_image_data(data_dict):
+    def _deserialize_image_data(data_dict, hash_algorithm=DEFAULT_HASH_ALGORITHM):
         """Create ImageData or ChecksumImageData object from dictionary."""
+        if data_dict.get('perceptual_hash') is not None:
+            from .PerceptualImageData import PerceptualImageData
+            return PerceptualImageData(
+                path=data_dict.get('path'),
+                date=data_dict.get('date'),
+                size=data_dict.get('size'),
+                filename=data_dict.get('filename'),
+                exif_date=data_dict.get('exif_date'),
+                perceptual_hash=int(data_dict['perceptual_hash'], 16),
+                method=data_dict.get('perceptual_method'),
+                mtime_ns=data_dict.get('mtime_ns')
+            )
         # Check if this is checksum-based data
-        if 'checksum' in data_dict and data_dict['checksum'] is not None:
+        elif 'checksum' in data_dict and data_dict['checksum'] is not None:
             from .ChecksumImageData import ChecksumImageData
             return ChecksumImageData(
                 path=data_dict.get('path'),
@@ -39,7 +70,9 @@ class ScanResultStorage:
                 size=data_dict.get('size'),
                 filename=data_dict.get('filename'),
                 exif_date=data_dict.get('exif_date'),
-                checksum=data_dict.get('checksum')
+                checksum=data_dict.get('checksum'),
+                algorithm=hash_algorithm,
+                mtime_ns=data_dict.get('mtime_ns')
             )
         else:
             # Legacy format or metadata-based
@@ -48,17 +81,24 @@ class ScanResultStorage:
                 date=data_dict.get('date'),
                 size=data_dict.get('size'),
                 filename=data_dict.get('filename'),
-                exif_date=data_dict.get('exif_date')
+                exif_date=data_dict.get('exif_date'),
+                mtime_ns=data_dict.get('mtime_ns')
             )
     
     @staticmethod
-    def save_results(scan_result: ScanResult, filepath: str = None) -> bool:
+    def save_results(scan_result: ScanResult, filepath: str = None, indent: Optional[int] = None) -> bool:
         """
         Save ScanResult to JSON file.
         
+        Groups are serialized and written one at a time, so no second copy of
+        the result is built in memory. The file is written next to its target
+        and renamed into place, so a failed save never leaves a truncated file.
+        
         Args:
             scan_result: ScanResult object to save
-            filepath: Path to save file (uses default if None)
+            filepath: Path to save file (uses default if None); a BINARY_EXTENSION
+                      file name selects the binary format
+            indent: Optional indentation for human-readable JSON (compact if None)
             
         Returns:
             True if save successful, False otherwise
@@ -66,49 +106,116 @@ class ScanResultStorage:
         if filepath is None:
             filepath = ScanResultStorage.DEFAULT_STORAGE_PATH
         
+        tmp_path = filepath + '.tmp'
         try:
-            # Prepare data structure for JSON
-            data = {
-                'version': '2.0', # Version bumped for ScanResult support
-                'metadata': {
-                    'timestamp': scan_result.timestamp,
-                    'scanned_paths': scan_result.scanned_paths,
-                    'extension': scan_result.extension,
-                    'detection_mode': scan_result.detection_mode
-                },
-                'uniques': [],
-                'duplicates': []
+            metadata = {
+                'timestamp': scan_result.timestamp,
+                'scanned_paths': scan_result.scanned_paths,
+                'extension': scan_result.extension,
+                'detection_mode': scan_result.detection_mode,
+                'hash_algorithm': scan_result.hash_algorithm,
+                'base_filtered': scan_result.base_filtered
             }
+            # Unique items have a single path
+            uniques = ({'image_data': ScanResultStorage._serialize_image_data(img), 'paths': [img.path]}
+                       for img in scan_result.uniques)
+            duplicates = ({'image_data': ScanResultStorage._serialize_image_data(img_data), 'paths': list(paths)}
+                          for img_data, paths in scan_result.duplicates.items())
+            hardlinks = ({'path': path, 'links': sorted(links)} for path, links in scan_result.hardlinks.items())
+            directories = ({'path': path, 'mtime_ns': mtime_ns, 'entries': entries}
+                           for path, (mtime_ns, entries) in scan_result.directory_fingerprints.items())
             
-            # Serialize uniques
-            for img in scan_result.uniques:
-                data['uniques'].append({
-                    'image_data': ScanResultStorage._serialize_image_data(img),
-                    'paths': [img.path]  # Unique items have single path
-                })
-            
-            # Serialize duplicates
-            for img_data, paths in scan_result.duplicates.items():
-                data['duplicates'].append({
-                    'image_data': ScanResultStorage._serialize_image_data(img_data),
-                    'paths': list(paths)  # Convert set to list for JSON
-                })
-            
-            # Write to file with pretty formatting for readability
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            if filepath.endswith(BINARY_EXTENSION):
+                write_binary(scan_result, tmp_path)
+                os.replace(tmp_path, filepath)
+                return True
             
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # Metadata goes first so readers can decode the groups as they stream in
+                ScanResultStorage._write_document(f, [
+                    ('version', '2.0'), # Version bumped for ScanResult support
+                    ('metadata', metadata),
+                    ('uniques', uniques),
+                    ('duplicates', duplicates),
+                    ('hardlinks', hardlinks),
+                    ('directories', directories)
+                ], indent)
+            os.replace(tmp_path, filepath)
             return True
             
         except Exception as e:
             print(f"Error saving results to storage: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return False
     
+    @staticmethod
+    def _write_document(f, members, indent=None):
+        """Write a JSON object member by member; generator values are streamed out as arrays."""
+        item_sep = ',\n' if indent is not None else ','
+        f.write('{')
+        for i, (key, value) in enumerate(members):
+            f.write(f'{"," if i else ""}{json.dumps(key)}:')
+            if not isinstance(value, types.GeneratorType):
+                f.write(json.dumps(value, indent=indent, ensure_ascii=False))
+                continue
+            f.write('[')
+            for j, item in enumerate(value):
+                if j:
+                    f.write(item_sep)
+                f.write(json.dumps(item, indent=indent, ensure_ascii=False))
+            f.write(']')
+        f.write('}\n')
+    
+    @staticmethod
+    def _hash_algorithm(metadata):
+        # Results saved before algorithms were selectable always used MD5
+        hash_algorithm = metadata.get('hash_algorithm')
+        if hash_algorithm is None and metadata.get('detection_mode', 'unknown') not in (MODE_METADATA, MODE_PERCEPTUAL):
+            hash_algorithm = DEFAULT_HASH_ALGORITHM
+        return hash_algorithm
+    
+    @staticmethod
+    def iter_groups(filepath: str = None) -> Iterator[Tuple[ImgData.ImageData, Set[str]]]:
+        """
+        Stream the groups of a saved result without loading the whole file.
+        
+        Memory use and the time to the first group do not depend on the file's size.
+        
+        Args:
+            filepath: Path to load file (uses default if None)
+            
+        Yields:
+            Tuples of (ImageData, set of paths); unique files come first and have a single path
+            
+        Raises:
+            OSError, json.JSONDecodeError: If the file cannot be read or is not valid JSON
+        """
+        if filepath is None:
+            filepath = ScanResultStorage.DEFAULT_STORAGE_PATH
+        if is_binary_file(filepath):
+            result = open_binary(filepath)
+            yield from ((img, {img.path}) for img in result.uniques)
+            yield from result.duplicates.items()
+            return
+        hash_algorithm = ScanResultStorage._hash_algorithm({})
+        for key, value in _iter_json_members(filepath, ScanResultStorage._STREAMED_ARRAYS):
+            if key == 'metadata':
+                hash_algorithm = ScanResultStorage._hash_algorithm(value)
+            elif key in ('uniques', 'duplicates'):
+                yield (ScanResultStorage._deserialize_image_data(value['image_data'], hash_algorithm),
+                       set(value['paths']))
+    
     @staticmethod
     def load_results(filepath: str = None) -> Optional[ScanResult]:
         """
         Load ScanResult from JSON file.
         
+        JSON is decoded incrementally (see iter_groups), so no parsed copy of
+        the whole document is held next to the ScanResult. Binary files are
+        mapped instead and come back as a ColumnarScanResult that decodes
+        records only when they are accessed.
+        
         Args:
             filepath: Path to load file (uses default if None)
             
@@ -124,26 +231,30 @@ class ScanResultStorage:
             return None
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if is_binary_file(filepath):
+                return open_binary(filepath)
             
-            version = data.get('version', '1.0')
-            
-            # Deserialize uniques
+            # Handle metadata (Version 1.0 compatibility: Default values)
+            metadata = {}
+            hash_algorithm = ScanResultStorage._hash_algorithm(metadata)
             uniques = []
-            for item in data.get('uniques', []):
-                img_data = ScanResultStorage._deserialize_image_data(item['image_data'])
-                uniques.append(img_data)
-            
-            # Deserialize duplicates
             duplicates = {}
-            for item in data.get('duplicates', []):
-                img_data = ScanResultStorage._deserialize_image_data(item['image_data'])
-                paths = set(item['paths'])  # Convert list back to set
-                duplicates[img_data] = paths
-                
-            # Handle metadata (Version 1.0 compatibility: Default values)
-            metadata = data.get('metadata', {})
+            hardlinks = {}
+            directory_fingerprints = {}
+            
+            for key, value in _iter_json_members(filepath, ScanResultStorage._STREAMED_ARRAYS):
+                if key == 'metadata':
+                    metadata = value
+                    hash_algorithm = ScanResultStorage._hash_algorithm(metadata)
+                elif key == 'uniques':
+                    uniques.append(ScanResultStorage._deserialize_image_data(value['image_data'], hash_algorithm))
+                elif key == 'duplicates':
+                    img_data = ScanResultStorage._deserialize_image_data(value['image_data'], hash_algorithm)
+                    duplicates[img_data] = set(value['paths']) # Convert list back to set
+                elif key == 'hardlinks':
+                    hardlinks[value['path']] = set(value['links'])
+                elif key == 'directories':
+                    directory_fingerprints[value['path']] = (value['mtime_ns'], value['entries'])
             
             scan_result = ScanResult(
                 uniques=uniques,
@@ -151,7 +262,11 @@ class ScanResultStorage:
                 scanned_paths=metadata.get('scanned_paths', []),
                 extension=metadata.get('extension', ''),
                 detection_mode=metadata.get('detection_mode', 'unknown'),
-                timestamp=metadata.get('timestamp', None)
+                timestamp=metadata.get('timestamp', None),
+                hash_algorithm=hash_algorithm,
+                hardlinks=hardlinks,
+                directory_fingerprints=directory_fingerprints,
+                base_filtered=metadata.get('base_filtered', False)
             )
             
             return scan_result
@@ -165,6 +280,70 @@ class ScanResultStorage:
             traceback.print_exc()
             return None
     
+    @staticmethod
+    def save_to_catalog(scan_result: ScanResult, catalog_path: str = None, name: str = None) -> Optional[int]:
+        """
+        Add a ScanResult to the SQLite scan catalog (see data.catalog).
+        
+        Args:
+            scan_result: ScanResult object to store
+            catalog_path: Path to the catalog file (uses ScanCatalog default if None)
+            name: Optional label for the scan
+            
+        Returns:
+            The scan id in the catalog, or None if storing failed
+        """
+        try:
+            catalog = ScanCatalog(catalog_path)
+            try:
+                return catalog.add_scan(scan_result, name)
+            finally:
+                catalog.close()
+        except Exception as e:
+            print(f"Error saving results to catalog: {e}")
+            return None
+    
+    @staticmethod
+    def load_from_catalog(scan_id: int, catalog_path: str = None) -> Optional[ScanResult]:
+        """
+        Load a ScanResult from the SQLite scan catalog.
+        
+        Returns:
+            ScanResult object, or None if the scan does not exist or loading failed
+        """
+        try:
+            catalog = ScanCatalog(catalog_path)
+            try:
+                return catalog.load_scan(scan_id)
+            finally:
+                catalog.close()
+        except Exception as e:
+            print(f"Error loading results from catalog: {e}")
+            return None
+    
+    @staticmethod
+    def query_catalog(catalog_path: str = None, **filters) -> List[Tuple[int, ImgData.ImageData, Set[str]]]:
+        """
+        Query groups across all scans in the catalog.
+        
+        Args:
+            catalog_path: Path to the catalog file (uses ScanCatalog default if None)
+            **filters: Filters of ScanCatalog.query (scan_id, digest, min_copies, min_size,
+                       max_size, year, filename, path, limit, ...)
+            
+        Returns:
+            List of (scan_id, key ImageData, set of paths); empty if the query failed
+        """
+        try:
+            catalog = ScanCatalog(catalog_path)
+            try:
+                return list(catalog.query(**filters))
+            finally:
+                catalog.close()
+        except Exception as e:
+            print(f"Error querying catalog: {e}")
+            return []
+    
     @staticmethod
     def clear_storage(filepath: str = None) -> bool:
         """
@@ -202,3 +381,96 @@ class ScanResultStorage:
             filepath = ScanResultStorage.DEFAULT_STORAGE_PATH
         
         return os.path.exists(filepath)
+
+
+# Characters read from the file per refill of the incremental decoder
+_READ_CHUNK = 1024 * 1024
+_WHITESPACE = ' \t\n\r'
+
+
+class _JsonReader:
+    """Incremental decoder over a text file, using raw_decode on a sliding buffer."""
+
+    def __init__(self, f):
+        self._f = f
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size=None):
+        """Append the next chunk (or size characters), dropping what has been consumed. Returns False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._f.read(size or _READ_CHUNK)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos:self._pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self._buf, self._pos)
+        self._pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Most likely cut off at the end of the buffer. Doubling the pending part keeps
+                # the re-parsing of a large (or malformed) value linear in its length.
+                if not self._fill(max(_READ_CHUNK, len(self._buf) - self._pos)):
+                    raise
+                continue
+            if end == len(self._buf) and not self._eof and not isinstance(value, (dict, list, str)):
+                # A number or literal may continue in the next chunk
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+
+def _iter_json_members(filepath, streamed_arrays=()):
+    """
+    Yield (key, value) for the members of the top-level JSON object in a file.
+
+    Members named in streamed_arrays that hold arrays are not decoded as a
+    whole: one (key, element) pair is yielded per element instead.
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = _JsonReader(f)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key in streamed_arrays and reader.peek() == '[':
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield key, reader.value()
+                        if reader.peek() == ']':
+                            reader.expect(']')
+                            break
+                        reader.expect(',')
+            else:
+                yield key, reader.value()
+            if reader.peek() == '}':
+                return
+            reader.expect(',')
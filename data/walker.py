@@ -0,0 +1,101 @@
+import os
+
+
+def normalize_extensions(ext):
+    """
+    Precompile the configured extensions into a suffix set.
+
+    Args:
+        ext: File extension (string) or list of extensions, with or without leading dot
+
+    Returns:
+        Frozenset of lowercase suffixes including the dot (e.g. {'.jpg', '.png'})
+    """
+    extensions = [ext] if isinstance(ext, str) else ext
+    suffixes = set()
+    for e in extensions:
+        e = e.strip().lower()
+        if not e:
+            continue
+        suffixes.add(e if e.startswith('.') else '.' + e)
+    return frozenset(suffixes)
+
+
+def _matches(name, suffixes):
+    dot = name.rfind('.')
+    return dot > 0 and name[dot:].lower() in suffixes
+
+
+def entry_stat(entry):
+    """
+    Return the (cached) stat result of a DirEntry, or None if the file vanished.
+
+    On Windows the stat information comes straight from the directory listing;
+    on POSIX it costs one stat call that is then cached on the entry.
+    """
+    try:
+        return entry.stat()
+    except OSError:
+        return None
+
+
+def walk_files(root_dir, ext, visited_dirs=None, controller=None, fingerprints=None):
+    """
+    Walk a directory tree once with os.scandir and yield matching files.
+
+    Every configured extension is matched in the same traversal (case-insensitive).
+    Entries are yielded as os.DirEntry objects so callers can reuse the cached
+    type and stat information instead of issuing extra syscalls per file.
+    Symlinked directories are not followed, which also protects against loops.
+    A walk therefore yields every file once, and overlapping roots (one inside
+    another) are de-duplicated by directory: a directory already listed by an
+    earlier walk is skipped together with everything below it, so the memory
+    used grows with the number of directories, not files.
+
+    With fingerprints, every listed directory is fingerprinted, and the files
+    of directories unchanged since the previous scan are not yielded (their
+    subdirectories are still walked).
+
+    Args:
+        root_dir: Root directory to walk
+        ext: File extension (string), list of extensions, or a suffix set
+             returned by normalize_extensions()
+        visited_dirs: Optional set of absolute directory paths already walked; updated in place
+        controller: Optional GuiRunController for pause/cancel support
+        fingerprints: Optional DirectoryFingerprints shared between walks
+
+    Yields:
+        os.DirEntry for every regular file whose suffix matches
+    """
+    suffixes = ext if isinstance(ext, frozenset) else normalize_extensions(ext)
+    stack = [os.path.abspath(root_dir)]
+    while stack:
+        if controller:
+            controller.check()
+
+        current = stack.pop()
+        if visited_dirs is not None:
+            if current in visited_dirs:
+                continue
+            visited_dirs.add(current)
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError as e:
+            print(f"Error scanning {current}: {e}")
+            continue
+        skip_files = fingerprints is not None and fingerprints.check(current, len(entries))
+
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if skip_files or not _matches(entry.name, suffixes):
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            yield entry
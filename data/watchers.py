@@ -0,0 +1,310 @@
+"""
+File system watchers for the watch mode.
+
+InotifyWatcher subscribes to Linux inotify events through ctypes and blocks in
+select() until the kernel reports a change, so an idle watch costs no CPU.
+PollingWatcher is the portable fallback: it re-walks the roots every interval
+and compares the files' stat information.
+
+Both report changes as lists of (event, path) tuples from read_events():
+    EVENT_CHANGED   a matching file was created, written, moved in or touched
+    EVENT_REMOVED   a file or a whole directory was deleted or moved away
+    EVENT_RESCAN    events were lost (inotify queue overflow); the directory
+                    has to be compared with the index again
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+
+from .walker import normalize_extensions, walk_files
+
+EVENT_CHANGED = 'changed'
+EVENT_REMOVED = 'removed'
+EVENT_RESCAN = 'rescan'
+
+# From <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Files count as written on close, so a copy in progress is reported once it is complete
+_WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+_READ_SIZE = 64 * 1024
+
+
+def _wanted(name, suffixes):
+    return os.path.splitext(name)[1].lower() in suffixes
+
+
+def _load_libc():
+    """libc with the inotify functions declared, or None where inotify is not available."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, 'inotify_init1'):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_init1.restype = ctypes.c_int
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_add_watch.restype = ctypes.c_int
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    libc.inotify_rm_watch.restype = ctypes.c_int
+    return libc
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch of one or more directory trees.
+
+    inotify watches single directories, so every directory below the roots gets
+    its own watch, and directories created or moved in later are added as they
+    appear (their files are reported as changed).
+    """
+
+    def __init__(self, roots, ext):
+        """
+        Args:
+            roots: Directories to watch recursively
+            ext: File extension (string) or list of extensions to report
+
+        Raises:
+            OSError: If inotify is not available or the watch limit is reached
+        """
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.suffixes = normalize_extensions(ext)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1 failed: {os.strerror(code)}")
+        # Written to by interrupt() to wake up a blocked read_events()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._dirs = {}  # watch descriptor -> directory path
+        try:
+            for root in self.roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def read_events(self, timeout=None):
+        """
+        Wait for changes.
+
+        Args:
+            timeout: Seconds to wait at most (forever if None)
+
+        Returns:
+            List of (event, path) tuples; empty on timeout or after interrupt()
+        """
+        ready, _, _ = select.select([self._fd, self._wakeup_read], [], [], timeout)
+        if self._wakeup_read in ready or self._fd not in ready:
+            return []
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].split(b'\0', 1)[0]
+            offset += _EVENT_HEADER.size + length
+            self._translate(wd, mask, os.fsdecode(name), events)
+        return events
+
+    def _translate(self, wd, mask, name, events):
+        if mask & IN_Q_OVERFLOW:
+            events.extend((EVENT_RESCAN, root) for root in self.roots)
+            return
+        directory = self._dirs.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self._dirs[wd]
+            return
+        if mask & IN_DELETE_SELF:
+            # Subdirectories are reported by their parent's watch, only roots need this
+            if directory in self.roots:
+                events.append((EVENT_REMOVED, directory))
+            return
+
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path, events)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._unwatch_tree(path)
+                events.append((EVENT_REMOVED, path))
+        elif _wanted(name, self.suffixes):
+            events.append((EVENT_REMOVED if mask & (IN_DELETE | IN_MOVED_FROM) else EVENT_CHANGED, path))
+
+    def _watch_tree(self, top, events=None):
+        """Watch top and every directory below it; with events, report the files found there."""
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            # The watch goes first: a file created meanwhile is reported by it or found by the listing
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                code = ctypes.get_errno()
+                if code == errno.ENOSPC:
+                    if events is None:
+                        raise OSError(code, "inotify watch limit reached (see fs.inotify.max_user_watches)")
+                    print(f"inotify watch limit reached, changes in {directory} are not seen")
+                continue  # Vanished or unreadable meanwhile
+            self._dirs[wd] = directory
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif events is not None and _wanted(entry.name, self.suffixes) and entry.is_file():
+                        events.append((EVENT_CHANGED, entry.path))
+                except OSError:
+                    continue
+
+    def _unwatch_tree(self, top):
+        """Drop the watches of a directory that was removed or moved away."""
+        prefix = os.path.join(top, '')
+        for wd, directory in list(self._dirs.items()):
+            if directory == top or directory.startswith(prefix):
+                # Deleted directories lose their watch anyway; moved ones keep it unless removed
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._dirs[wd]
+
+    def rewatch(self, top):
+        """Watch directories below top that got no watch, e.g. created while events were lost."""
+        # Adding a watch to a watched directory returns its existing descriptor
+        self._watch_tree(top, [])
+
+    @property
+    def watch_count(self):
+        """Number of watched directories."""
+        return len(self._dirs)
+
+    def interrupt(self):
+        """Wake up read_events() (e.g. to stop a watch); safe to call from any thread."""
+        try:
+            os.write(self._wakeup_write, b'\0')
+        except OSError:
+            pass  # Already closed
+
+    def close(self):
+        for fd in (self._fd, self._wakeup_read, self._wakeup_write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class PollingWatcher:
+    """
+    Fallback watcher that compares the files' size, mtime and inode every interval.
+
+    Unlike inotify it costs one walk of the roots per interval, and changes are
+    seen with up to one interval of delay.
+    """
+
+    def __init__(self, roots, ext, interval=5.0):
+        """
+        Args:
+            roots: Directories to watch recursively
+            ext: File extension (string) or list of extensions to report
+            interval: Seconds between two walks
+        """
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.suffixes = normalize_extensions(ext)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._snapshot = self._walk()
+
+    def _walk(self):
+        snapshot = {}
+        visited = set()
+        for root in self.roots:
+            for entry in walk_files(root, self.suffixes, visited):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def read_events(self, timeout=None):
+        """
+        Wait for the next walk and report what changed since the previous one.
+
+        Args:
+            timeout: Seconds to wait at most; shorter than the interval, nothing is reported
+
+        Returns:
+            List of (event, path) tuples; empty if nothing changed or after interrupt()
+        """
+        if timeout is not None and timeout < self.interval:
+            self._stop.wait(timeout)
+            return []
+        if self._stop.wait(self.interval):
+            return []
+        current = self._walk()
+        events = [(EVENT_CHANGED, path) for path, key in current.items() if self._snapshot.get(path) != key]
+        events.extend((EVENT_REMOVED, path) for path in self._snapshot if path not in current)
+        self._snapshot = current
+        return events
+
+    def rewatch(self, top):
+        """Nothing to do: every walk covers the whole tree."""
+
+    def interrupt(self):
+        """Wake up read_events(); safe to call from any thread."""
+        self._stop.set()
+
+    def close(self):
+        self._stop.set()
+
+
+def create_watcher(roots, ext, poll_interval=5.0, use_inotify=True):
+    """
+    Watch roots with inotify where available, polling otherwise.
+
+    Args:
+        roots: Directories to watch recursively
+        ext: File extension (string) or list of extensions to report
+        poll_interval: Seconds between walks of the polling fallback
+        use_inotify: False forces polling (e.g. for network file systems, where inotify sees no remote changes)
+
+    Returns:
+        InotifyWatcher or PollingWatcher
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(roots, ext)
+        except OSError as e:
+            print(f"inotify not usable ({e}), polling every {poll_interval}s instead")
+    return PollingWatcher(roots, ext, poll_interval)
@@ -0,0 +1,280 @@
+import concurrent.futures
+import io
+import os
+import threading
+import time
+from PIL import UnidentifiedImageError
+from .exif import InvalidJpeg, get_exif_date, read_exif_date_from
+from .hashing import DEFAULT_HASH_ALGORITHM
+
+# Executor backends selectable for a scan
+EXECUTOR_THREADS = 'threads'
+EXECUTOR_PROCESSES = 'processes'
+EXECUTOR_HYBRID = 'hybrid'
+EXECUTOR_BACKENDS = (EXECUTOR_THREADS, EXECUTOR_PROCESSES, EXECUTOR_HYBRID)
+
+# In-flight tasks allowed per worker before producers have to wait
+PENDING_PER_WORKER = 4
+
+# Bytes read on the I/O threads in hybrid mode; covers the APP1 segment of typical JPEGs
+HEADER_READ_SIZE = 128 * 1024
+
+# Pause/cancel controller of the current worker process (set by init_worker)
+_worker_controller = None
+
+
+class EventController:
+    """
+    Pause/cancel controller backed by shared events.
+
+    Offers the same check() interface as ScannerService, but only needs the two
+    events, so it can be rebuilt inside worker processes from multiprocessing
+    events handed over at pool start-up.
+    """
+
+    def __init__(self, cancel_event, pause_event):
+        self.cancel_event = cancel_event
+        self.pause_event = pause_event
+
+    def check(self):
+        from .ImageData import ProcessingCancelled
+        if self.cancel_event.is_set():
+            raise ProcessingCancelled("User cancelled processing")
+
+        while self.pause_event.is_set():
+            if self.cancel_event.is_set():
+                raise ProcessingCancelled("User cancelled processing")
+            time.sleep(0.1)
+
+
+def init_worker(cancel_event=None, pause_event=None):
+    """Process pool initializer: install the shared pause/cancel events."""
+    global _worker_controller
+    if cancel_event is not None and pause_event is not None:
+        _worker_controller = EventController(cancel_event, pause_event)
+
+
+def extract_record(abs_path, stat_fields=None, compute_checksum=False, header=None, controller=None,
+                   hash_algorithm=DEFAULT_HASH_ALGORITHM, checksum_cache=None):
+    """
+    Extract the metadata of one image file as a compact, cheaply picklable tuple.
+
+    Args:
+        abs_path: Absolute path to the image file
+        stat_fields: Optional (st_mtime_ns, st_size) already known for the file
+        compute_checksum: If True, also compute the content checksum
+        header: Optional first bytes of the file, already read by an I/O thread
+        controller: Optional GuiRunController for pause/cancel support
+        hash_algorithm: Digest algorithm used when compute_checksum is set
+        checksum_cache: Optional ChecksumCache consulted before hashing
+
+    Returns:
+        Tuple (path, mtime_ns, size, exif_date, checksum, parse_seconds, hash_seconds),
+        or None if the file is not a valid image
+    """
+    if controller:
+        controller.check()
+
+    try:
+        start = time.perf_counter()
+        if header is not None and header[:2] == b'\xff\xd8':
+            try:
+                exif_date = read_exif_date_from(io.BytesIO(header), abs_path)
+            except InvalidJpeg:
+                # The segments extend past the bytes the I/O thread read, or the file is
+                # broken: parse the file itself (Pillow rejects it if it is not an image)
+                exif_date = get_exif_date(abs_path)
+        else:
+            # TIFF IFDs may live anywhere in the file, so only JPEG headers are reused
+            exif_date = get_exif_date(abs_path)
+
+        if stat_fields is None:
+            statinfo = os.stat(abs_path)
+            stat_fields = (statinfo.st_mtime_ns, statinfo.st_size)
+
+        parsed = time.perf_counter()
+
+        checksum = None
+        if compute_checksum:
+            from .ChecksumImageData import ChecksumImageData
+            checksum = ChecksumImageData.calculate_checksum(abs_path, algorithm=hash_algorithm,
+                                                           cache=checksum_cache)
+        hashed = time.perf_counter()
+
+        return (abs_path, stat_fields[0], stat_fields[1], exif_date, checksum, parsed - start, hashed - parsed)
+    except UnidentifiedImageError:
+        return None # Not a valid image
+    except Exception as e:
+        print(f"Error processing {abs_path}: {e}")
+        return None
+
+
+def read_header(abs_path):
+    """Read the first HEADER_READ_SIZE bytes of a file (I/O-bound half of hybrid mode)."""
+    try:
+        with open(abs_path, 'rb') as f:
+            return f.read(HEADER_READ_SIZE)
+    except OSError:
+        return None
+
+
+def _process_task(abs_path, stat_fields, compute_checksum, header, hash_algorithm, checksum_cache):
+    return extract_record(abs_path, stat_fields, compute_checksum, header, _worker_controller, hash_algorithm,
+                          checksum_cache)
+
+
+def _cancel(future):
+    """Cancel a Future that is resolved by hand; notifying it also wakes concurrent.futures.wait()."""
+    if future.cancel():
+        future.set_running_or_notify_cancel()
+
+
+def _chain_result(source, target):
+    if target.done():
+        return
+    if source.cancelled():
+        _cancel(target)
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def _chain_failure(source, target):
+    """Resolve target when source, the step that would have resolved it, was cancelled or failed."""
+    if target.done():
+        return
+    if source.cancelled():
+        _cancel(target)
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+
+
+class ScanExecutor:
+    """
+    Runs per-file extraction on the selected executor backend.
+
+    - threads:   parsing and hashing run on a ThreadPoolExecutor
+    - processes: parsing and hashing run on a ProcessPoolExecutor
+    - hybrid:    header reads run on threads, parsing and hashing on processes;
+                 the worker budget is split between the two pools
+
+    Every backend resolves its futures to the record tuples of extract_record().
+    One executor can be shared by several producers (e.g. one per scanned root):
+    max_workers is then a global budget, files from all roots are served from the
+    same queue, and submit() blocks once max_pending files are in flight overall.
+    """
+
+    def __init__(self, backend=EXECUTOR_THREADS, max_workers=None, controller=None, checksum_cache=None):
+        """
+        Args:
+            backend: One of EXECUTOR_BACKENDS
+            max_workers: Worker budget (executor default if None); in hybrid mode half of
+                it goes to the I/O threads and the rest to the processes, at least one each
+            controller: Optional controller; process workers get its shared_events()
+            checksum_cache: Optional ChecksumCache used by every hashing task
+        """
+        if backend not in EXECUTOR_BACKENDS:
+            raise ValueError(f"Unknown executor backend: {backend}. Expected one of {EXECUTOR_BACKENDS}")
+
+        self.backend = backend
+        self.controller = controller
+        self.checksum_cache = checksum_cache
+        cpu_count = os.cpu_count() or 1
+        if max_workers is None:
+            # Same defaults as the concurrent.futures pools
+            max_workers = min(32, cpu_count + 4) if backend == EXECUTOR_THREADS else cpu_count
+        self.max_workers = max_workers
+        # Bound for producers feeding the pool (see find_duplicates)
+        self.max_pending = max_workers * PENDING_PER_WORKER
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._threads = None
+        self._processes = None
+
+        thread_workers = process_workers = max_workers
+        if backend == EXECUTOR_HYBRID:
+            thread_workers = max(1, max_workers // 2)
+            process_workers = max(1, max_workers - thread_workers)
+
+        if backend in (EXECUTOR_THREADS, EXECUTOR_HYBRID):
+            self._threads = concurrent.futures.ThreadPoolExecutor(max_workers=thread_workers)
+        if backend in (EXECUTOR_PROCESSES, EXECUTOR_HYBRID):
+            events = ()
+            if controller is not None and hasattr(controller, 'shared_events'):
+                events = controller.shared_events()
+            self._processes = concurrent.futures.ProcessPoolExecutor(
+                max_workers=process_workers, initializer=init_worker, initargs=events
+            )
+
+    def submit(self, abs_path, statinfo=None, use_checksum=False, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """
+        Schedule extraction of one file, waiting for a free slot if the global
+        in-flight bound is reached.
+
+        Args:
+            abs_path: Absolute path to the image file
+            statinfo: Optional os.stat_result already known for the file
+            use_checksum: If True, the worker also hashes the file
+            hash_algorithm: Digest algorithm used when use_checksum is set
+
+        Returns:
+            Future resolving to a record tuple (or None)
+        """
+        return self._bounded(self._submit, abs_path, statinfo, use_checksum, hash_algorithm)
+
+    def _submit(self, abs_path, statinfo, use_checksum, hash_algorithm):
+        stat_fields = (statinfo.st_mtime_ns, statinfo.st_size) if statinfo is not None else None
+
+        if self.backend == EXECUTOR_THREADS:
+            return self._threads.submit(extract_record, abs_path, stat_fields, use_checksum, None,
+                                        self.controller, hash_algorithm, self.checksum_cache)
+        if self.backend == EXECUTOR_PROCESSES:
+            return self._processes.submit(_process_task, abs_path, stat_fields, use_checksum, None, hash_algorithm,
+                                          self.checksum_cache)
+
+        outer = concurrent.futures.Future()
+
+        def read_then_parse():
+            try:
+                header = read_header(abs_path)
+                inner = self._processes.submit(_process_task, abs_path, stat_fields, use_checksum, header,
+                                               hash_algorithm, self.checksum_cache)
+                inner.add_done_callback(lambda f: _chain_result(f, outer))
+            except Exception as e:
+                outer.set_exception(e)
+
+        # A read cancelled by shutdown never submits the parse, so it resolves outer itself
+        self._threads.submit(read_then_parse).add_done_callback(lambda f: _chain_failure(f, outer))
+        return outer
+
+    def submit_call(self, fn, *args):
+        """
+        Schedule an arbitrary CPU/I-O task (e.g. a hashing stage) on the executor.
+
+        Runs on the process pool when there is one, otherwise on the threads, and
+        counts against the same in-flight bound as submit(). fn must be a
+        module-level function so it can be sent to worker processes.
+        """
+        pool = self._processes or self._threads
+        return self._bounded(pool.submit, fn, *args)
+
+    def _bounded(self, submit, *args):
+        """Call submit(*args) once an in-flight slot is free; the slot is returned when the future is done."""
+        while not self._slots.acquire(timeout=0.1):
+            if self.controller:
+                self.controller.check()
+
+        try:
+            future = submit(*args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self, cancel_futures=False):
+        """Shut down the pools, dropping queued work if cancel_futures is set."""
+        if self._threads:
+            self._threads.shutdown(wait=True, cancel_futures=cancel_futures)
+        if self._processes:
+            self._processes.shutdown(wait=True, cancel_futures=cancel_futures)
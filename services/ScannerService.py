@@ -1,11 +1,31 @@
 
 import concurrent.futures
+import itertools
+import multiprocessing
+import os
 import threading
 import time
 import sys
 from typing import List, Optional, Callable, Dict, Set
 from data import ImageData
-from data.ScanResult import ScanResult
+from data.ChecksumImageData import ChecksumImageData
+from data.ColumnarScanResult import ColumnarScanResult
+from data.ScanResult import ScanResult, DETECTION_MODES, MODE_CHECKSUM, MODE_METADATA, MODE_STAGED, MODE_PERCEPTUAL, MODE_CONTENT
+from data.ScanStats import ScanStats
+from data.HardlinkIndex import HardlinkIndex
+from data.DirectoryFingerprints import DirectoryFingerprints
+from data.GroupingIndex import GroupingIndex
+from data.ExternalGroupingIndex import ExternalGroupingIndex
+from data.cache import MetadataCache, ChecksumCache
+from data.checkpoint import ScanCheckpoint
+from data.hashing import DEFAULT_HASH_ALGORITHM, HASH_ALGORITHMS, content_algorithm
+from data.walker import entry_stat, normalize_extensions, walk_files
+from data.staged import find_duplicates_staged
+from data.perceptual import find_duplicates_perceptual, DEFAULT_PERCEPTUAL_METHOD, DEFAULT_MAX_DISTANCE
+from data.workers import ScanExecutor, EXECUTOR_THREADS
+
+# Modes whose results keep exact per-file data for every path of a group
+INCREMENTAL_MODES = (MODE_METADATA, MODE_CHECKSUM, MODE_STAGED)
 
 class ScannerService:
     """
@@ -14,8 +34,9 @@ class ScannerService:
     """
     
     def __init__(self):
-        self._cancel_event = threading.Event()
-        self._pause_event = threading.Event()
+        # Multiprocessing events so process-pool workers can observe pause/cancel too
+        self._cancel_event = multiprocessing.Event()
+        self._pause_event = multiprocessing.Event()
         self._pause_event.clear() # Not paused
         
     def cancel(self):
@@ -33,6 +54,10 @@ class ScannerService:
     def is_cancelled(self):
         return self._cancel_event.is_set()
     
+    def shared_events(self):
+        """Return (cancel_event, pause_event) for handing over to worker processes."""
+        return self._cancel_event, self._pause_event
+    
     # Interface expected by ImageData helpers
     def check(self):
         if self._cancel_event.is_set():
@@ -49,7 +74,20 @@ class ScannerService:
              use_checksum: bool = False,
              progress_callback: Callable[[str, int, int], None] = None,
              log_callback: Callable[[str], None] = None,
-             base_result: Optional[ScanResult] = None) -> ScanResult:
+             base_result: Optional[ScanResult] = None,
+             metadata_cache: Optional[MetadataCache] = None,
+             executor_backend: str = EXECUTOR_THREADS,
+             max_workers: Optional[int] = None,
+             folder_status_callback: Callable[[str, str], None] = None,
+             detection_mode: Optional[str] = None,
+             hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+             checksum_cache: Optional[ChecksumCache] = None,
+             perceptual_method: str = DEFAULT_PERCEPTUAL_METHOD,
+             perceptual_max_distance: int = DEFAULT_MAX_DISTANCE,
+             memory_budget: Optional[int] = None,
+             spill_dir: Optional[str] = None,
+             checkpoint: Optional[ScanCheckpoint] = None,
+             previous_result: Optional[ScanResult] = None) -> ScanResult:
         """
         Run the scan process.
         
@@ -60,9 +98,37 @@ class ScannerService:
             progress_callback: Function(status_msg, current, total) called periodically.
             log_callback: Function(msg) called for logging.
             base_result: Optional base scan result for merge operations.
+            metadata_cache: Optional MetadataCache used to skip unchanged files.
+            executor_backend: 'threads', 'processes' or 'hybrid' (threaded I/O, parsing and hashing in processes).
+            max_workers: Optional global worker budget shared by all folders.
+            folder_status_callback: Function(folder, status) called with per-folder progress.
+            detection_mode: One of DETECTION_MODES; overrides use_checksum when given.
+                'staged' groups by size, then partial hash, then full checksum.
+                'perceptual' groups visually similar images (resized, recompressed copies).
+                'content' compares image data only, so retagged files still match.
+            hash_algorithm: Digest algorithm for checksum and staged modes (one of HASH_ALGORITHMS).
+            checksum_cache: Optional ChecksumCache so unchanged files are not hashed again.
+            perceptual_method: 'phash' or 'dhash' for perceptual mode.
+            perceptual_max_distance: Largest Hamming distance (of 64 bits) grouped in perceptual mode.
+            memory_budget: Optional bytes of grouping records kept in memory; beyond that the
+                grouping index spills sorted runs to disk (see ExternalGroupingIndex), and
+                the result is a ColumnarScanResult built in one streamed merge of the runs.
+                The budget bounds the grouping only: the result still takes O(n) memory,
+                a 58 to 74 byte row per file plus the pooled file names (kept as Python
+                strings until the result is built), and the walk keeps one entry per
+                directory.
+            spill_dir: Directory for the spilled runs (system temp dir if None).
+            checkpoint: Optional ScanCheckpoint that saves progress periodically; a cancelled
+                or crashed scan continues from it with resume_scan. It is emptied once
+                the scan completes.
+            previous_result: Optional earlier result of the same folders and settings for an
+                incremental rescan: directories whose fingerprint (mtime_ns, entry count) is
+                unchanged are not walked for files, and their items are carried over from it.
+                Only supported in INCREMENTAL_MODES.
             
         Returns:
-            ScanResult object.
+            ScanResult object (ColumnarScanResult with a memory_budget in metadata,
+            checksum and content modes).
         """
         self._cancel_event.clear()
         self._pause_event.clear()
@@ -70,39 +136,164 @@ class ScannerService:
         # Handle both single extension and list of extensions
         extensions = [ext] if isinstance(ext, str) else ext
         
+        if detection_mode is None:
+            detection_mode = MODE_CHECKSUM if use_checksum else MODE_METADATA
+        if detection_mode not in DETECTION_MODES:
+            raise ValueError(f"Unknown detection mode: {detection_mode}. Expected one of {DETECTION_MODES}")
+        use_checksum = detection_mode in (MODE_CHECKSUM, MODE_CONTENT)
+        if hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_algorithm}. Expected one of {HASH_ALGORITHMS}")
+        if checkpoint is not None:
+            checkpoint.save_params({
+                'folders': list(folders),
+                'extensions': list(extensions),
+                'detection_mode': detection_mode,
+                'hash_algorithm': hash_algorithm,
+                'perceptual_method': perceptual_method,
+                'perceptual_max_distance': perceptual_max_distance,
+            })
+        if detection_mode in (MODE_METADATA, MODE_PERCEPTUAL):
+            hash_algorithm = None
+        elif detection_mode == MODE_CONTENT:
+            hash_algorithm = content_algorithm(hash_algorithm)
+        base_algorithm = getattr(base_result, 'hash_algorithm', None)
+        if base_algorithm and hash_algorithm and base_algorithm != hash_algorithm:
+            # Checksums of different algorithms never match, every file would look new
+            raise ValueError(f"Base result uses hash algorithm {base_algorithm}, "
+                             f"this scan uses {hash_algorithm}")
+        if previous_result is not None:
+            self._check_previous_result(previous_result, extensions, detection_mode, hash_algorithm)
+        
         def log(msg):
             if log_callback: log_callback(msg)
         
         log("Starting processing...")
-        log(f"Mode: {'Checksum' if use_checksum else 'Metadata'}")
+        log(f"Mode: {detection_mode.capitalize()}")
         log(f"Extensions: {', '.join(extensions)}")
+        if hash_algorithm:
+            log(f"Hash algorithm: {hash_algorithm}")
+        log(f"Executor: {executor_backend}")
+
+        # One worker pool for all folders: files from every root share the global budget
+        scan_executor = ScanExecutor(executor_backend, max_workers, controller=self,
+                                     checksum_cache=checksum_cache if hash_algorithm else None)
+        log(f"Worker budget: {scan_executor.max_workers}")
+        stats = ScanStats()
+        # Cache counters live as long as the caches; this scan logs only its own lookups
+        metadata_counts = (metadata_cache.hits, metadata_cache.misses) if metadata_cache else None
+        checksum_counts = (checksum_cache.hits, checksum_cache.misses) if checksum_cache is not None else None
+        # Shared by all folders, so links spanning two scanned roots are found too
+        hardlink_index = HardlinkIndex()
+        # Always collected, so every result can serve as the previous result of a rescan
+        fingerprints = DirectoryFingerprints(
+            previous_result.directory_fingerprints if previous_result is not None else None)
+        if previous_result is not None:
+            self._claim_previous_hardlinks(previous_result, hardlink_index)
+        if memory_budget is not None:
+            grouping_index = ExternalGroupingIndex(memory_budget, spill_dir)
+            log(f"Grouping memory budget: {memory_budget / (1024 * 1024):.0f} MB")
+        else:
+            grouping_index = GroupingIndex()
 
         try:
-            # Step 1: Scan all folders in parallel
-            all_uniques, all_duplicates = self._scan_folders_parallel(
-                folders, extensions, use_checksum, progress_callback, log
-            )
+            if detection_mode == MODE_PERCEPTUAL:
+                # Step 1 (perceptual): the hashing reads every file anyway, so the walk only lists them
+                walked = self._walk_folders(folders, extensions, progress_callback, folder_status_callback,
+                                            stats, hardlink_index, fingerprints)
+            else:
+                # Step 1: Scan all folders in parallel into one grouping index (no merge phase)
+                self._scan_folders_parallel(
+                    folders, extensions, use_checksum, progress_callback, log, metadata_cache, scan_executor,
+                    folder_status_callback, stats, hash_algorithm, hardlink_index, grouping_index, checkpoint,
+                    fingerprints
+                )
+            if previous_result is not None:
+                carried = self._carry_over(previous_result, fingerprints.unchanged, grouping_index,
+                                           hardlink_index, use_checksum or detection_mode == MODE_STAGED)
+                stats.add('carried_files', carried)
+                log(f"Incremental: {len(fingerprints.unchanged)} of {len(fingerprints.current)} directories "
+                    f"unchanged, {carried} files carried over")
+            self._log_stats(stats, log)
+            if memory_budget is not None and grouping_index.spilled_runs:
+                log(f"Grouping spilled {grouping_index.spilled_runs} sorted runs to disk")
             
-            # Step 2: Merge results from multiple folders (detect cross-folder duplicates)
-            final_uniques, final_duplicates = self._merge_folder_results(
-                all_uniques, all_duplicates, len(folders), log
-            )
+            if metadata_cache:
+                log(f"Metadata cache: {metadata_cache.hits - metadata_counts[0]} hits, "
+                    f"{metadata_cache.misses - metadata_counts[1]} misses")
+            if checkpoint is not None:
+                log(f"Checkpoint: {stats.get('checkpoint_hits')} files restored, {len(checkpoint)} files saved")
+            if hardlink_index.links:
+                log(f"Hardlinks: {hardlink_index.link_count} extra links to {len(hardlink_index.links)} files "
+                    f"were read only once")
             
-            # Step 3: Filter against base result if provided (merge scan feature)
-            if base_result:
-                final_uniques, final_duplicates = self._filter_against_base(
-                    final_uniques, final_duplicates, base_result, log
+            if detection_mode == MODE_STAGED:
+                # Step 2 (staged): size -> partial hash -> full checksum over every file
+                final_uniques, final_duplicates = find_duplicates_staged(
+                    self._expand_per_file(grouping_index), scan_executor, self, stats,
+                    hash_algorithm=hash_algorithm
+                )
+                self._log_staged_stats(stats, log)
+            elif detection_mode == MODE_PERCEPTUAL:
+                # Step 2 (perceptual): cluster every file by perceptual hash distance
+                log(f"Perceptual hash: {perceptual_method}, max distance {perceptual_max_distance}")
+                final_uniques, final_duplicates = find_duplicates_perceptual(
+                    walked, scan_executor, self, stats,
+                    method=perceptual_method, max_distance=perceptual_max_distance, read_exif=True
                 )
+                log(f"Perceptual hashing: {stats.get('perceptual_hashed')} images hashed, "
+                    f"{stats.get('perceptual_failed')} could not be decoded")
+            elif memory_budget is None:
+                # Cross-folder duplicates are already grouped by the shared index
+                final_uniques, final_duplicates = grouping_index.uniques(), grouping_index.duplicates()
+            else:
+                final_uniques = final_duplicates = None  # Streamed from the spilled runs below
             
-            log(f"Processing complete. Found {len(final_uniques)} unique files and {len(final_duplicates)} distinct duplicate groups.")
+            if checksum_cache is not None:
+                hits = checksum_cache.hits - checksum_counts[0]
+                misses = checksum_cache.misses - checksum_counts[1]
+                if hits or misses:
+                    # Only counts lookups made in this process (not those of process-pool workers)
+                    log(f"Checksum cache: {hits} hits, {misses} misses")
             
-            return ScanResult(
-                uniques=final_uniques,
-                duplicates=final_duplicates,
-                scanned_paths=folders,
-                extension=', '.join(extensions),
-                detection_mode='checksum' if use_checksum else 'metadata'
-            )
+            if final_uniques is None:
+                # Step 3 (spilled index): one streamed merge of the sorted runs, filtered against
+                # the base result and packed into compact columns group by group
+                groups = grouping_index.iter_groups()
+                if base_result:
+                    log(f"Filtering results against base result ({len(base_result.uniques)} unique, "
+                        f"{len(base_result.duplicates)} duplicate groups)...")
+                    is_known = self._base_membership(base_result)
+                    groups = ((img_data, paths) for img_data, paths in groups if not is_known(img_data))
+                result = ColumnarScanResult.from_groups(
+                    groups, folders, ', '.join(extensions), detection_mode, stats=stats,
+                    hash_algorithm=hash_algorithm, hardlinks=hardlink_index.links,
+                    directory_fingerprints=fingerprints.current, base_filtered=bool(base_result)
+                )
+            else:
+                # Step 3: Filter against base result if provided (merge scan feature)
+                if base_result:
+                    final_uniques, final_duplicates = self._filter_against_base(
+                        final_uniques, final_duplicates, base_result, log
+                    )
+                result = ScanResult(
+                    uniques=final_uniques,
+                    duplicates=final_duplicates,
+                    scanned_paths=folders,
+                    extension=', '.join(extensions),
+                    detection_mode=detection_mode,
+                    stats=stats,
+                    hash_algorithm=hash_algorithm,
+                    hardlinks=hardlink_index.links,
+                    directory_fingerprints=fingerprints.current,
+                    base_filtered=bool(base_result)
+                )
+            
+            log(f"Processing complete. Found {len(result.uniques)} unique files and {result.duplicate_groups_count} distinct duplicate groups.")
+            if checkpoint is not None:
+                # Completed: a later scan must not take its files or finished roots from here
+                checkpoint.reset()
+            
+            return result
             
         except ImageData.ProcessingCancelled:
             log("Processing cancelled.")
@@ -110,24 +301,86 @@ class ScannerService:
         except Exception as e:
             log(f"Error during scan: {e}")
             raise
+        finally:
+            scan_executor.shutdown(cancel_futures=True)
+            if memory_budget is not None:
+                grouping_index.close()
+            if checksum_cache:
+                checksum_cache.flush()
+    
+    def resume_scan(self, checkpoint_path: str, **kwargs) -> ScanResult:
+        """
+        Continue a cancelled or interrupted scan from its checkpoint file.
+        
+        The folders, extensions and detection settings are read from the
+        checkpoint. Finished folders are not walked again, and files that were
+        already processed are only re-checked by stat.
+        
+        Args:
+            checkpoint_path: Checkpoint file passed to the interrupted scan.
+            **kwargs: Further scan() arguments (callbacks, caches, executor settings).
+            
+        Returns:
+            ScanResult object.
+            
+        Raises:
+            ValueError: If the file holds no scan to resume (none was started, or it completed).
+        """
+        checkpoint = ScanCheckpoint(checkpoint_path, resume=True)
+        try:
+            params = checkpoint.params
+            if not params:
+                raise ValueError(f"No scan to resume in checkpoint {checkpoint_path}")
+            return self.scan(
+                params['folders'], params['extensions'],
+                detection_mode=params['detection_mode'],
+                hash_algorithm=params['hash_algorithm'],
+                perceptual_method=params['perceptual_method'],
+                perceptual_max_distance=params['perceptual_max_distance'],
+                checkpoint=checkpoint,
+                **kwargs
+            )
+        finally:
+            checkpoint.close()
     
     def _scan_folders_parallel(self, 
                                folders: List[str], 
                                extensions: List[str],
                                use_checksum: bool,
                                progress_callback: Optional[Callable[[str, int, int], None]],
-                               log: Callable[[str], None]) -> tuple[List, Dict]:
+                               log: Callable[[str], None],
+                               metadata_cache: Optional[MetadataCache] = None,
+                               scan_executor: Optional[ScanExecutor] = None,
+                               folder_status_callback: Optional[Callable[[str, str], None]] = None,
+                               stats: Optional[ScanStats] = None,
+                               hash_algorithm: Optional[str] = None,
+                               hardlink_index: Optional[HardlinkIndex] = None,
+                               grouping_index: Optional[GroupingIndex] = None,
+                               checkpoint: Optional[ScanCheckpoint] = None,
+                               fingerprints: Optional[DirectoryFingerprints] = None) -> GroupingIndex:
         """
         Scan multiple folders in parallel.
         
+        Each folder gets a lightweight producer thread that walks it and inserts
+        its results into one shared GroupingIndex as they arrive; the per-file work
+        of all folders is served by the shared scan_executor, so a single large
+        folder keeps every worker busy once the small folders are done.
+        
+        Args:
+            grouping_index: Optional index to fill (GroupingIndex or ExternalGroupingIndex);
+                a new GroupingIndex if None.
+            checkpoint: Optional ScanCheckpoint shared by all folder producers.
+            fingerprints: Optional DirectoryFingerprints shared by all folder producers.
+        
         Returns:
-            Tuple of (all_uniques, all_duplicates) aggregated from all folders.
+            The grouping index holding the files of all folders.
         """
         total_folders = len(folders)
         max_workers = total_folders if total_folders > 0 else 1
         
-        all_uniques = []
-        all_duplicates = {}
+        if grouping_index is None:
+            grouping_index = GroupingIndex()
+        folder_counts = {}
         
         # Progress tracking
         completed_folders = 0
@@ -144,25 +397,43 @@ class ScannerService:
                         total_folders
                     )
 
+        def folder_status(folder_path, status):
+            if folder_status_callback:
+                folder_status_callback(folder_path, status)
+
         def make_folder_callback(folder_path):
-            """Create per-folder progress callback if needed."""
+            """Create per-folder progress callback reporting (throttled) status updates."""
+            last_update = 0.0
             def cb(current, total):
-                # Could be enhanced to provide per-folder progress updates
-                pass
+                nonlocal last_update
+                folder_counts[folder_path] = current
+                now = time.monotonic()
+                if now - last_update >= 0.25:
+                    last_update = now
+                    folder_status(folder_path, f"Scanning {current}/{total}")
             return cb
 
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            log(f"Parallelizing with {max_workers} folder worker threads.")
+            log(f"Parallelizing with {max_workers} folder producer threads.")
             
             future_to_folder = {}
             for folder in folders:
+                folder_status(folder, "Scanning")
                 future = executor.submit(
                     ImageData.find_duplicates, 
                     [folder], 
                     extensions, 
                     progress_callback=make_folder_callback(folder), 
                     controller=self,
-                    use_checksum=use_checksum
+                    use_checksum=use_checksum,
+                    metadata_cache=metadata_cache,
+                    scan_executor=scan_executor,
+                    stats=stats,
+                    hash_algorithm=hash_algorithm or DEFAULT_HASH_ALGORITHM,
+                    hardlink_index=hardlink_index,
+                    grouping_index=grouping_index,
+                    checkpoint=checkpoint,
+                    fingerprints=fingerprints
                 )
                 future_to_folder[future] = folder
             
@@ -174,62 +445,209 @@ class ScannerService:
                 try:
                     folder_uniques, folder_duplicates = future.result()
                     
-                    # Aggregate results
-                    all_uniques.extend(folder_uniques)
-                    
+                    # Results normally stream into the index; add any returned groups as well
+                    for img_data in folder_uniques:
+                        grouping_index.add(img_data)
                     for img_data, paths in folder_duplicates.items():
-                        if img_data in all_duplicates:
-                            all_duplicates[img_data].update(paths)
-                        else:
-                            all_duplicates[img_data] = paths.copy()
+                        grouping_index.add(img_data, paths)
                             
+                    folder_files = (folder_counts.get(folder, 0) + len(folder_uniques) +
+                                    sum(len(p) for p in folder_duplicates.values()))
+                    folder_status(folder, f"Done ({folder_files} files)")
                     folder_done()
                     
                 except Exception as exc:
+                    folder_status(folder, "Error")
                     log(f"Folder {folder} generated an exception: {exc}")
 
         if self._cancel_event.is_set():
             raise ImageData.ProcessingCancelled("User cancelled processing")
             
-        return all_uniques, all_duplicates
+        return grouping_index
     
-    def _merge_folder_results(self, 
-                              all_uniques: List, 
-                              all_duplicates: Dict,
-                              total_folders: int,
-                              log: Callable[[str], None]) -> tuple[List, Dict]:
+    def _walk_folders(self,
+                      folders: List[str],
+                      extensions: List[str],
+                      progress_callback: Optional[Callable[[str, int, int], None]],
+                      folder_status_callback: Optional[Callable[[str, str], None]],
+                      stats: ScanStats,
+                      hardlink_index: HardlinkIndex,
+                      fingerprints: Optional[DirectoryFingerprints] = None) -> List[ImageData.ImageData]:
         """
-        Merge results from multiple folders to detect cross-folder duplicates.
+        List the files of all folders without opening them.
+        
+        For detection modes that read every file themselves (perceptual), where
+        a metadata pass would only read each file once more. Hardlinks are
+        claimed as in the metadata pass, so each inode is listed once.
         
         Returns:
-            Tuple of (final_uniques, final_duplicates) after merging.
+            ImageData per file, holding only its path, size and mtime
+        """
+        suffixes = normalize_extensions(extensions)
+        visited_dirs = set()
+        files = []
+        for done, folder in enumerate(folders, 1):
+            if folder_status_callback:
+                folder_status_callback(folder, "Scanning")
+            count = 0
+            for entry in walk_files(folder, suffixes, visited_dirs, self, fingerprints):
+                statinfo = entry_stat(entry)
+                if statinfo is None:
+                    continue
+                if not hardlink_index.claim(entry.path, statinfo):
+                    stats.add('hardlinks_skipped')
+                    continue
+                files.append(ImageData.ImageData(entry.path, None, statinfo.st_size,
+                                                 mtime_ns=statinfo.st_mtime_ns))
+                count += 1
+            if folder_status_callback:
+                folder_status_callback(folder, f"Done ({count} files)")
+            if progress_callback:
+                progress_callback(f"Processed folders: {done}/{len(folders)}", done, len(folders))
+        return files
+    
+    def _log_stats(self, stats: ScanStats, log: Callable[[str], None]):
+        """Log per-stage timings (summed over all workers)."""
+        processed = stats.get('processed_files')
+        if processed:
+            log(f"Parsing: {processed} files, {stats.get('parse_seconds'):.2f}s worker time")
+        hashed = stats.get('hashed_files')
+        if hashed:
+            log(f"Hashing: {hashed} files, {stats.get('hash_seconds'):.2f}s worker time")
+    
+    def _log_staged_stats(self, stats: ScanStats, log: Callable[[str], None]):
+        """Log how many bytes each stage of the staged detection avoided reading."""
+        mb = 1024 * 1024
+        total = stats.get('bytes_total')
+        read = stats.get('bytes_read_partial') + stats.get('bytes_read_full')
+        log(f"Staged detection read {read / mb:.1f} MB of {total / mb:.1f} MB "
+            f"(size filter avoided {stats.get('bytes_avoided_by_size') / mb:.1f} MB, "
+            f"partial hash avoided {stats.get('bytes_avoided_by_partial') / mb:.1f} MB)")
+    
+    def _expand_per_file(self, grouping_index: GroupingIndex):
         """
-        log(f"Merging results from {total_folders} folders...")
+        Turn metadata-pass groups back into one ImageData per file.
         
-        # Build a map of all images
-        image_map = {}
+        Paths grouped under the same metadata key share its size (part of every
+        key), which is all the staged detection needs from them. Files carried
+        over from a previous result are grouped by digest and keep it.
+        The groups are read in a single pass (one merge of a spilled index).
         
-        # Add existing duplicates
-        for img_data, paths in all_duplicates.items():
-            image_map[img_data] = paths
+        Yields:
+            ImageData (ChecksumImageData for carried files) per file
+        """
+        for img_data, paths in grouping_index.iter_groups():
+            if len(paths) == 1:
+                yield img_data
+                continue
+            for path in paths:
+                yield self._carried_item(img_data, path, True)
+    
+    def _check_previous_result(self, previous_result: ScanResult, extensions: List[str],
+                               detection_mode: str, hash_algorithm: Optional[str]):
+        """Raise ValueError if previous_result cannot be reused by this scan."""
+        if detection_mode not in INCREMENTAL_MODES:
+            raise ValueError(f"Incremental scans are not supported in {detection_mode} mode. "
+                             f"Expected one of {INCREMENTAL_MODES}")
+        if previous_result.base_filtered:
+            # Files the base result already held are missing, they would be lost in unchanged directories
+            raise ValueError("Previous result was filtered against a base result and lacks files; "
+                             "rescan without a base result to get a reusable result")
+        if previous_result.detection_mode != detection_mode:
+            raise ValueError(f"Previous result was scanned in {previous_result.detection_mode} mode, "
+                             f"this scan uses {detection_mode}")
+        if previous_result.hash_algorithm != hash_algorithm:
+            raise ValueError(f"Previous result uses hash algorithm {previous_result.hash_algorithm}, "
+                             f"this scan uses {hash_algorithm}")
+        if set(previous_result.extension.split(', ')) != set(extensions):
+            # Files of other extensions in unchanged directories would be missed or kept
+            raise ValueError(f"Previous result was scanned for {previous_result.extension}, "
+                             f"this scan uses {', '.join(extensions)}")
+    
+    def _claim_previous_hardlinks(self, previous_result: ScanResult, hardlink_index: HardlinkIndex):
+        """
+        Claim the primary paths of the previous result's hardlinks before walking.
         
-        # Check uniques against the map
-        for img_data in all_uniques:
-            if img_data in image_map:
-                image_map[img_data].add(img_data.path)
-            else:
-                image_map[img_data] = {img_data.path}
-        
-        # Rebuild final structures based on path count
-        final_duplicates = {}
-        final_uniques = []
-        for img_data, paths in image_map.items():
-            if len(paths) > 1:
-                final_duplicates[img_data] = paths
+        A primary carried over from an unchanged directory is not walked, so
+        without this its links in changed directories would be read as new files.
+        """
+        for primary in previous_result.hardlinks:
+            try:
+                hardlink_index.claim(primary, os.stat(primary))
+            except OSError:
+                continue
+    
+    def _carry_over(self, previous_result: ScanResult, unchanged_dirs: Set[str], grouping_index: GroupingIndex,
+                    hardlink_index: HardlinkIndex, keep_digests: bool) -> int:
+        """
+        Add the previous result's files in unchanged directories to the grouping index.
+        
+        With keep_digests (checksum and staged modes), files keep their digests,
+        so they are not read again.
+        
+        Returns:
+            Number of files carried over.
+        """
+        carried = 0
+        groups = itertools.chain(((img, (img.path,)) for img in previous_result.uniques),
+                                 previous_result.duplicates.items())
+        for key, paths in groups:
+            for path in paths:
+                if os.path.dirname(path) in unchanged_dirs:
+                    grouping_index.add(self._carried_item(key, path, keep_digests))
+                    carried += 1
+        
+        # Links in unchanged directories are not walked either
+        for primary, links in previous_result.hardlinks.items():
+            kept = {path for path in links if os.path.dirname(path) in unchanged_dirs}
+            if kept:
+                hardlink_index.links.setdefault(primary, set()).update(kept)
+        return carried
+    
+    def _carried_item(self, key, path: str, keep_digest: bool):
+        """
+        ImageData for one file of a previous group.
+        
+        Paths grouped under a key share its size and, in checksum and staged
+        modes, its digest (staged uniques may have none); in metadata mode the
+        first pass only needs the metadata.
+        """
+        if keep_digest and isinstance(key, ChecksumImageData):
+            if path == key.path:
+                return key
+            return ChecksumImageData(path, None, key.size, None, key.exif_date, key._checksum, key.algorithm,
+                                     mtime_ns=key.mtime_ns)
+        if path == key.path and type(key) is ImageData.ImageData:
+            return key
+        return ImageData.ImageData(path, None, key.size, None, key.exif_date, mtime_ns=key.mtime_ns)
+    
+    def _base_membership(self, base_result: ScanResult) -> Callable:
+        """
+        Build is_known(img_data): True if the item's group is in the base result.
+        
+        Staged mode leaves files with a unique size unhashed, in either result.
+        Only files sharing a size with the other side can match, so only those
+        are hashed, base items the first time a scanned item of their size is seen.
+        """
+        known_keys = set()
+        unhashed_by_size = {}
+        base_sizes = set()
+        for item in itertools.chain(base_result.uniques, base_result.duplicates):
+            base_sizes.add(item.size)
+            if getattr(item, '_digest', False) is None:
+                unhashed_by_size.setdefault(item.size, []).append(item)
             else:
-                final_uniques.append(img_data)
+                known_keys.add(item.group_key)
+        
+        def is_known(img_data):
+            for item in unhashed_by_size.pop(img_data.size, ()):
+                item.checksum  # Calculated and kept, so group_key includes it
+                known_keys.add(item.group_key)
+            if getattr(img_data, '_digest', False) is None and img_data.size in base_sizes:
+                img_data.checksum
+            return img_data.group_key in known_keys
         
-        return final_uniques, final_duplicates
+        return is_known
     
     def _filter_against_base(self, 
                              uniques: List, 
@@ -245,16 +663,13 @@ class ScannerService:
         """
         log(f"Filtering results against base result ({len(base_result.uniques)} unique, {len(base_result.duplicates)} duplicate groups)...")
         
-        # Build set of known items from base result
-        known_items = set()
-        known_items.update(base_result.uniques)
-        known_items.update(base_result.duplicates.keys())
+        is_known = self._base_membership(base_result)
         
         # Filter uniques
-        filtered_uniques = [u for u in uniques if u not in known_items]
+        filtered_uniques = [u for u in uniques if not is_known(u)]
         
         # Filter duplicates
-        filtered_duplicates = {d: paths for d, paths in duplicates.items() if d not in known_items}
+        filtered_duplicates = {d: paths for d, paths in duplicates.items() if not is_known(d)}
         
         log(f"After filtering: {len(filtered_uniques)} unique files and {len(filtered_duplicates)} distinct duplicate groups.")
         
@@ -0,0 +1,359 @@
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+from data import ImageData
+from data.ScanResult import ScanResult, MODE_CHECKSUM, MODE_METADATA, MODE_CONTENT
+from data.ScanStats import ScanStats
+from data.HardlinkIndex import HardlinkIndex
+from data.LiveGroupingIndex import LiveGroupingIndex
+from data.cache import MetadataCache, ChecksumCache
+from data.hashing import DEFAULT_HASH_ALGORITHM, HASH_ALGORITHMS, content_algorithm
+from data.walker import normalize_extensions, walk_files
+from data.watchers import create_watcher, EVENT_REMOVED, EVENT_RESCAN
+from data.workers import ScanExecutor
+
+# Modes that group each file on its own; staged and perceptual need a pass over all files
+WATCH_MODES = (MODE_METADATA, MODE_CHECKSUM, MODE_CONTENT)
+
+
+class GroupDelta:
+    """
+    New state of one group after a batch of file changes.
+
+    paths holds every file now in the group: one path for a unique file, several
+    for duplicates, none once the group is gone. Consumers identify groups by key.
+    """
+
+    __slots__ = ('key', 'img_data', 'paths')
+
+    def __init__(self, key, img_data, paths):
+        """
+        Args:
+            key: The group_key tuple of the group
+            img_data: ImageData of the group's key file (the last one if the group is gone)
+            paths: Set of the group's paths
+        """
+        self.key = key
+        self.img_data = img_data
+        self.paths = paths
+
+    @property
+    def removed(self) -> bool:
+        return not self.paths
+
+    @property
+    def is_duplicate(self) -> bool:
+        return len(self.paths) > 1
+
+    def __repr__(self):
+        return f"GroupDelta({self.img_data.filename!r}, {len(self.paths)} paths)"
+
+
+class WatchService:
+    """
+    Long-running watch mode keeping a live duplicate index of folders.
+
+    The folders are scanned once into a LiveGroupingIndex, then file system
+    events (inotify, or polling where it is not available) update the index
+    file by file. After each batch of changes, subscribers receive one
+    GroupDelta per group that changed. Events are collected until the folders
+    have been quiet for settle_time, so a burst of copies is processed as one
+    batch a few seconds after it ends.
+    """
+
+    MAX_BATCH_SECONDS = 10.0  # Process a continuous stream of events at least this often
+
+    def __init__(self,
+                 folders: List[str],
+                 ext,
+                 detection_mode: str = MODE_CHECKSUM,
+                 hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+                 metadata_cache: Optional[MetadataCache] = None,
+                 checksum_cache: Optional[ChecksumCache] = None,
+                 max_workers: Optional[int] = None,
+                 settle_time: float = 1.0,
+                 poll_interval: float = 5.0,
+                 use_inotify: bool = True):
+        """
+        Args:
+            folders: List of folder paths to watch.
+            ext: File extension (string) or list of extensions to filter (without dot).
+            detection_mode: One of WATCH_MODES.
+            hash_algorithm: Digest algorithm for checksum and content modes (one of HASH_ALGORITHMS).
+            metadata_cache: Optional MetadataCache used to skip unchanged files.
+            checksum_cache: Optional ChecksumCache so unchanged files are not hashed again.
+            max_workers: Optional worker budget for processing files.
+            settle_time: Seconds without new events before a batch is processed.
+            poll_interval: Seconds between walks when polling instead of using inotify.
+            use_inotify: False forces polling.
+        """
+        if detection_mode not in WATCH_MODES:
+            raise ValueError(f"Watch mode supports {WATCH_MODES}, not {detection_mode}")
+        if hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_algorithm}. Expected one of {HASH_ALGORITHMS}")
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.extensions = [ext] if isinstance(ext, str) else list(ext)
+        self.suffixes = normalize_extensions(self.extensions)
+        self.detection_mode = detection_mode
+        self.use_checksum = detection_mode != MODE_METADATA
+        self.hash_algorithm = content_algorithm(hash_algorithm) if detection_mode == MODE_CONTENT else hash_algorithm
+        self.metadata_cache = metadata_cache
+        self.checksum_cache = checksum_cache
+        self.max_workers = max_workers
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self.index = LiveGroupingIndex()
+        self.stats = ScanStats()
+        self._hardlinks = HardlinkIndex()
+        self._subscribers = []
+        self._stop_event = threading.Event()
+        self._ready = threading.Event()
+        self._watcher = None
+        self._thread = None
+
+    def subscribe(self, callback: Callable[[List[GroupDelta]], None]):
+        """
+        Register callback(deltas), called from the watch thread after every batch.
+
+        The first call carries every group of the initial scan.
+        """
+        self._subscribers.append(callback)
+
+    def start(self, log_callback: Callable[[str], None] = None):
+        """Run the watch on a daemon thread."""
+        self._thread = threading.Thread(target=self.run, args=(log_callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        """Stop watching; with wait, also wait for the watch thread to end."""
+        self._stop_event.set()
+        if self._watcher:
+            self._watcher.interrupt()
+        if wait and self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the initial scan is done and events are being processed."""
+        return self._ready.wait(timeout)
+
+    # Interface expected by ImageData helpers
+    def check(self):
+        if self._stop_event.is_set():
+            raise ImageData.ProcessingCancelled("Watch stopped")
+
+    def run(self, log_callback: Callable[[str], None] = None):
+        """Scan the folders, then apply file system events until stop() is called."""
+        def log(msg):
+            if log_callback: log_callback(msg)
+
+        # Watch before scanning, so files arriving during the scan are not missed
+        self._watcher = create_watcher(self.folders, self.suffixes, self.poll_interval, self.use_inotify)
+        log(f"Watching {len(self.folders)} folders with {type(self._watcher).__name__}")
+        executor = ScanExecutor(max_workers=self.max_workers, controller=self,
+                                checksum_cache=self.checksum_cache if self.use_checksum else None)
+        try:
+            ImageData.find_duplicates(
+                self.folders, self.extensions, controller=self, use_checksum=self.use_checksum,
+                metadata_cache=self.metadata_cache, scan_executor=executor, stats=self.stats,
+                hash_algorithm=self.hash_algorithm,
+                hardlink_index=self._hardlinks, grouping_index=self.index
+            )
+            result = self.result()
+            log(f"Initial scan: {result.total_files_scanned} files, {result.duplicate_groups_count} duplicate groups")
+            self._publish([GroupDelta(img.group_key, img, {img.path}) for img in result.uniques] +
+                          [GroupDelta(img.group_key, img, paths) for img, paths in result.duplicates.items()])
+            self._ready.set()
+
+            while not self._stop_event.is_set():
+                # Blocks without using CPU until something changes
+                events = self._watcher.read_events()
+                deadline = time.monotonic() + self.MAX_BATCH_SECONDS
+                while events and time.monotonic() < deadline:
+                    more = self._watcher.read_events(self.settle_time)
+                    if not more:
+                        break
+                    events.extend(more)
+                if events and not self._stop_event.is_set():
+                    deltas = self._apply_events(events, executor)
+                    if deltas:
+                        log(f"Watch: {len(events)} events changed {len(deltas)} groups")
+                        self._publish(deltas)
+        except ImageData.ProcessingCancelled:
+            pass
+        finally:
+            executor.shutdown(cancel_futures=True)
+            self._watcher.close()
+            self._ready.set()
+            if self.checksum_cache:
+                self.checksum_cache.flush()
+            log("Watch stopped.")
+
+    def _publish(self, deltas: List[GroupDelta]):
+        for callback in self._subscribers:
+            try:
+                callback(deltas)
+            except Exception as e:
+                print(f"Watch subscriber failed: {e}")
+
+    def _apply_events(self, events, executor: ScanExecutor) -> List[GroupDelta]:
+        """Update the index for a batch of events and return the changed groups."""
+        changed = {}  # path -> last event, so repeated events of one file are handled once
+        for event, path in events:
+            if event == EVENT_RESCAN:
+                # Events were lost: watch directories created meanwhile, compare the whole directory with the index
+                self._watcher.rewatch(path)
+                for indexed in self.index.paths_under(path):
+                    changed[indexed] = event
+                for entry in walk_files(path, self.suffixes, controller=self):
+                    changed[entry.path] = event
+            else:
+                changed[path] = event
+
+        affected = {}  # group key -> ImageData, for every group that gained or lost a file
+        promoted = []  # hardlinks that take the place of a removed primary path
+        handled = set()  # paths queued for processing
+
+        def unindex(path):
+            img_data = self.index.remove(path)
+            if img_data is not None:
+                affected[img_data.group_key] = img_data
+
+        def remove(path):
+            unindex(path)
+            successor = self._hardlinks.release(path)
+            if successor is not None:
+                promoted.append(successor)
+
+        pending = []
+        for path, event in changed.items():
+            self.check()
+            if event == EVENT_REMOVED:
+                # A removed directory takes all the files below it, also links that were never indexed
+                for indexed in [path] if path in self.index else self.index.paths_under(path):
+                    remove(indexed)
+                for link in self._hardlinks.paths_under(path):
+                    remove(link)
+                continue
+            try:
+                statinfo = os.stat(path)
+            except OSError:
+                remove(path)  # Gone again before the batch was processed
+                continue
+            if path in self._hardlinks:
+                primary = self._hardlinks.primary_of(path, statinfo)
+                if primary is None:
+                    remove(path)  # Replaced by another file (e.g. saved through a rename), claimed anew below
+                elif primary != path:
+                    # Written through a further hardlink: the inode's group is indexed under its primary path
+                    path = primary
+                    try:
+                        statinfo = os.stat(path)
+                    except OSError:
+                        continue  # The primary is being removed, this link is promoted then
+            if path in handled:
+                continue
+            indexed = self.index.get(path)
+            if indexed is not None and (indexed.size, indexed.mtime_ns) == (statinfo.st_size, statinfo.st_mtime_ns):
+                continue  # e.g. a chmod, or the same change reported twice
+            if indexed is None and not self._hardlinks.claim(path, statinfo):
+                continue  # New hardlink to a file that is already indexed
+            handled.add(path)
+
+            cached = (self.metadata_cache.lookup(path, statinfo, self.use_checksum, self.hash_algorithm)
+                      if self.metadata_cache else None)
+            if cached and (not self.use_checksum or cached._checksum is not None):
+                self.stats.add('cache_hits')
+                pending.append((path, None, cached, statinfo))
+            else:
+                future = executor.submit(path, statinfo, self.use_checksum, self.hash_algorithm)
+                pending.append((path, future, None, statinfo))
+
+        for path in promoted:
+            if path in handled:
+                continue  # Already handled as a change of its own
+            try:
+                statinfo = os.stat(path)
+            except OSError:
+                continue
+            handled.add(path)
+            future = executor.submit(path, statinfo, self.use_checksum, self.hash_algorithm)
+            pending.append((path, future, None, statinfo))
+
+        for path, future, img_data, statinfo in pending:
+            if future is not None:
+                try:
+                    img_data = ImageData.image_data_from_record(future.result(), self.use_checksum,
+                                                                self.hash_algorithm)
+                except Exception as exc:
+                    print(f'Generated an exception: {exc}')
+                    img_data = None
+                self.stats.add('processed_files')
+                if img_data and self.metadata_cache:
+                    self.metadata_cache.store(img_data, statinfo)
+            # Replaced in the index only: the file keeps its hardlink identity and links
+            unindex(path)
+            if img_data:
+                self.index.add(img_data)
+                affected[img_data.group_key] = img_data
+
+        deltas = []
+        for key, img_data in affected.items():
+            group = self.index.group(key)
+            deltas.append(GroupDelta(key, *group) if group else GroupDelta(key, img_data, set()))
+        return deltas
+
+    def result(self) -> ScanResult:
+        """Snapshot of the current index as a ScanResult."""
+        duplicates = {img_data: set(paths) for img_data, paths in self.index.duplicates().items()}
+        return ScanResult(
+            uniques=self.index.uniques(),
+            duplicates=duplicates,
+            scanned_paths=list(self.folders),
+            extension=', '.join(self.extensions),
+            detection_mode=self.detection_mode,
+            stats=self.stats,
+            hash_algorithm=self.hash_algorithm if self.use_checksum else None,
+            hardlinks={path: set(links) for path, links in self._hardlinks.links.items()}
+        )
+
+
+def _print_deltas(deltas: List[GroupDelta]):
+    for delta in deltas:
+        if delta.removed:
+            print(f"- {delta.img_data.filename}")
+        elif delta.is_duplicate:
+            print(f"* {delta.img_data.filename} ({len(delta.paths)} copies)")
+            for path in sorted(delta.paths):
+                print(f"    {path}")
+        else:
+            print(f"+ {next(iter(delta.paths))}")
+
+
+def main(argv=None):
+    """Command line watch: prints every group change until interrupted."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Watch folders and report duplicates as files change.")
+    parser.add_argument('folders', nargs='+')
+    parser.add_argument('--ext', nargs='+', default=['jpg'], help="file extensions (default: jpg)")
+    parser.add_argument('--mode', choices=WATCH_MODES, default=MODE_CHECKSUM)
+    parser.add_argument('--hash', choices=HASH_ALGORITHMS, default=DEFAULT_HASH_ALGORITHM)
+    parser.add_argument('--settle', type=float, default=1.0, help="seconds of quiet before changes are applied")
+    parser.add_argument('--poll', type=float, default=None, help="poll every N seconds instead of using inotify")
+    args = parser.parse_args(argv)
+
+    service = WatchService(args.folders, args.ext, detection_mode=args.mode, hash_algorithm=args.hash,
+                           settle_time=args.settle, poll_interval=args.poll or 5.0,
+                           use_inotify=args.poll is None)
+    service.subscribe(_print_deltas)
+    try:
+        service.run(log_callback=print)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
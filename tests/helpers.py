@@ -0,0 +1,18 @@
+"""
+Helpers shared by the unit tests.
+"""
+
+
+def groups(result):
+    """
+    Return the groups of a scan result or grouping index as a set of frozensets of paths.
+
+    Args:
+        result: ScanResult (uniques/duplicates attributes) or GroupingIndex /
+                ExternalGroupingIndex (uniques()/duplicates() methods)
+    """
+    uniques, duplicates = result.uniques, result.duplicates
+    if callable(uniques):
+        uniques, duplicates = uniques(), duplicates()
+    return ({frozenset([img.path]) for img in uniques} |
+            {frozenset(paths) for paths in duplicates.values()})
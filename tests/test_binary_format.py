@@ -0,0 +1,123 @@
+"""
+Unit tests for the memory-mapped binary scan-result format.
+
+Tests cover:
+- Round trip through ScanResultStorage, selected by file extension and detected on load
+- Records are views of the mapped file and decoded only when accessed
+- Directory and EXIF strings are stored once
+- Wrong magic, unsupported versions and truncated files are rejected
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.binary_format import BINARY_EXTENSION, is_binary_file, open_binary, write_binary
+from data.ChecksumImageData import ChecksumImageData
+from data.ColumnarScanResult import ColumnarScanResult
+from data.ImageData import ImageData
+from data.ScanResult import ScanResult, MODE_CHECKSUM, MODE_METADATA
+from data.storage import ScanResultStorage
+
+
+def make_result(count=40):
+    uniques = [ChecksumImageData(f'/photos/2020/{i}.jpg', None, i, None, '2020:01:01 00:00:00', f'{i:064x}',
+                                 'sha256', mtime_ns=10**18 + i) for i in range(count)]
+    duplicates = {
+        ChecksumImageData(f'/photos/2021/{i}.jpg', None, 500 + i, f'orig_{i}.jpg', None, f'{i + 10**9:064x}',
+                          'sha256', mtime_ns=i): {f'/photos/2021/{i}.jpg', f'/backup/{i}.jpg'}
+        for i in range(count)
+    }
+    return ScanResult(uniques, duplicates, ['/photos', '/backup'], 'jpg', MODE_CHECKSUM, timestamp=99.0,
+                      hash_algorithm='sha256', hardlinks={'/photos/2020/0.jpg': {'/links/0.jpg'}})
+
+
+class TestBinaryFormat(unittest.TestCase):
+    """Test cases for data.binary_format."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'results' + BINARY_EXTENSION)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_through_storage(self):
+        result = make_result()
+        self.assertTrue(ScanResultStorage.save_results(result, self.path))
+        self.assertTrue(is_binary_file(self.path))
+
+        loaded = ScanResultStorage.load_results(self.path)
+        self.assertIsInstance(loaded, ColumnarScanResult)
+        self.assertEqual(loaded.total_files_scanned, result.total_files_scanned)
+        self.assertEqual(loaded.duplicate_groups_count, result.duplicate_groups_count)
+        self.assertEqual(list(loaded.uniques), result.uniques)
+        self.assertEqual(dict(loaded.duplicates.items()), result.duplicates)
+        self.assertEqual(loaded.hardlinks, result.hardlinks)
+        self.assertEqual((loaded.hash_algorithm, loaded.timestamp), ('sha256', 99.0))
+
+        key = next(iter(loaded.duplicates))
+        self.assertEqual(key.filename, 'orig_0.jpg')
+        self.assertEqual(key.checksum, f'{10**9:064x}')
+        self.assertEqual(loaded.duplicates[key], {'/photos/2021/0.jpg', '/backup/0.jpg'})
+        self.assertEqual(loaded.uniques[3].mtime_ns, 10**18 + 3)
+        self.assertEqual(len(list(ScanResultStorage.iter_groups(self.path))), 80)
+
+    def test_records_are_mapped(self):
+        write_binary(make_result(), self.path)
+        loaded = open_binary(self.path)
+        self.assertFalse(loaded.records.flags.owndata)
+        self.assertFalse(loaded.records.flags.writeable)
+        # Nothing is decoded until a view is touched
+        self.assertIsNone(loaded._uniques)
+        self.assertEqual(loaded.records['size'][:3].tolist(), [0, 1, 2])
+
+    def test_strings_deduplicated(self):
+        write_binary(make_result(), self.path)
+        strings = open_binary(self.path).strings
+        pool = [strings[i] for i in range(len(strings))]
+        self.assertEqual(len(pool), len(set(pool)))
+        self.assertEqual(pool.count('/photos/2020'), 1)
+        self.assertEqual(pool.count('2020:01:01 00:00:00'), 1)
+
+    def test_metadata_result_and_empty_result(self):
+        items = [ImageData('/a/x.jpg', 1.0, 5, exif_date='2020:01:01 00:00:00'),
+                 ImageData('/b/x.jpg', 1.0, 5, exif_date='2020:01:01 00:00:00')]
+        result = ColumnarScanResult.from_items(items, ['/a', '/b'], 'jpg', MODE_METADATA)
+        write_binary(result, self.path)
+        self.assertEqual(dict(open_binary(self.path).duplicates.items()), dict(result.duplicates.items()))
+
+        write_binary(ScanResult([], {}, [], 'jpg', MODE_CHECKSUM), self.path)
+        self.assertEqual(open_binary(self.path).total_files_scanned, 0)
+
+    def test_invalid_files(self):
+        json_path = os.path.join(self.tmp.name, 'results.json')
+        ScanResultStorage.save_results(make_result(2), json_path)
+        self.assertFalse(is_binary_file(json_path))
+        with self.assertRaises(ValueError):
+            open_binary(json_path)
+
+        write_binary(make_result(2), self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(8)
+            f.write(struct.pack('<I', 99))
+        with self.assertRaisesRegex(ValueError, 'version'):
+            open_binary(self.path)
+
+        write_binary(make_result(2), self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+        with self.assertRaises(ValueError):
+            open_binary(self.path)
+        self.assertIsNone(ScanResultStorage.load_results(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
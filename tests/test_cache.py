@@ -0,0 +1,174 @@
+"""
+Unit tests for the persistent metadata cache.
+
+Tests cover:
+- Round trip of ImageData fields keyed by stat identity
+- Invalidation when size or mtime change
+- The default cache file lives in the per-user cache directory
+- find_duplicates answering unchanged files without opening them
+- Each scan logs the cache hits and misses of its own lookups
+- Checksum cache: unchanged files are not re-hashed, algorithms are kept apart
+- Checksum cache: pruning entries of deleted or modified files
+- Checksum cache: entries written by process-pool workers
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data import ImageData
+from data.cache import MetadataCache, ChecksumCache
+from data.paths import APP_DIR_NAME, user_cache_dir
+from data.workers import ScanExecutor, EXECUTOR_PROCESSES
+from data.ChecksumImageData import ChecksumImageData
+
+
+class TestMetadataCache(unittest.TestCase):
+    """Test cases for MetadataCache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = MetadataCache(os.path.join(self.tmp.name, 'cache.sqlite'))
+        self.path = os.path.join(self.tmp.name, 'photo.jpg')
+        with open(self.path, 'wb') as f:
+            f.write(b'not really a jpeg')
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        st = os.stat(self.path)
+        img = ChecksumImageData(self.path, st.st_mtime, st.st_size, 'photo.jpg', '2023:01:02 03:04:05', 'abc123')
+        self.cache.store(img, st)
+        self.cache.flush()
+
+        cached = self.cache.lookup(self.path, st, use_checksum=True)
+        self.assertIsInstance(cached, ChecksumImageData)
+        self.assertEqual(cached.exif_date, '2023:01:02 03:04:05')
+        self.assertEqual(cached.checksum, 'abc123')
+        self.assertEqual(cached.size, st.st_size)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_modified_file_misses(self):
+        st = os.stat(self.path)
+        self.cache.store(ImageData.ImageData(self.path, st.st_mtime, st.st_size, 'photo.jpg'), st)
+        self.cache.flush()
+
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        self.assertIsNone(self.cache.lookup(self.path, os.stat(self.path)))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_scan_logs_its_own_lookups(self):
+        from PIL import Image
+        from services.ScannerService import ScannerService
+        os.remove(self.path)
+        for name in ('a.jpg', 'b.jpg'):
+            Image.new('RGB', (8, 8), 'red').save(os.path.join(self.tmp.name, name))
+        checksum_cache = ChecksumCache(os.path.join(self.tmp.name, 'checksums.sqlite'))
+        try:
+            for caches, expected in (({'metadata_cache': self.cache}, ['Metadata cache: 0 hits, 2 misses',
+                                                                       'Metadata cache: 2 hits, 0 misses']),
+                                     ({'checksum_cache': checksum_cache}, ['Checksum cache: 0 hits, 2 misses',
+                                                                           'Checksum cache: 2 hits, 0 misses'])):
+                for line in expected:
+                    messages = []
+                    ScannerService().scan([self.tmp.name], 'jpg', use_checksum=True, log_callback=messages.append,
+                                          **caches)
+                    self.assertIn(line, messages)
+        finally:
+            checksum_cache.close()
+
+    def test_default_path_in_user_cache_dir(self):
+        with patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmp.name}), patch.object(sys, 'platform', 'linux'):
+            cache_dir = user_cache_dir()
+        self.assertEqual(cache_dir, os.path.join(self.tmp.name, APP_DIR_NAME))
+        self.assertEqual(os.path.dirname(MetadataCache.DEFAULT_CACHE_PATH), user_cache_dir())
+
+        default_path = os.path.join(cache_dir, 'metadata_cache.sqlite')
+        with patch.object(MetadataCache, 'DEFAULT_CACHE_PATH', default_path):
+            cache = MetadataCache()
+        cache.close()
+        self.assertEqual(cache.filepath, default_path)
+        self.assertTrue(os.path.exists(default_path))
+
+    def test_find_duplicates_skips_unchanged_files(self):
+        from PIL import Image
+        os.remove(self.path)
+        Image.new('RGB', (8, 8), 'red').save(os.path.join(self.tmp.name, 'real.jpg'))
+
+        first = ImageData.find_duplicates([self.tmp.name], 'jpg', metadata_cache=self.cache)
+        self.assertEqual(len(first[0]), 1)
+
+        with patch('data.workers.get_exif_date') as mock_exif:
+            uniques, duplicates = ImageData.find_duplicates([self.tmp.name], 'jpg', metadata_cache=self.cache)
+        mock_exif.assert_not_called()
+        self.assertEqual(len(uniques), 1)
+        self.assertEqual(uniques[0].filename, 'real.jpg')
+
+
+
+class TestChecksumCache(unittest.TestCase):
+    """Test cases for ChecksumCache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ChecksumCache(os.path.join(self.tmp.name, 'checksums.sqlite'))
+        self.path = os.path.join(self.tmp.name, 'photo.jpg')
+        with open(self.path, 'wb') as f:
+            f.write(b'pixels')
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_unchanged_file_is_not_rehashed(self):
+        first = ChecksumImageData.calculate_checksum(self.path, cache=self.cache)
+        with patch('data.ChecksumImageData.file_digest') as mock_digest:
+            second = ChecksumImageData.calculate_checksum(self.path, cache=self.cache)
+        mock_digest.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_algorithms_are_separate_entries(self):
+        md5 = ChecksumImageData.calculate_checksum(self.path, algorithm='md5', cache=self.cache)
+        sha = ChecksumImageData.calculate_checksum(self.path, algorithm='sha256', cache=self.cache)
+        self.assertNotEqual(md5, sha)
+        self.assertEqual(self.cache.lookup(os.stat(self.path), 'sha256'), sha)
+
+    def test_modified_file_is_rehashed_and_pruned(self):
+        old = ChecksumImageData.calculate_checksum(self.path, cache=self.cache)
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        new = ChecksumImageData.calculate_checksum(self.path, cache=self.cache)
+        self.assertNotEqual(old, new)
+
+        # The outdated entry goes, the current one stays
+        self.assertEqual(self.cache.prune(), 1)
+        os.remove(self.path)
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_process_workers_populate_cache(self):
+        from PIL import Image
+        Image.new('RGB', (8, 8), 'blue').save(self.path)
+        executor = ScanExecutor(EXECUTOR_PROCESSES, max_workers=2, checksum_cache=self.cache)
+        try:
+            record = executor.submit(self.path, use_checksum=True).result()
+        finally:
+            executor.shutdown()
+        self.assertIsNotNone(record[4])
+        # Flushed by the worker on exit, visible through our own connection
+        self.assertEqual(self.cache.lookup(os.stat(self.path)), record[4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Unit tests for the SQLite scan catalog.
+
+Tests cover:
+- A stored scan loads back as an equal ScanResult, directory fingerprints included
+- Queries by digest, copy count, size, year, filename and path
+- Queries span scans; deleting a scan removes its items and paths
+- The default catalog file lives in the per-user data directory
+- The ScanResultStorage catalog API and the command line
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.catalog import ScanCatalog, main
+from data.ChecksumImageData import ChecksumImageData
+from data.ImageData import ImageData
+from data.paths import APP_DIR_NAME, user_data_dir
+from data.PerceptualImageData import PerceptualImageData
+from data.ScanResult import ScanResult, MODE_CHECKSUM, MODE_METADATA, MODE_PERCEPTUAL
+from data.storage import ScanResultStorage
+
+MB = 1024 * 1024
+
+
+def checksum_result(prefix):
+    uniques = [ChecksumImageData(f'{prefix}/u{i}.jpg', None, i * MB, None, '2019:06:01 12:00:00', f'{i:032x}')
+               for i in range(1, 4)]
+    duplicates = {
+        ChecksumImageData(f'{prefix}/big.jpg', None, 20 * MB, None, '2019:12:31 23:59:59', 'ab' * 16):
+            {f'{prefix}/big.jpg'} | {f'{prefix}/copy{i}/big.jpg' for i in range(6)},
+        ChecksumImageData(f'{prefix}/old.jpg', None, 11 * MB, None, None, 'cd' * 16,
+                          mtime_ns=1_230_000_000 * 10**9):  # December 2008
+            {f'{prefix}/old.jpg', f'{prefix}/b/old.jpg'},
+    }
+    return ScanResult(uniques, duplicates, [prefix], 'jpg', MODE_CHECKSUM, timestamp=1000.0,
+                      hash_algorithm='md5', hardlinks={f'{prefix}/u1.jpg': {f'{prefix}/link.jpg'}},
+                      directory_fingerprints={prefix: (1_600_000_000 * 10**9, 9), f'{prefix}/b': (5, 1)})
+
+
+class TestScanCatalog(unittest.TestCase):
+    """Test cases for ScanCatalog."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, 'catalog.sqlite')
+        self.catalog = ScanCatalog(self.db, batch_size=3)
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        result = checksum_result('/archive')
+        loaded = self.catalog.load_scan(self.catalog.add_scan(result, 'archive'))
+        self.assertEqual(loaded.uniques, result.uniques)
+        self.assertEqual(loaded.duplicates, result.duplicates)
+        self.assertEqual(loaded.hardlinks, result.hardlinks)
+        self.assertEqual(loaded.directory_fingerprints, result.directory_fingerprints)
+        self.assertEqual((loaded.detection_mode, loaded.hash_algorithm, loaded.timestamp),
+                         (MODE_CHECKSUM, 'md5', 1000.0))
+        self.assertIsNone(self.catalog.load_scan(999))
+
+    def test_default_path_in_user_data_dir(self):
+        with patch.dict(os.environ, {'XDG_DATA_HOME': self.tmp.name}), patch.object(sys, 'platform', 'linux'):
+            data_dir = user_data_dir()
+        self.assertEqual(data_dir, os.path.join(self.tmp.name, APP_DIR_NAME))
+        self.assertEqual(os.path.dirname(ScanCatalog.DEFAULT_CATALOG_PATH), user_data_dir())
+
+        default_path = os.path.join(data_dir, 'scan_catalog.sqlite')
+        with patch.object(ScanCatalog, 'DEFAULT_CATALOG_PATH', default_path):
+            ScanCatalog().close()
+        self.assertTrue(os.path.exists(default_path))
+
+    def test_other_kinds_round_trip(self):
+        metadata = ScanResult([ImageData('/m/a.jpg', 5.0, 10, 'renamed.jpg')], {}, ['/m'], 'jpg', MODE_METADATA)
+        key = PerceptualImageData('/p/a.jpg', 1.0, 10, perceptual_hash=0xFFFF0000FFFF0000, method='phash')
+        perceptual = ScanResult([], {key: {'/p/a.jpg', '/p/small.jpg'}}, ['/p'], 'jpg', MODE_PERCEPTUAL)
+        for result in (metadata, perceptual):
+            loaded = self.catalog.load_scan(self.catalog.add_scan(result))
+            self.assertEqual(loaded.uniques, result.uniques)
+            self.assertEqual(loaded.duplicates, result.duplicates)
+        self.assertEqual(self.catalog.load_scan(1).uniques[0].filename, 'renamed.jpg')
+
+    def test_queries(self):
+        first = self.catalog.add_scan(checksum_result('/a'))
+        second = self.catalog.add_scan(checksum_result('/b'))
+
+        self.assertEqual(self.catalog.scans_containing('ab' * 16), [first, second])
+        groups = list(self.catalog.query(digest='AB' * 16))
+        self.assertEqual([scan_id for scan_id, _, _ in groups], [first, second])
+        self.assertEqual(len(groups[0][2]), 7)
+
+        many_copies = list(self.catalog.query(min_copies=6))
+        self.assertEqual([img.filename for _, img, _ in many_copies], ['big.jpg', 'big.jpg'])
+
+        from_2019_over_10mb = list(self.catalog.query(scan_id=first, year=2019, min_size=10 * MB))
+        self.assertEqual([img.path for _, img, _ in from_2019_over_10mb], ['/a/big.jpg'])
+        self.assertEqual([img.path for _, img, _ in self.catalog.query(year=2008, scan_id=second)], ['/b/old.jpg'])
+
+        self.assertEqual(len(list(self.catalog.query(filename='u2.jpg'))), 2)
+        (_, img, paths), = self.catalog.query(path='/b/copy3/big.jpg')
+        self.assertIn('/b/copy3/big.jpg', paths)
+        self.assertEqual(len(list(self.catalog.query(limit=4))), 4)
+
+        scans = self.catalog.scans()
+        self.assertEqual([scan['files'] for scan in scans], [12, 12])
+        self.assertTrue(self.catalog.delete_scan(first))
+        self.assertEqual(self.catalog.scans_containing('ab' * 16), [second])
+        self.assertEqual(list(self.catalog.query(path='/a/big.jpg')), [])
+
+    def test_storage_api_and_cli(self):
+        scan_id = ScanResultStorage.save_to_catalog(checksum_result('/s'), self.db, 'stored')
+        self.assertEqual(ScanResultStorage.load_from_catalog(scan_id, self.db).total_files_scanned, 12)
+        self.assertEqual(len(ScanResultStorage.query_catalog(self.db, min_copies=2)), 2)
+
+        json_path = os.path.join(self.tmp.name, 'result.json')
+        ScanResultStorage.save_results(checksum_result('/cli'), json_path)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main(['--db', self.db, 'add', json_path, '--name', 'from cli'])
+            main(['--db', self.db, 'query', '--min-copies', '6', '--min-mb', '10'])
+        self.assertIn('Added scan', out.getvalue())
+        self.assertIn('/cli/copy0/big.jpg', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
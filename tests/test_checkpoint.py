@@ -0,0 +1,163 @@
+"""
+Unit tests for checkpointed, resumable scans.
+
+Tests cover:
+- An interrupted scan resumes to the same result without hashing finished files again
+- Files changed since the checkpoint are processed again, deleted files are dropped
+- Finished roots are not walked again on resume, but are walked by a new scan
+- A completed scan empties its checkpoint; a scan with other parameters ignores what it holds
+- Scan parameters round trip; a checkpoint without parameters cannot be resumed
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from data import ImageData
+from data.checkpoint import ScanCheckpoint
+from services.ScannerService import ScannerService
+from tests.helpers import groups
+
+
+class TestScanCheckpoint(unittest.TestCase):
+    """Test cases for ScanCheckpoint and ScannerService.resume_scan."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'photos')
+        os.makedirs(os.path.join(self.root, 'copies'))
+        for i in range(12):
+            Image.new('RGB', (8, 8), (i * 20, 0, 0)).save(os.path.join(self.root, f'{i}.jpg'))
+        for i in range(3):
+            shutil.copy2(os.path.join(self.root, f'{i}.jpg'), os.path.join(self.root, 'copies', f'{i}.jpg'))
+        self.checkpoint_path = os.path.join(self.tmp.name, 'scan.checkpoint')
+        self.service = ScannerService()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def interrupted_scan(self, after):
+        """Run the checksum walk until `after` files are done, then cancel it."""
+        def cancel(current, total):
+            if current >= after:
+                raise ImageData.ProcessingCancelled("Interrupted")
+
+        checkpoint = ScanCheckpoint(self.checkpoint_path, interval=3600)
+        checkpoint.save_params({'folders': [self.root], 'extensions': ['jpg'], 'detection_mode': 'checksum',
+                                'hash_algorithm': 'md5', 'perceptual_method': 'phash',
+                                'perceptual_max_distance': 10})
+        with self.assertRaises(ImageData.ProcessingCancelled):
+            ImageData.find_duplicates([self.root], 'jpg', progress_callback=cancel, use_checksum=True,
+                                      hash_algorithm='md5', checkpoint=checkpoint)
+        self.assertFalse(checkpoint.root_done(self.root))
+        checkpoint.close()
+
+    def test_resume_after_interruption(self):
+        self.interrupted_scan(after=5)
+        with ScanCheckpoint(self.checkpoint_path) as checkpoint:
+            finished = len(checkpoint)
+        self.assertGreaterEqual(finished, 4)
+
+        resumed = self.service.resume_scan(self.checkpoint_path)
+        fresh = self.service.scan([self.root], 'jpg', detection_mode='checksum', hash_algorithm='md5')
+        self.assertEqual(groups(resumed), groups(fresh))
+        self.assertEqual(len(resumed.duplicates), 3)
+        self.assertEqual(resumed.hash_algorithm, 'md5')
+        self.assertEqual(resumed.stats.get('checkpoint_hits'), finished)
+        self.assertEqual(resumed.stats.get('hashed_files'), 15 - finished)
+
+    def test_changed_and_deleted_files(self):
+        self.interrupted_scan(after=15)
+
+        # Rewrite one copy so it no longer matches, drop another
+        Image.new('RGB', (8, 8), (0, 0, 255)).save(os.path.join(self.root, 'copies', '0.jpg'))
+        os.remove(os.path.join(self.root, 'copies', '1.jpg'))
+
+        with ScanCheckpoint(self.checkpoint_path) as checkpoint:
+            finished = len(checkpoint)
+        resumed = self.service.resume_scan(self.checkpoint_path)
+        fresh = self.service.scan([self.root], 'jpg', detection_mode='checksum', hash_algorithm='md5')
+        self.assertEqual(groups(resumed), groups(fresh))
+        self.assertEqual(resumed.total_files_scanned, 14)
+        self.assertEqual(len(resumed.duplicates), 1)
+        # The rewritten copy fails the stat check, the deleted one is not found
+        self.assertLessEqual(resumed.stats.get('checkpoint_hits'), finished - 1)
+        self.assertEqual(resumed.stats.get('checkpoint_hits') + resumed.stats.get('hashed_files'), 14)
+
+    def test_finished_roots_are_not_walked(self):
+        other = os.path.join(self.tmp.name, 'other')
+        os.makedirs(other)
+        for i in range(4):
+            Image.new('RGB', (8, 8), (0, i * 50, 0)).save(os.path.join(other, f'{i}.jpg'))
+        checkpoint = ScanCheckpoint(self.checkpoint_path)
+        checkpoint.save_params({'folders': [self.root, other], 'extensions': ['jpg'], 'detection_mode': 'checksum',
+                                'hash_algorithm': 'md5', 'perceptual_method': 'phash',
+                                'perceptual_max_distance': 10})
+        ImageData.find_duplicates([self.root], 'jpg', use_checksum=True, hash_algorithm='md5', checkpoint=checkpoint)
+        self.assertTrue(checkpoint.root_done(self.root))
+        self.assertFalse(checkpoint.root_done(other))
+        checkpoint.close()
+
+        # The finished root is answered from the checkpoint, the other one is walked
+        shutil.copy2(os.path.join(self.root, '5.jpg'), os.path.join(self.root, 'late.jpg'))
+        resumed = self.service.resume_scan(self.checkpoint_path)
+        self.assertEqual(resumed.total_files_scanned, 19)
+        self.assertEqual(resumed.stats.get('checkpoint_hits'), 15)
+        self.assertEqual(resumed.stats.get('hashed_files'), 4)
+
+        # A new scan walks every root and finds the late file
+        checkpoint = ScanCheckpoint(self.checkpoint_path)
+        rescan = self.service.scan([self.root, other], 'jpg', detection_mode='checksum', hash_algorithm='md5',
+                                   checkpoint=checkpoint)
+        self.assertEqual(rescan.total_files_scanned, 20)
+        checkpoint.close()
+
+    def test_completed_scan_is_reset(self):
+        checkpoint = ScanCheckpoint(self.checkpoint_path)
+        self.service.scan([self.root], 'jpg', detection_mode='checksum', checkpoint=checkpoint)
+        self.assertEqual(len(checkpoint), 0)
+        self.assertEqual(checkpoint.params, {})
+        self.assertFalse(checkpoint.root_done(self.root))
+        checkpoint.close()
+        with self.assertRaises(ValueError):
+            self.service.resume_scan(self.checkpoint_path)
+
+    def test_other_params_start_empty(self):
+        Image.new('RGB', (8, 8), (9, 9, 9)).save(os.path.join(self.root, 'a.png'))
+        Image.new('RGB', (8, 8), (8, 8, 8)).save(os.path.join(self.root, 'copies', 'b.png'))
+        self.interrupted_scan(after=15)
+        with ScanCheckpoint(self.checkpoint_path) as checkpoint:
+            self.assertGreater(len(checkpoint), 0)
+
+        checkpoint = ScanCheckpoint(self.checkpoint_path)
+        result = self.service.scan([self.root], 'png', detection_mode='checksum', checkpoint=checkpoint)
+        self.assertEqual(sorted(os.path.basename(img.path) for img in result.uniques), ['a.png', 'b.png'])
+        self.assertEqual(result.stats.get('checkpoint_hits'), 0)
+        checkpoint.close()
+
+    def test_params(self):
+        with ScanCheckpoint(self.checkpoint_path) as checkpoint:
+            self.assertEqual(checkpoint.params, {})
+        with self.assertRaises(ValueError):
+            self.service.resume_scan(self.checkpoint_path)
+
+        params = {'folders': [self.root], 'extensions': ['jpg', 'png'], 'detection_mode': 'content',
+                  'hash_algorithm': 'sha256', 'perceptual_method': 'phash', 'perceptual_max_distance': 10}
+        checkpoint = ScanCheckpoint(self.checkpoint_path)
+        checkpoint.save_params(params)
+        self.assertEqual(checkpoint.params, params)
+        checkpoint.discard()
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit tests for the array-backed ColumnarScanResult.
+
+Tests cover:
+- Vectorized grouping matches the group_key semantics of the object model
+- Unhashed files stay unique
+- Conversion to and from ScanResult keeps groups, digests and metadata
+- The duplicates view returns reusable items and values views
+- Counts and byte aggregates
+"""
+
+import hashlib
+import random
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.ImageData import ImageData
+from data.ChecksumImageData import ChecksumImageData
+from data.PerceptualImageData import PerceptualImageData
+from data.ColumnarScanResult import ColumnarScanResult
+from data.GroupingIndex import GroupingIndex
+from data.ScanResult import ScanResult, MODE_CHECKSUM, MODE_METADATA, MODE_PERCEPTUAL
+
+
+def digest(n):
+    return hashlib.sha256(str(n).encode()).hexdigest()
+
+
+def grouped_by_key(items):
+    """Reference grouping through the object model."""
+    index = GroupingIndex(1)
+    for img in items:
+        index.add(img)
+    return {frozenset([u.path]) for u in index.uniques()} | {frozenset(p) for p in index.duplicates().values()}
+
+
+def grouped_columnar(result):
+    return {frozenset(result.group_paths(g)) for g in range(result.group_count)}
+
+
+class TestColumnarScanResult(unittest.TestCase):
+    """Test cases for ColumnarScanResult."""
+
+    def test_checksum_grouping_matches_object_model(self):
+        rng = random.Random(3)
+        items = [ChecksumImageData(f'/p/{i}.jpg', None, rng.choice([100, 200]), None, None,
+                                   digest(rng.randrange(40)), 'sha256', mtime_ns=i)
+                 for i in range(300)]
+        items.append(ChecksumImageData('/p/unhashed_a.jpg', None, 100, algorithm='sha256'))
+        items[-1]._checksum = None
+        result = ColumnarScanResult.from_items(items, ['/p'], 'jpg', MODE_CHECKSUM, hash_algorithm='sha256')
+        self.assertEqual(grouped_columnar(result), grouped_by_key(items))
+        self.assertEqual(result.total_files_scanned, len(items))
+
+    def test_metadata_grouping(self):
+        items = [
+            ImageData('/a/x.jpg', 10.0, 5, exif_date='2020:01:01 00:00:00'),
+            ImageData('/b/y.jpg', 20.0, 5, exif_date='2020:01:01 00:00:00'),
+            ImageData('/c/z.jpg', 20.0, 6, exif_date='2020:01:01 00:00:00'),
+            ImageData('/a/same.jpg', 30.0, 7),
+            ImageData('/b/same.jpg', 30.0, 7),
+            ImageData('/c/same.jpg', 31.0, 7),
+        ]
+        result = ColumnarScanResult.from_items(items, ['/a'], 'jpg', MODE_METADATA)
+        self.assertEqual(grouped_columnar(result), grouped_by_key(items))
+        self.assertEqual(result.duplicate_groups_count, 2)
+        self.assertEqual(result.unique_count, 2)
+        self.assertEqual(result.duplicate_file_count, 4)
+        self.assertEqual(result.total_bytes, 37)
+        self.assertEqual(result.reclaimable_bytes, 12)
+        exif_rows = result.records['exif_id'] >= 0
+        self.assertTrue((result.records['exif_ts'][exif_rows] == 1577836800).all())
+
+    def test_round_trip_through_scan_result(self):
+        key = ChecksumImageData('/a/x.jpg', None, 10, 'renamed.jpg', '2021:02:03 04:05:06', digest(1), 'sha256',
+                                mtime_ns=1_600_000_000_123_456_789)
+        unique = ChecksumImageData('/a/y.jpg', 5.0, 11, None, None, digest(2), 'sha256')
+        original = ScanResult([unique], {key: {'/a/x.jpg', '/b/x.jpg'}}, ['/a', '/b'], 'jpg', MODE_CHECKSUM,
+                              timestamp=123.0, hash_algorithm='sha256', hardlinks={'/a/y.jpg': {'/c/y.jpg'}})
+
+        columnar = ColumnarScanResult.from_scan_result(original)
+        self.assertEqual(columnar.total_files_scanned, original.total_files_scanned)
+        self.assertEqual(columnar.hardlink_count, 1)
+
+        restored = columnar.to_scan_result()
+        self.assertEqual(restored.duplicates, original.duplicates)
+        self.assertEqual(restored.uniques, original.uniques)
+        restored_key = next(iter(restored.duplicates))
+        self.assertEqual(restored_key.checksum, key.checksum)
+        self.assertEqual(restored_key.mtime_ns, key.mtime_ns)
+        self.assertEqual(restored_key.filename, 'renamed.jpg')
+        self.assertEqual(restored_key.exif_date, key.exif_date)
+        self.assertEqual(restored.timestamp, 123.0)
+
+        items = columnar.duplicates.items()
+        self.assertEqual(len(items), 1)
+        self.assertEqual(list(items), list(items))
+        self.assertEqual(list(items)[0][1], {'/a/x.jpg', '/b/x.jpg'})
+        self.assertEqual(list(columnar.duplicates.values()), [{'/a/x.jpg', '/b/x.jpg'}])
+
+    def test_perceptual_clusters_kept(self):
+        # Near-duplicate members have different hashes, the cluster must survive anyway
+        key = PerceptualImageData('/a/x.jpg', 1.0, 10, perceptual_hash=0xF0, method='dhash')
+        original = ScanResult([PerceptualImageData('/a/z.jpg', 1.0, 9, perceptual_hash=None, method='dhash')],
+                              {key: {'/a/x.jpg', '/a/x_small.jpg'}}, ['/a'], 'jpg', MODE_PERCEPTUAL)
+        columnar = ColumnarScanResult.from_scan_result(original)
+        self.assertEqual(columnar.group_paths(columnar.group_count - 1), ['/a/x.jpg', '/a/x_small.jpg'])
+        restored = columnar.to_scan_result()
+        self.assertEqual(next(iter(restored.duplicates)).perceptual_hash, 0xF0)
+        self.assertIsNone(restored.uniques[0].perceptual_hash)
+
+    def test_empty(self):
+        result = ColumnarScanResult.from_items([], [], 'jpg', MODE_CHECKSUM)
+        self.assertEqual(result.total_files_scanned, 0)
+        self.assertEqual(result.duplicate_groups_count, 0)
+        self.assertEqual(result.uniques, [])
+        self.assertEqual(result.reclaimable_bytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
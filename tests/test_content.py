@@ -0,0 +1,83 @@
+"""
+Unit tests for metadata-insensitive image content digests.
+
+Tests cover:
+- JPEGs differing only in EXIF get the same content digest but different file checksums
+- Changed pixels or changed quantization give a different digest
+- Non-JPEG formats fall back to the decoded pixels
+- Content mode in ScannerService groups retagged copies
+"""
+
+import os
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from data.content import content_digest
+from data.hashing import file_digest, content_algorithm
+from services.ScannerService import ScannerService
+
+
+def exif_with_date(date):
+    exif = Image.Exif()
+    exif.get_ifd(0x8769)[0x9003] = date
+    exif[0x010E] = 'retagged by some tool'
+    return exif
+
+
+class TestContentDigest(unittest.TestCase):
+    """Test cases for data.content."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image = Image.radial_gradient('L').convert('RGB').resize((64, 48))
+        self.image.save(self._path('plain.jpg'), quality=90)
+        self.image.save(self._path('tagged.jpg'), quality=90, exif=exif_with_date('2020:01:01 10:00:00'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_jpeg_metadata_ignored(self):
+        self.assertNotEqual(file_digest(self._path('plain.jpg')), file_digest(self._path('tagged.jpg')))
+        self.assertEqual(content_digest(self._path('plain.jpg')), content_digest(self._path('tagged.jpg')))
+        # Reachable through the regular digest entry point as well
+        self.assertEqual(file_digest(self._path('plain.jpg'), content_algorithm('sha256')),
+                         content_digest(self._path('plain.jpg'), 'sha256'))
+
+    def test_jpeg_image_changes_detected(self):
+        self.image.save(self._path('lower_quality.jpg'), quality=60)
+        self.image.rotate(90).save(self._path('rotated.jpg'), quality=90)
+        plain = content_digest(self._path('plain.jpg'))
+        self.assertNotEqual(plain, content_digest(self._path('lower_quality.jpg')))
+        self.assertNotEqual(plain, content_digest(self._path('rotated.jpg')))
+
+    def test_other_formats_use_pixels(self):
+        info = PngInfo()
+        info.add_text('Comment', 'retagged')
+        self.image.save(self._path('a.png'))
+        self.image.save(self._path('b.png'), pnginfo=info)
+        self.assertEqual(content_digest(self._path('a.png')), content_digest(self._path('b.png')))
+        self.image.convert('L').save(self._path('gray.png'))
+        self.assertNotEqual(content_digest(self._path('a.png')), content_digest(self._path('gray.png')))
+
+    def test_content_mode_groups_retagged_copies(self):
+        result = ScannerService().scan([self.tmp.name], 'jpg', detection_mode='content')
+        self.assertEqual(result.hash_algorithm, 'content-md5')
+        self.assertEqual(len(result.duplicates), 1)
+        self.assertEqual({os.path.basename(p) for p in next(iter(result.duplicates.values()))},
+                         {'plain.jpg', 'tagged.jpg'})
+
+
+if __name__ == '__main__':
+    unittest.main()
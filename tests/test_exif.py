@@ -0,0 +1,109 @@
+"""
+Unit tests for the fast EXIF DateTimeOriginal parser.
+
+Tests cover:
+- Agreement with Pillow on JPEG files with and without EXIF
+- Big-endian TIFF structures, standalone and inside a JPEG APP1 segment
+- Fallback signalling for formats the parser does not understand
+- Corrupt and truncated JPEGs are rejected through the Pillow fallback, not accepted as images
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image, UnidentifiedImageError
+from data.exif import UnsupportedFormat, get_exif_date, read_exif_date, read_exif_date_pillow
+from data.workers import extract_record
+
+DATE = '2020:01:02 03:04:05'
+
+
+def big_endian_tiff(date=DATE):
+    """Minimal big-endian TIFF: IFD0 -> Exif IFD -> DateTimeOriginal."""
+    value = date.encode('ascii') + b'\x00'
+    ifd0 = struct.pack('>H', 1) + struct.pack('>HHII', 0x8769, 4, 1, 26) + struct.pack('>I', 0)
+    exif_ifd = struct.pack('>H', 1) + struct.pack('>HHII', 0x9003, 2, len(value), 44) + struct.pack('>I', 0)
+    return b'MM\x00*' + struct.pack('>I', 8) + ifd0 + exif_ifd + value
+
+
+class TestExifParser(unittest.TestCase):
+    """Test cases for read_exif_date."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_jpeg_matches_pillow(self):
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        exif.get_ifd(0x8769)[0x9003] = DATE
+        Image.new('RGB', (16, 16), 'red').save(self._path('exif.jpg'), exif=exif)
+        Image.new('RGB', (16, 16), 'red').save(self._path('plain.jpg'))
+
+        for name in ('exif.jpg', 'plain.jpg'):
+            path = self._path(name)
+            self.assertEqual(read_exif_date(path), read_exif_date_pillow(path))
+        self.assertEqual(read_exif_date(self._path('exif.jpg')), DATE)
+
+    def test_big_endian_tiff(self):
+        with open(self._path('be.tif'), 'wb') as f:
+            f.write(big_endian_tiff())
+        self.assertEqual(read_exif_date(self._path('be.tif')), DATE)
+
+    def test_big_endian_jpeg_app1(self):
+        payload = b'Exif\x00\x00' + big_endian_tiff()
+        with open(self._path('be.jpg'), 'wb') as f:
+            f.write(b'\xff\xd8')
+            f.write(b'\xff\xe0' + struct.pack('>H', 4) + b'\x00\x00')  # unrelated APP0
+            f.write(b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload)
+            f.write(b'\xff\xda' + struct.pack('>H', 2) + b'\xff\xd9')
+        self.assertEqual(read_exif_date(self._path('be.jpg')), DATE)
+
+    def test_truncated_exif_is_none(self):
+        payload = b'Exif\x00\x00' + big_endian_tiff()[:20]
+        with open(self._path('broken.jpg'), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload)
+        self.assertIsNone(read_exif_date(self._path('broken.jpg')))
+
+    def test_unsupported_format_falls_back(self):
+        Image.new('RGB', (16, 16), 'red').save(self._path('image.png'))
+        with self.assertRaises(UnsupportedFormat):
+            read_exif_date(self._path('image.png'))
+        self.assertIsNone(get_exif_date(self._path('image.png')))
+
+    def test_corrupt_jpeg_is_rejected(self):
+        Image.new('RGB', (16, 16), 'red').save(self._path('valid.jpg'))
+        with open(self._path('valid.jpg'), 'rb') as f:
+            data = f.read()
+        with open(self._path('garbage.jpg'), 'wb') as f:
+            f.write(b'\xff\xd8' + bytes(range(256)) * 4)
+        with open(self._path('truncated.jpg'), 'wb') as f:
+            f.write(data[:len(data) // 4])
+
+        for name in ('garbage.jpg', 'truncated.jpg'):
+            with self.subTest(name=name):
+                path = self._path(name)
+                self.assertIsNone(read_exif_date(path))
+                with self.assertRaises(UnidentifiedImageError):
+                    get_exif_date(path)
+                self.assertIsNone(extract_record(path))
+                with open(path, 'rb') as f:
+                    self.assertIsNone(extract_record(path, header=f.read()))
+        self.assertIsNotNone(extract_record(self._path('valid.jpg')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Unit tests for the spill-to-disk grouping index.
+
+Tests cover:
+- Groups match the in-memory GroupingIndex when many runs are spilled
+- Multi-pass merging when there are more runs than the merge fan-in
+- Already formed groups keep their key ImageData
+- Run files keep the ImageData of the first record of each key only
+- ScannerService with a memory budget finds the same duplicates, merging the
+  spilled runs once into a columnar result, also when filtering against a base
+"""
+
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from data.ChecksumImageData import ChecksumImageData
+from data.ColumnarScanResult import ColumnarScanResult
+from data.ExternalGroupingIndex import ExternalGroupingIndex
+from data.GroupingIndex import GroupingIndex
+from services.ScannerService import ScannerService
+from tests.helpers import groups
+
+
+def checksum_item(i, rng):
+    value = rng.randrange(300)
+    return ChecksumImageData(f'/p/{i}.jpg', 1.0, 100 + value % 3, None, None, f'{value:032x}')
+
+
+class TestExternalGroupingIndex(unittest.TestCase):
+    """Test cases for ExternalGroupingIndex."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_in_memory_index(self):
+        rng = random.Random(5)
+        items = [checksum_item(i, rng) for i in range(2000)]
+        expected = GroupingIndex()
+        with ExternalGroupingIndex(memory_budget=20_000, spill_dir=self.tmp.name) as index:
+            for img in items:
+                expected.add(img)
+                index.add(img)
+            self.assertGreater(index.spilled_runs, 5)
+            self.assertEqual(len(index), len(items))
+            self.assertEqual(groups(index), groups(expected))
+            # Groups stream out one at a time, in key order
+            keys = [repr(img.group_key) for img, _ in index.iter_groups()]
+            self.assertEqual(keys, sorted(set(keys)))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_multi_pass_merge(self):
+        rng = random.Random(6)
+        items = [checksum_item(i, rng) for i in range(1000)]
+        with ExternalGroupingIndex(memory_budget=2_000, spill_dir=self.tmp.name) as index:
+            index.MAX_MERGE_FANIN = 4
+            for img in items:
+                index.add(img)
+            self.assertGreater(index.spilled_runs, 4)
+            expected = GroupingIndex()
+            for img in items:
+                expected.add(img)
+            self.assertEqual(groups(index), groups(expected))
+
+    def test_formed_groups_keep_key(self):
+        key = ChecksumImageData('/key/x.jpg', 1.0, 10, None, '2020:01:01 00:00:00', 'ab' * 16)
+        with ExternalGroupingIndex(memory_budget=1, spill_dir=self.tmp.name) as index:
+            index.add(key, {'/b/x.jpg', '/c/x.jpg'})
+            index.add(ChecksumImageData('/d/x.jpg', 2.0, 10, None, None, 'ab' * 16))
+            (group_key, paths), = index.duplicates().items()
+        self.assertEqual(group_key.path, '/key/x.jpg')
+        self.assertEqual(group_key.exif_date, '2020:01:01 00:00:00')
+        self.assertEqual(paths, {'/b/x.jpg', '/c/x.jpg', '/d/x.jpg'})
+
+    def test_runs_keep_one_image_data_per_key(self):
+        items = [ChecksumImageData(f'/{i}/x.jpg', 1.0, 10, None, None, 'ab' * 16) for i in range(5)]
+        with ExternalGroupingIndex(spill_dir=self.tmp.name) as index:
+            for img in items:
+                index.add(img)
+            index._spill()
+            records = list(index._read_run(index._runs[0]))
+            self.assertEqual([img is not None for _, _, img in records], [True, False, False, False, False])
+            (group_key, paths), = index.duplicates().items()
+        self.assertIs(type(group_key), ChecksumImageData)
+        self.assertEqual(group_key.path, '/0/x.jpg')
+        self.assertEqual(len(paths), 5)
+
+    def test_scanner_memory_budget(self):
+        for folder in ('a', 'b'):
+            os.makedirs(os.path.join(self.tmp.name, folder))
+            for i in range(4):
+                Image.new('RGB', (8, 8), (i * 40, 0, 0)).save(os.path.join(self.tmp.name, folder, f'{i}.png'))
+        folders = [os.path.join(self.tmp.name, 'a'), os.path.join(self.tmp.name, 'b')]
+        spill_dir = os.path.join(self.tmp.name, 'spill')
+        os.makedirs(spill_dir)
+
+        in_memory = ScannerService().scan(folders, 'png', detection_mode='checksum')
+        spilled = ScannerService().scan(folders, 'png', detection_mode='checksum', memory_budget=1,
+                                        spill_dir=spill_dir)
+        self.assertEqual(spilled.duplicates, in_memory.duplicates)
+        self.assertEqual(len(spilled.duplicates), 4)
+        self.assertEqual(os.listdir(spill_dir), [])
+
+    def test_scanner_streams_spilled_groups(self):
+        folder = os.path.join(self.tmp.name, 'a')
+        os.makedirs(folder)
+        for i in range(6):
+            Image.new('RGB', (8, 8), (i * 40, 0, 0)).save(os.path.join(folder, f'{i}.png'))
+            Image.new('RGB', (8, 8), (i * 40, 0, 0)).save(os.path.join(folder, f'copy{i}.png'))
+        base = ScannerService().scan([os.path.join(folder)], 'png', detection_mode='checksum')
+        Image.new('RGB', (8, 8), (0, 0, 99)).save(os.path.join(folder, 'new.png'))
+
+        merges = []
+        merged_records = ExternalGroupingIndex._merged_records
+        with patch.object(ExternalGroupingIndex, '_merged_records', autospec=True,
+                          side_effect=lambda index: merges.append(index) or merged_records(index)):
+            spilled = ScannerService().scan([folder], 'png', detection_mode='checksum', memory_budget=1)
+        self.assertEqual(len(merges), 1)
+        self.assertIsInstance(spilled, ColumnarScanResult)
+        self.assertEqual(spilled.total_files_scanned, 13)
+        self.assertEqual(len(spilled.duplicates.items()), 6)
+
+        with patch.object(ExternalGroupingIndex, '_merged_records', autospec=True,
+                          side_effect=lambda index: merges.append(index) or merged_records(index)):
+            merged = ScannerService().scan([folder], 'png', detection_mode='checksum', memory_budget=1,
+                                           base_result=base)
+        self.assertEqual(len(merges), 2)
+        self.assertEqual([os.path.basename(img.path) for img in merged.uniques], ['new.png'])
+        self.assertEqual(merged.duplicate_groups_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Unit tests for the shared, sharded grouping index.
+
+Tests cover:
+- Single files stay unique, matching files form a duplicate group
+- Already formed groups are merged with single files and with each other
+- Concurrent inserts from many threads lose nothing
+- find_duplicates streaming several folders into one index
+- Group keys: renamed EXIF copies match, __eq__ and __hash__ agree, modes never mix
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from data.ChecksumImageData import ChecksumImageData
+from data.GroupingIndex import GroupingIndex
+from data.ImageData import ImageData, find_duplicates
+
+
+def image(path, size=100):
+    return ImageData(path, 1.0, size, os.path.basename(path), '2020:01:01 00:00:00')
+
+
+class TestGroupingIndex(unittest.TestCase):
+    """Test cases for GroupingIndex."""
+
+    def test_views(self):
+        index = GroupingIndex(shard_count=4)
+        index.add(image('/a/x.jpg', 1))
+        index.add(image('/a/y.jpg', 2))
+        index.add(image('/b/y.jpg', 2))
+        self.assertEqual([u.path for u in index.uniques()], ['/a/x.jpg'])
+        duplicates = index.duplicates()
+        self.assertEqual(list(duplicates.values()), [{'/a/y.jpg', '/b/y.jpg'}])
+        self.assertEqual(len(index), 3)
+
+    def test_groups_merge(self):
+        index = GroupingIndex()
+        index.add(image('/a/x.jpg'))
+        index.add(image('/key/x.jpg'), {'/b/x.jpg', '/c/x.jpg'})
+        index.add(image('/key/x.jpg'), {'/d/x.jpg'})
+        self.assertEqual(index.uniques(), [])
+        self.assertEqual(list(index.duplicates().values()), [{'/a/x.jpg', '/b/x.jpg', '/c/x.jpg', '/d/x.jpg'}])
+
+    def test_concurrent_inserts(self):
+        index = GroupingIndex()
+
+        def insert(worker):
+            for i in range(500):
+                index.add(image(f'/w{worker}/{i}.jpg', i))
+
+        threads = [threading.Thread(target=insert, args=(w,)) for w in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        duplicates = index.duplicates()
+        self.assertEqual(len(index), 8 * 500)
+        self.assertEqual(len(duplicates), 500)
+        self.assertTrue(all(len(paths) == 8 for paths in duplicates.values()))
+
+    def test_find_duplicates_streams_into_shared_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for folder in ('one', 'two'):
+                os.makedirs(os.path.join(tmp, folder))
+                Image.new('RGB', (8, 8), 'red').save(os.path.join(tmp, folder, 'same.jpg'))
+            Image.new('RGB', (8, 8), 'blue').save(os.path.join(tmp, 'two', 'other.jpg'))
+
+            index = GroupingIndex()
+            for folder in ('one', 'two'):
+                returned = find_duplicates([os.path.join(tmp, folder)], 'jpg', use_checksum=True,
+                                           grouping_index=index)
+                self.assertEqual(returned, ([], {}))
+
+            self.assertEqual(len(index.duplicates()), 1)
+            self.assertEqual([os.path.basename(u.path) for u in index.uniques()], ['other.jpg'])
+
+    def test_renamed_exif_copies_group(self):
+        original = image('/a/IMG_0001.jpg')
+        renamed = image('/b/holiday.jpg')
+        self.assertEqual(original.group_key, renamed.group_key)
+        self.assertEqual(original, renamed)
+        self.assertEqual(hash(original), hash(renamed))
+
+        index = GroupingIndex()
+        index.add(original)
+        index.add(renamed)
+        self.assertEqual(list(index.duplicates().values()), [{'/a/IMG_0001.jpg', '/b/holiday.jpg'}])
+
+    def test_keys_of_different_modes_never_match(self):
+        metadata = ImageData('/a/x.jpg', 1.0, 10, 'x.jpg')
+        md5 = ChecksumImageData('/a/x.jpg', 1.0, 10, 'x.jpg', checksum='ab', algorithm='md5')
+        sha = ChecksumImageData('/a/x.jpg', 1.0, 10, 'x.jpg', checksum='ab', algorithm='sha256')
+        self.assertEqual(len({metadata.group_key, md5.group_key, sha.group_key}), 3)
+        self.assertNotEqual(metadata, md5)
+        # Unreadable files only match themselves
+        unreadable = ChecksumImageData('/missing/x.jpg', 1.0, 10, 'x.jpg', checksum=None)
+        self.assertEqual(unreadable.group_key, ('unhashed', '/missing/x.jpg'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Unit tests for the selectable checksum algorithms.
+
+Tests cover:
+- Digests match hashlib for every supported algorithm
+- Unsupported algorithms are rejected
+- The mmap path gives the same digest and falls back when mapping fails
+- Checksums of different algorithms never compare equal
+- The algorithm survives a save/load round trip; old results default to MD5
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.ChecksumImageData import ChecksumImageData
+from data.hashing import HASH_ALGORITHMS, BUFFER_SIZE, file_digest, new_hasher
+from data.ScanResult import ScanResult, MODE_CHECKSUM
+from data.storage import ScanResultStorage
+
+
+class TestHashing(unittest.TestCase):
+    """Test cases for data.hashing and ChecksumImageData algorithms."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'a.jpg')
+        # Larger than one buffer so the chunked path is exercised
+        self.payload = os.urandom(BUFFER_SIZE + 12345)
+        with open(self.path, 'wb') as f:
+            f.write(self.payload)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_digest_matches_hashlib(self):
+        for algorithm in HASH_ALGORITHMS:
+            with self.subTest(algorithm=algorithm):
+                expected = hashlib.new(algorithm, self.payload).hexdigest()
+                self.assertEqual(file_digest(self.path, algorithm), expected)
+                self.assertEqual(ChecksumImageData.calculate_checksum(self.path, algorithm=algorithm), expected)
+
+    def test_mmap_path_matches_buffered(self):
+        expected = hashlib.sha256(self.payload).hexdigest()
+        self.assertEqual(file_digest(self.path, 'sha256', mmap_threshold=0), expected)
+        self.assertEqual(file_digest(self.path, 'sha256', mmap_threshold=None), expected)
+
+    def test_mmap_failure_falls_back(self):
+        with patch('data.hashing.mmap.mmap', side_effect=OSError("cannot map")) as mapped:
+            digest = file_digest(self.path, 'md5', mmap_threshold=0)
+        mapped.assert_called_once()
+        self.assertEqual(digest, hashlib.md5(self.payload).hexdigest())
+
+    def test_unsupported_algorithm(self):
+        with self.assertRaises(ValueError):
+            new_hasher('crc32')
+
+    def test_algorithms_do_not_mix(self):
+        md5 = ChecksumImageData(self.path, 0.0, 1, 'a.jpg', checksum='ab', algorithm='md5')
+        sha = ChecksumImageData(self.path, 0.0, 1, 'a.jpg', checksum='ab', algorithm='sha256')
+        self.assertNotEqual(md5, sha)
+
+    def test_storage_round_trip(self):
+        img = ChecksumImageData(self.path, 0.0, 1, 'a.jpg', checksum='ab', algorithm='blake2b')
+        result = ScanResult([img], {}, [self.tmp.name], 'jpg', MODE_CHECKSUM, hash_algorithm='blake2b')
+        filepath = os.path.join(self.tmp.name, 'results.json')
+        self.assertTrue(ScanResultStorage.save_results(result, filepath))
+
+        loaded = ScanResultStorage.load_results(filepath)
+        self.assertEqual(loaded.hash_algorithm, 'blake2b')
+        self.assertEqual(loaded.uniques[0].algorithm, 'blake2b')
+
+        # Results written before the algorithm was stored were MD5
+        with open(filepath, encoding='utf-8') as f:
+            data = json.load(f)
+        del data['metadata']['hash_algorithm']
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        self.assertEqual(ScanResultStorage.load_results(filepath).hash_algorithm, 'md5')
+
+
+if __name__ == '__main__':
+    unittest.main()
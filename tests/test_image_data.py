@@ -0,0 +1,79 @@
+"""
+Unit tests for the compact ImageData record layout.
+
+Tests cover:
+- Records have no per-object __dict__
+- date is derived from the integer mtime_ns and still accepts seconds
+- filename is sliced from the path unless it differs
+- Checksums are held as raw bytes but read back as hex
+- mtime_ns survives a save/load round trip
+"""
+
+import os
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.ImageData import ImageData
+from data.ChecksumImageData import ChecksumImageData
+from data.PerceptualImageData import PerceptualImageData
+from data.ScanResult import ScanResult, MODE_CHECKSUM
+from data.storage import ScanResultStorage
+
+DIGEST = '9e107d9d372bb6826bd81d3542a419d6'
+
+
+class TestImageDataLayout(unittest.TestCase):
+    """Test cases for ImageData and its subclasses."""
+
+    def test_no_instance_dict(self):
+        for img in (ImageData('/a/b.jpg', 1.5, 10),
+                    ChecksumImageData('/a/b.jpg', 1.5, 10, checksum=DIGEST),
+                    PerceptualImageData('/a/b.jpg', 1.5, 10, perceptual_hash=1, method='dhash')):
+            with self.subTest(cls=type(img).__name__):
+                self.assertFalse(hasattr(img, '__dict__'))
+
+    def test_date_and_mtime_ns(self):
+        img = ImageData('/a/b.jpg', mtime_ns=1_700_000_000_123_456_789)
+        self.assertAlmostEqual(img.date, 1_700_000_000.123456789)
+        img.date = 1_600_000_000.5
+        self.assertEqual(img.mtime_ns, 1_600_000_000_500_000_000)
+        self.assertEqual(ImageData('/a/b.jpg', 12).mtime_ns, 12_000_000_000)
+        self.assertIsNone(ImageData('/a/b.jpg').date)
+
+    def test_filename_view(self):
+        img = ImageData('/a/b.jpg', filename='b.jpg')
+        self.assertIsNone(img._filename)
+        self.assertEqual(img.filename, 'b.jpg')
+        # A filename that is not the path's last component is kept as given
+        self.assertEqual(ImageData('/a/b.jpg', filename='other.jpg').filename, 'other.jpg')
+        self.assertEqual(ImageData(filename='loose.jpg').filename, 'loose.jpg')
+
+    def test_checksum_stored_as_bytes(self):
+        img = ChecksumImageData('/a/b.jpg', 1.0, 10, checksum=DIGEST)
+        self.assertEqual(img._digest, bytes.fromhex(DIGEST))
+        self.assertEqual(img.checksum, DIGEST)
+        self.assertEqual(img, ChecksumImageData('/c/d.jpg', 2.0, 10, checksum=DIGEST.upper()))
+        # Anything that is not hex is kept verbatim
+        self.assertEqual(ChecksumImageData('/a/b.jpg', checksum='abc').checksum, 'abc')
+
+    def test_storage_round_trip_keeps_mtime_ns(self):
+        key = ChecksumImageData('/a/b.jpg', None, 10, checksum=DIGEST, mtime_ns=1_700_000_000_000_000_001)
+        result = ScanResult([], {key: {'/a/b.jpg', '/c/b.jpg'}}, ['/a'], 'jpg', MODE_CHECKSUM)
+        with tempfile.TemporaryDirectory() as tmp:
+            filepath = os.path.join(tmp, 'results.json')
+            self.assertTrue(ScanResultStorage.save_results(result, filepath))
+            loaded = ScanResultStorage.load_results(filepath)
+        loaded_key = next(iter(loaded.duplicates))
+        self.assertEqual(loaded_key.mtime_ns, key.mtime_ns)
+        self.assertEqual(loaded_key.checksum, DIGEST)
+        self.assertEqual(loaded.duplicates, result.duplicates)
+
+
+if __name__ == '__main__':
+    unittest.main()
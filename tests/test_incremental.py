@@ -0,0 +1,154 @@
+"""
+Unit tests for incremental rescans with directory fingerprints.
+
+Tests cover:
+- The walker skips the files of directories whose fingerprint is unchanged
+- A rescan with no changes processes no file and returns the same groups
+- Only directories that received new files are processed, also deep below unchanged ones
+- Hardlinks to carried-over files are still recognized
+- Fingerprints survive the JSON and binary storage formats
+- Staged rescans keep the digests of carried-over files and read only new files
+- Previous results of other modes, algorithms or extensions are rejected
+- Results filtered against a base result are flagged (also when stored) and rejected
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from data.binary_format import BINARY_EXTENSION
+from data.DirectoryFingerprints import DirectoryFingerprints
+from data.storage import ScanResultStorage
+from data.walker import walk_files
+from services.ScannerService import ScannerService
+from tests.helpers import groups
+
+
+class TestIncrementalScan(unittest.TestCase):
+    """Test cases for DirectoryFingerprints and ScannerService.scan(previous_result=...)."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'archive')
+        for year in ('2019', '2020', os.path.join('2020', 'trip')):
+            os.makedirs(os.path.join(self.root, year))
+        for i in range(6):
+            year = ('2019', '2020', os.path.join('2020', 'trip'))[i % 3]
+            Image.new('RGB', (8, 8), (i * 40, 10, 0)).save(os.path.join(self.root, year, f'{i}.jpg'))
+        shutil.copy2(os.path.join(self.root, '2019', '0.jpg'), os.path.join(self.root, '2020', 'copy.jpg'))
+        self.service = ScannerService()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, previous_result=None, mode='checksum'):
+        return self.service.scan([self.root], 'jpg', detection_mode=mode, previous_result=previous_result)
+
+    def test_walker_skips_unchanged_directories(self):
+        first = DirectoryFingerprints()
+        self.assertEqual(len(list(walk_files(self.root, 'jpg', fingerprints=first))), 7)
+        self.assertEqual(len(first.current), 4)
+
+        trip = os.path.join(self.root, '2020', 'trip')
+        Image.new('RGB', (8, 8)).save(os.path.join(trip, 'new.jpg'))
+        second = DirectoryFingerprints(first.current)
+        paths = [entry.path for entry in walk_files(self.root, 'jpg', fingerprints=second)]
+        self.assertEqual(sorted(paths), [os.path.join(trip, name) for name in ('2.jpg', '5.jpg', 'new.jpg')])
+        self.assertEqual(len(second.unchanged), 3)
+
+    def test_unchanged_rescan(self):
+        for mode in ('checksum', 'metadata', 'staged'):
+            with self.subTest(mode=mode):
+                first = self.scan(mode=mode)
+                rescan = self.scan(first, mode=mode)
+                self.assertEqual(groups(rescan), groups(first))
+                self.assertEqual(rescan.stats.get('processed_files'), 0)
+                self.assertEqual(rescan.stats.get('carried_files'), 7)
+                self.assertEqual(rescan.directory_fingerprints, first.directory_fingerprints)
+
+    def test_only_changed_directories_processed(self):
+        first = self.scan()
+        trip = os.path.join(self.root, '2020', 'trip')
+        shutil.copy2(os.path.join(self.root, '2019', '3.jpg'), os.path.join(trip, 'again.jpg'))
+
+        rescan = self.scan(first)
+        self.assertEqual(rescan.stats.get('hashed_files'), 3)
+        self.assertEqual(rescan.stats.get('carried_files'), 5)
+        self.assertIn(frozenset([os.path.join(self.root, '2019', '3.jpg'), os.path.join(trip, 'again.jpg')]),
+                      groups(rescan))
+        self.assertEqual(groups(rescan), groups(self.scan()))
+
+    def test_staged_rescan_reuses_digests(self):
+        def bytes_read(result):
+            return result.stats.get('bytes_read_partial') + result.stats.get('bytes_read_full')
+
+        first = self.scan(mode='staged')
+        self.assertEqual(bytes_read(self.scan(first, mode='staged')), 0)
+
+        # Only the new file is hashed in full: the copies it matches keep their digests from the first scan
+        trip = os.path.join(self.root, '2020', 'trip')
+        again = os.path.join(trip, 'again.jpg')
+        shutil.copy2(os.path.join(self.root, '2019', '0.jpg'), again)
+        rescan = self.scan(first, mode='staged')
+        self.assertEqual(rescan.stats.get('bytes_read_full'), os.path.getsize(again))
+        self.assertIn(frozenset([os.path.join(self.root, '2019', '0.jpg'), os.path.join(self.root, '2020', 'copy.jpg'),
+                                 again]), groups(rescan))
+        self.assertEqual(groups(rescan), groups(self.scan(mode='staged')))
+
+    def test_hardlinks_to_carried_files(self):
+        original = os.path.join(self.root, '2019', '0.jpg')
+        os.link(original, os.path.join(self.root, '2019', 'link.jpg'))
+        first = self.scan()
+        self.assertEqual(first.hardlink_count, 1)
+
+        os.link(original, os.path.join(self.root, '2020', 'trip', 'link.jpg'))
+        rescan = self.scan(first)
+        self.assertEqual(rescan.hardlink_count, 2)
+        self.assertEqual(groups(rescan), groups(first))
+
+    def test_fingerprints_stored(self):
+        first = self.scan()
+        for name in ('result.json', 'result' + BINARY_EXTENSION):
+            with self.subTest(name=name):
+                path = os.path.join(self.tmp.name, name)
+                ScanResultStorage.save_results(first, path)
+                loaded = ScanResultStorage.load_results(path)
+                self.assertEqual(loaded.directory_fingerprints, first.directory_fingerprints)
+                self.assertEqual(self.scan(loaded).stats.get('hashed_files'), 0)
+
+    def test_incompatible_previous_result(self):
+        first = self.scan()
+        with self.assertRaisesRegex(ValueError, 'mode'):
+            self.scan(first, mode='metadata')
+        with self.assertRaisesRegex(ValueError, 'not supported'):
+            self.scan(first, mode='perceptual')
+        with self.assertRaisesRegex(ValueError, 'hash algorithm'):
+            self.service.scan([self.root], 'jpg', detection_mode='checksum', hash_algorithm='sha256',
+                              previous_result=first)
+        with self.assertRaisesRegex(ValueError, 'png'):
+            self.service.scan([self.root], ['jpg', 'png'], detection_mode='checksum', previous_result=first)
+
+    def test_base_filtered_previous_result(self):
+        base = self.service.scan([os.path.join(self.root, '2019')], 'jpg', detection_mode='checksum')
+        merged = self.service.scan([self.root], 'jpg', detection_mode='checksum', base_result=base)
+        self.assertTrue(merged.base_filtered)
+        self.assertFalse(self.scan().base_filtered)
+        for name in ('result.json', 'result' + BINARY_EXTENSION):
+            with self.subTest(name=name):
+                path = os.path.join(self.tmp.name, name)
+                ScanResultStorage.save_results(merged, path)
+                with self.assertRaisesRegex(ValueError, 'base result'):
+                    self.scan(ScanResultStorage.load_results(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Unit tests for perceptual-hash near-duplicate detection.
+
+Tests cover:
+- Resized and recompressed copies are grouped, different images are not
+- Both hash methods (dHash, pHash)
+- Groups are the same whatever order the hashes finish in
+- ScannerService hashes the walked files without a metadata pass, reading EXIF dates on the way
+- BK-tree search returns the same matches as a linear scan
+- Perceptual groups survive a save/load round trip
+"""
+
+import os
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from PIL import Image
+
+from data.ImageData import ImageData
+from data.PerceptualImageData import PerceptualImageData
+from data.perceptual import (BKTree, PERCEPTUAL_METHODS, find_duplicates_perceptual, hamming_distance,
+                             image_hash)
+from data.ScanResult import ScanResult, MODE_PERCEPTUAL
+from data.storage import ScanResultStorage
+from data.workers import ScanExecutor
+from services.ScannerService import ScannerService
+
+
+def make_photo(seed, width=640, height=480):
+    """A smooth synthetic 'photo' whose structure depends on the seed."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width] / max(width, height)
+    channels = []
+    for _ in range(3):
+        fx, fy, phase = rng.uniform(1, 6, 3)
+        channels.append(127 + 120 * np.sin(2 * np.pi * (fx * x + fy * y) + phase) * np.cos(3 * fy * x))
+    return Image.fromarray(np.dstack(channels).clip(0, 255).astype(np.uint8))
+
+
+class TestPerceptual(unittest.TestCase):
+    """Test cases for data.perceptual."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.executor = ScanExecutor(max_workers=2)
+        photo = make_photo(1)
+        photo.save(self._path('original.jpg'), quality=95)
+        photo.resize((320, 240)).save(self._path('small.jpg'), quality=90)
+        photo.save(self._path('recompressed.jpg'), quality=40)
+        make_photo(2).save(self._path('other.jpg'))
+        make_photo(3).save(self._path('third.png'))
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _items(self):
+        return [ImageData(self._path(name), 0.0, os.path.getsize(self._path(name)), name)
+                for name in sorted(os.listdir(self.tmp.name))]
+
+    def test_near_duplicates_grouped(self):
+        for method in PERCEPTUAL_METHODS:
+            with self.subTest(method=method):
+                uniques, duplicates = find_duplicates_perceptual(self._items(), self.executor, method=method)
+                self.assertEqual(len(duplicates), 1)
+                group = {os.path.basename(p) for p in next(iter(duplicates.values()))}
+                self.assertEqual(group, {'original.jpg', 'small.jpg', 'recompressed.jpg'})
+                self.assertEqual(sorted(u.filename for u in uniques), ['other.jpg', 'third.png'])
+                self.assertTrue(all(isinstance(key, PerceptualImageData) for key in duplicates))
+
+    def test_undecodable_file_is_unique(self):
+        with open(self._path('broken.jpg'), 'wb') as f:
+            f.write(b'not an image')
+        self.assertIsNone(image_hash(self._path('broken.jpg')))
+        uniques, _ = find_duplicates_perceptual(self._items(), self.executor)
+        self.assertIn('broken.jpg', {u.filename for u in uniques})
+
+    def test_groups_do_not_depend_on_completion_order(self):
+        # b is close to a and c, which are too far apart for one group
+        hashes = {'a.jpg': 0, 'b.jpg': 0b1111, 'c.jpg': 0b11111111}
+        items = [ImageData(f'/p/{name}', 0.0, 1) for name in hashes]
+        results = []
+        for delays in ({'a.jpg': 0.2, 'b.jpg': 0.0, 'c.jpg': 0.1}, {'a.jpg': 0.0, 'b.jpg': 0.2, 'c.jpg': 0.1}):
+            def fake_hash(path, method, delays=delays):
+                time.sleep(delays[os.path.basename(path)])
+                return hashes[os.path.basename(path)]
+            with mock.patch('data.perceptual.image_hash', fake_hash):
+                uniques, duplicates = find_duplicates_perceptual(items[::-1], self.executor, max_distance=4)
+            results.append(({u.path for u in uniques}, {key.path: paths for key, paths in duplicates.items()}))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], ({'/p/c.jpg'}, {'/p/a.jpg': {'/p/a.jpg', '/p/b.jpg'}}))
+
+    def test_scan_hashes_walked_files_directly(self):
+        exif = Image.Exif()
+        exif.get_ifd(0x8769)[0x9003] = '2020:01:02 03:04:05'
+        make_photo(1).save(self._path('dated.jpg'), quality=60, exif=exif)
+        # No metadata pass: the scanner never submits files for extraction
+        with mock.patch.object(ScanExecutor, 'submit', side_effect=AssertionError("metadata pass")):
+            result = ScannerService().scan([self.tmp.name], ['jpg', 'png'], detection_mode='perceptual')
+        (key, paths), = result.duplicates.items()
+        self.assertEqual({os.path.basename(p) for p in paths},
+                         {'original.jpg', 'small.jpg', 'recompressed.jpg', 'dated.jpg'})
+        self.assertEqual(key.path, self._path('dated.jpg'))
+        self.assertEqual(key.exif_date, '2020:01:02 03:04:05')
+        self.assertEqual(key.size, os.path.getsize(self._path('dated.jpg')))
+
+    def test_bk_tree_matches_linear_scan(self):
+        rng = random.Random(7)
+        values = [rng.getrandbits(64) for _ in range(500)]
+        # Some close neighbours so the radius actually finds something
+        values += [v ^ (1 << rng.randrange(64)) for v in values[:50]]
+        tree = BKTree()
+        for i, v in enumerate(values):
+            tree.add(v, i)
+        self.assertEqual(len(tree), len(values))
+
+        for query in values[:40]:
+            expected = sorted(i for i, v in enumerate(values) if hamming_distance(query, v) <= 8)
+            self.assertEqual(sorted(i for _, i in tree.search(query, 8)), expected)
+
+    def test_storage_round_trip(self):
+        uniques, duplicates = find_duplicates_perceptual(self._items(), self.executor)
+        result = ScanResult(uniques, duplicates, [self.tmp.name], 'jpg', MODE_PERCEPTUAL)
+        filepath = self._path('results.json')
+        self.assertTrue(ScanResultStorage.save_results(result, filepath))
+
+        loaded = ScanResultStorage.load_results(filepath)
+        self.assertIsNone(loaded.hash_algorithm)
+        self.assertEqual(loaded.duplicates, duplicates)
+
+
+if __name__ == '__main__':
+    unittest.main()
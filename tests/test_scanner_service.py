@@ -219,10 +219,28 @@ class TestScanMethod(TestScannerService):
         self.assertTrue(len(log_messages) > 0)
         self.assertTrue(any('Starting processing' in msg for msg in log_messages))
         self.assertTrue(any('Processing complete' in msg for msg in log_messages))
+    
+    @patch('services.ScannerService.ImageData.find_duplicates')
+    def test_folder_status_callback(self, mock_find_duplicates):
+        """Test that per-folder status updates are reported."""
+        mock_find_duplicates.return_value = ([self.img1], {self.img2: {'/a/img2.jpg', '/b/img2.jpg'}})
+        
+        statuses = []
+        self.service.scan(
+            folders=['/test/folder1', '/test/folder2'],
+            ext='jpg',
+            folder_status_callback=lambda folder, status: statuses.append((folder, status))
+        )
+        
+        self.assertIn(('/test/folder1', 'Done (3 files)'), statuses)
+        self.assertIn(('/test/folder2', 'Done (3 files)'), statuses)
+        # Both folders share one worker pool
+        executors = {c[1]['scan_executor'] for c in mock_find_duplicates.call_args_list}
+        self.assertEqual(len(executors), 1)
 
 
 class TestCrossFolderDuplicateDetection(TestScannerService):
-    """Test cross-folder duplicate detection (_merge_folder_results)."""
+    """Test cross-folder duplicate detection (shared GroupingIndex)."""
     
     @patch('services.ScannerService.ImageData.find_duplicates')
     def test_cross_folder_duplicate_detection(self, mock_find_duplicates):
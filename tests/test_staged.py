@@ -0,0 +1,133 @@
+"""
+Unit tests for size-bucketed, staged duplicate detection.
+
+Tests cover:
+- Same duplicate groups as full checksum comparison
+- Unique sizes are never read
+- Checksums answered by the checksum cache are not counted as bytes read
+- Partial-hash collisions that differ in the middle still get a full checksum
+- Keys and strings of unread uniques do not hash them; a merge scan only hashes
+  uniques whose size is in the base result
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from data.cache import ChecksumCache
+from data.ChecksumImageData import ChecksumImageData
+from data.ImageData import ImageData
+from data.ScanStats import ScanStats
+from data.staged import find_duplicates_staged
+from data.workers import ScanExecutor
+from services.ScannerService import ScannerService
+
+
+class TestStagedDetection(unittest.TestCase):
+    """Test cases for find_duplicates_staged."""
+
+    BLOCK = 1024
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.executor = ScanExecutor(max_workers=2)
+        payload = bytes(range(256)) * 40  # 10 KB, larger than two partial blocks
+        middle_changed = payload[:5000] + b'!' + payload[5001:]
+        self.files = {
+            'a.jpg': payload,
+            'b.jpg': payload,
+            'c.jpg': middle_changed,  # same size and same ends as a/b
+            'd.jpg': payload[:-1] + b'!',
+            'unique_size.jpg': b'x' * 123,
+            'small1.jpg': b'small',
+            'small2.jpg': b'small',
+        }
+        for name, data in self.files.items():
+            with open(self._path(name), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _items(self):
+        return [ImageData(self._path(name), 0.0, len(data), name) for name, data in self.files.items()]
+
+    def test_groups_match_checksum_mode(self):
+        stats = ScanStats()
+        uniques, duplicates = find_duplicates_staged(self._items(), self.executor, stats=stats,
+                                                     block_size=self.BLOCK)
+
+        groups = sorted(sorted(os.path.basename(p) for p in paths) for paths in duplicates.values())
+        self.assertEqual(groups, [['a.jpg', 'b.jpg'], ['small1.jpg', 'small2.jpg']])
+        self.assertEqual(sorted(u.filename for u in uniques), ['c.jpg', 'd.jpg', 'unique_size.jpg'])
+        for img in duplicates:
+            self.assertEqual(img.checksum, img.calculate_checksum(img.path))
+
+    def test_bytes_avoided(self):
+        stats = ScanStats()
+        find_duplicates_staged(self._items(), self.executor, stats=stats, block_size=self.BLOCK)
+
+        self.assertEqual(stats.get('bytes_avoided_by_size'), 123)
+        # d.jpg differs in its last block, so it never gets a full read
+        self.assertEqual(stats.get('bytes_avoided_by_partial'), len(self.files['d.jpg']) - 2 * self.BLOCK)
+        # Only a, b and c need the full checksum
+        self.assertEqual(stats.get('bytes_read_full'), 3 * len(self.files['a.jpg']))
+
+    def test_cached_checksums_not_counted_as_read(self):
+        cache = ChecksumCache(self._path('checksums.sqlite'))
+        executor = ScanExecutor(max_workers=2, checksum_cache=cache)
+        try:
+            for expected in (3 * len(self.files['a.jpg']), 0):
+                stats = ScanStats()
+                _, duplicates = find_duplicates_staged(self._items(), executor, stats=stats, block_size=self.BLOCK)
+                self.assertEqual(stats.get('bytes_read_full'), expected)
+                self.assertEqual(len(duplicates), 2)
+        finally:
+            executor.shutdown()
+            cache.close()
+
+    def test_unread_uniques_stay_unhashed(self):
+        uniques, _ = find_duplicates_staged(self._items(), self.executor, block_size=self.BLOCK)
+        unread = [img for img in uniques if os.path.basename(img.path) in ('d.jpg', 'unique_size.jpg')]
+        with patch.object(ChecksumImageData, 'calculate_checksum') as calculate:
+            for img in unread:
+                self.assertIn('checksum=[None]', str(img))
+                self.assertEqual(img.group_key, ('unhashed', img.path))
+        calculate.assert_not_called()
+
+    def test_merge_scan_hashes_only_matching_sizes(self):
+        base_dir = os.path.join(self.tmp.name, 'base')
+        new_dir = os.path.join(self.tmp.name, 'new')
+        os.makedirs(base_dir)
+        os.makedirs(new_dir)
+        Image.new('RGB', (8, 8), (200, 0, 0)).save(os.path.join(base_dir, 'kept.jpg'))
+        shutil.copy2(os.path.join(base_dir, 'kept.jpg'), os.path.join(new_dir, 'again.jpg'))
+        Image.effect_noise((64, 64), 50).save(os.path.join(new_dir, 'other.jpg'))
+        service = ScannerService()
+        base = service.scan([base_dir], 'jpg', detection_mode='staged')
+        self.assertNotEqual(os.path.getsize(os.path.join(new_dir, 'other.jpg')),
+                            os.path.getsize(os.path.join(base_dir, 'kept.jpg')))
+
+        calculate = ChecksumImageData.calculate_checksum
+        with patch.object(ChecksumImageData, 'calculate_checksum', side_effect=calculate) as spy:
+            result = service.scan([new_dir], 'jpg', detection_mode='staged', base_result=base)
+        # again.jpg and kept.jpg share a size and are compared; other.jpg is never read
+        self.assertEqual([os.path.basename(img.path) for img in result.uniques], ['other.jpg'])
+        self.assertEqual(sorted(os.path.basename(c.args[0]) for c in spy.call_args_list), ['again.jpg', 'kept.jpg'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Unit tests for ScanResultStorage's streaming reader and writer.
+
+Tests cover:
+- Round trip of uniques, duplicates, hardlinks and metadata (compact and indented)
+- iter_groups decodes groups across many small read chunks
+- Large or malformed values are read in geometrically growing chunks
+- Files written by the old json.dump(indent=2) writer still load
+- Truncated files are reported as corrupted and failed saves keep the old file
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data import storage
+from data.ChecksumImageData import ChecksumImageData
+from data.ScanResult import ScanResult, MODE_CHECKSUM
+from data.storage import ScanResultStorage
+
+
+def make_result(count=50):
+    uniques = [ChecksumImageData(f'/u/{i}.jpg', 1.5, i, None, None, f'{i:032x}', 'sha256') for i in range(count)]
+    duplicates = {
+        ChecksumImageData(f'/d/{i}.jpg', 2.0, 1000 + i, None, '2020:01:01 00:00:00', f'{i + 10**6:032x}', 'sha256'):
+            {f'/d/{i}.jpg', f'/e/{i} é.jpg'}
+        for i in range(count)
+    }
+    return ScanResult(uniques, duplicates, ['/u', '/d'], 'jpg', MODE_CHECKSUM, timestamp=1234.5,
+                      hash_algorithm='sha256', hardlinks={'/u/0.jpg': {'/x/0.jpg'}})
+
+
+class TestScanResultStorage(unittest.TestCase):
+    """Test cases for ScanResultStorage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'results.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_same_result(self, loaded, result):
+        self.assertEqual(loaded.uniques, result.uniques)
+        self.assertEqual(loaded.duplicates, result.duplicates)
+        self.assertEqual(loaded.hardlinks, result.hardlinks)
+        self.assertEqual(loaded.timestamp, result.timestamp)
+        self.assertEqual(loaded.hash_algorithm, 'sha256')
+
+    def test_round_trip(self):
+        result = make_result()
+        for indent in (None, 2):
+            with self.subTest(indent=indent):
+                self.assertTrue(ScanResultStorage.save_results(result, self.path, indent=indent))
+                self.assert_same_result(ScanResultStorage.load_results(self.path), result)
+        # The output is plain JSON
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['duplicates']), 50)
+
+    def test_iter_groups_small_chunks(self):
+        result = make_result()
+        ScanResultStorage.save_results(result, self.path)
+        with mock.patch.object(storage, '_READ_CHUNK', 7):
+            groups = list(ScanResultStorage.iter_groups(self.path))
+        self.assertEqual(len(groups), 100)
+        self.assertEqual([img for img, paths in groups if len(paths) == 1], result.uniques)
+        self.assertEqual({img: paths for img, paths in groups if len(paths) > 1}, result.duplicates)
+        self.assertEqual(groups[0][0].checksum, f'{0:032x}')
+
+    def test_large_value_read_in_growing_chunks(self):
+        text = json.dumps({'key': 'x' * 10000})
+        for document, expected in ((text, 'x' * 10000), (text[:-3], None)):
+            f = io.StringIO(document)
+            with mock.patch.object(storage, '_READ_CHUNK', 7), mock.patch.object(f, 'read', wraps=f.read) as read:
+                reader = storage._JsonReader(f)
+                reader.expect('{')
+                self.assertEqual(reader.value(), 'key')
+                reader.expect(':')
+                if expected is None:
+                    with self.assertRaises(json.JSONDecodeError):
+                        reader.value()
+                else:
+                    self.assertEqual(reader.value(), expected)
+            # The chunk doubles with the pending value instead of growing by _READ_CHUNK
+            self.assertLess(read.call_count, 20)
+
+    def test_legacy_indented_file(self):
+        result = make_result(3)
+        ScanResultStorage.save_results(result, self.path)
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        self.assert_same_result(ScanResultStorage.load_results(self.path), result)
+
+    def test_truncated_and_failed_saves(self):
+        result = make_result()
+        ScanResultStorage.save_results(result, self.path)
+        with open(self.path, encoding='utf-8') as f:
+            text = f.read()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text[:len(text) // 2])
+        self.assertIsNone(ScanResultStorage.load_results(self.path))
+
+        ScanResultStorage.save_results(result, self.path)
+        broken = make_result()
+        # Not JSON serializable, so the save fails halfway through the duplicates
+        list(broken.duplicates.values())[-1].add(b'/not/a/str')
+        self.assertFalse(ScanResultStorage.save_results(broken, self.path))
+        self.assert_same_result(ScanResultStorage.load_results(self.path), result)
+        self.assertEqual(os.listdir(self.tmp.name), ['results.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
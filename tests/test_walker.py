@@ -0,0 +1,109 @@
+"""
+Unit tests for the scandir-based directory walker.
+
+Tests cover:
+- Extension normalization
+- Multi-extension, case-insensitive matching in a single pass
+- De-duplication of overlapping roots through visited directories
+- Symlinked directories are not followed
+- Hardlinks to one inode are processed once and reported apart from copies
+"""
+
+import os
+import tempfile
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.walker import normalize_extensions, walk_files
+from data.ImageData import collect_paths, find_duplicates
+from data.HardlinkIndex import HardlinkIndex
+from data.ScanStats import ScanStats
+
+
+class TestWalker(unittest.TestCase):
+    """Test cases for walk_files and collect_paths."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        for rel in ('a/one.jpg', 'a/b/two.JPG', 'a/b/three.png', 'a/notes.txt', 'four.jpeg'):
+            with open(os.path.join(self.root, rel), 'wb') as f:
+                f.write(b'x')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _names(self, entries):
+        return sorted(os.path.basename(e.path) for e in entries)
+
+    def test_normalize_extensions(self):
+        self.assertEqual(normalize_extensions('jpg'), frozenset({'.jpg'}))
+        self.assertEqual(normalize_extensions(['JPG', '.png', ' ']), frozenset({'.jpg', '.png'}))
+
+    def test_multiple_extensions_single_pass(self):
+        entries = list(walk_files(self.root, ['jpg', 'png']))
+        self.assertEqual(self._names(entries), ['one.jpg', 'three.png', 'two.JPG'])
+        # Stat information is available on the yielded entries
+        self.assertTrue(all(e.stat().st_size == 1 for e in entries))
+
+    def test_visited_dirs_skip_repeats(self):
+        visited = set()
+        first = collect_paths(self.root, 'jpg', visited)
+        second = collect_paths(os.path.join(self.root, 'a'), 'jpg', visited)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second, [])
+        self.assertTrue(all(os.path.isabs(p) for p in first))
+        self.assertNotIn(first[0], visited)
+
+        # The nested root first: the outer walk skips the directory it already covered
+        visited = set()
+        inner = collect_paths(os.path.join(self.root, 'a'), 'jpg', visited)
+        outer = collect_paths(self.root, 'jpg', visited)
+        self.assertEqual(sorted(inner + outer), sorted(first))
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "symlinks not supported")
+    def test_symlinked_directories_not_followed(self):
+        try:
+            os.symlink(os.path.join(self.root, 'a'), os.path.join(self.root, 'a', 'b', 'loop'))
+        except OSError:
+            self.skipTest("cannot create symlinks")
+        entries = list(walk_files(self.root, 'jpg'))
+        self.assertEqual(self._names(entries), ['one.jpg', 'two.JPG'])
+
+
+    @unittest.skipUnless(hasattr(os, 'link'), "hardlinks not supported")
+    def test_hardlinks_processed_once(self):
+        from PIL import Image
+        original = os.path.join(self.root, 'a', 'photo.jpg')
+        Image.new('RGB', (8, 8), 'red').save(original)
+        try:
+            os.link(original, os.path.join(self.root, 'a', 'b', 'link.jpg'))
+        except OSError:
+            self.skipTest("cannot create hardlinks")
+        with open(original, 'rb') as src, open(os.path.join(self.root, 'copy.jpg'), 'wb') as dst:
+            dst.write(src.read())
+
+        index = HardlinkIndex()
+        stats = ScanStats()
+        uniques, duplicates = find_duplicates([self.root], 'jpg', use_checksum=True, stats=stats,
+                                              hardlink_index=index)
+
+        # The copy is a duplicate, the link is not part of the groups at all
+        self.assertEqual(len(duplicates), 1)
+        paths = next(iter(duplicates.values()))
+        self.assertEqual(len(paths), 2)
+        self.assertIn(os.path.join(self.root, 'copy.jpg'), paths)
+        self.assertEqual(index.link_count, 1)
+        primary, links = next(iter(index.links.items()))
+        self.assertIn(primary, paths)
+        self.assertEqual(stats.get('hashed_files'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,317 @@
+"""
+Unit tests for the watch mode.
+
+Tests cover:
+- LiveGroupingIndex removes and replaces files and re-keys groups whose key file is gone
+- HardlinkIndex hands a removed primary's identity on to a remaining link
+- InotifyWatcher reports created, written, moved and deleted files and directories
+- PollingWatcher reports the same changes by comparing walks
+- InotifyWatcher.rewatch watches directories whose creation was missed
+- WatchService publishes group deltas for copies, edits and deletions (with both watchers)
+- WatchService indexes a surviving hardlink once its primary path is deleted
+- WatchService re-processes the primary path of files written through any of their hardlinks
+"""
+
+import os
+import queue
+import shutil
+import tempfile
+import time
+import unittest
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from data.ChecksumImageData import ChecksumImageData
+from data.HardlinkIndex import HardlinkIndex
+from data.LiveGroupingIndex import LiveGroupingIndex
+from data.watchers import InotifyWatcher, PollingWatcher, _load_libc, EVENT_CHANGED, EVENT_REMOVED
+from services.WatchService import WatchService
+
+HAS_INOTIFY = _load_libc() is not None
+
+
+def item(path, digest, size=10):
+    return ChecksumImageData(path, None, size, None, None, digest)
+
+
+def collect(watcher, until, timeout=5.0):
+    """Read events until until(events) holds or the timeout passes."""
+    events = []
+    deadline = time.monotonic() + timeout
+    while not until(events) and time.monotonic() < deadline:
+        events.extend(watcher.read_events(0.2))
+    return events
+
+
+class TestLiveGroupingIndex(unittest.TestCase):
+    """Test cases for LiveGroupingIndex."""
+
+    def test_remove_and_rekey(self):
+        index = LiveGroupingIndex()
+        for path in ('/a/1.jpg', '/b/1.jpg', '/c/1.jpg'):
+            index.add(item(path, 'aa' * 16))
+        index.add(item('/a/2.jpg', 'bb' * 16))
+        key = item('/x', 'aa' * 16).group_key
+
+        self.assertEqual(index.remove('/a/1.jpg').path, '/a/1.jpg')
+        img_data, paths = index.group(key)
+        self.assertEqual(paths, {'/b/1.jpg', '/c/1.jpg'})
+        self.assertIn(img_data.path, paths)
+
+        index.remove('/b/1.jpg')
+        self.assertEqual(index.group(key)[1], {'/c/1.jpg'})
+        self.assertIn('/c/1.jpg', [img.path for img in index.uniques()])
+        self.assertIsNone(index.remove('/b/1.jpg'))
+        index.remove('/c/1.jpg')
+        self.assertIsNone(index.group(key))
+        self.assertEqual(len(index), 1)
+
+    def test_replace_and_paths_under(self):
+        index = LiveGroupingIndex()
+        index.add(item('/a/1.jpg', 'aa' * 16))
+        index.add(item('/a/sub/2.jpg', 'aa' * 16))
+        # The file was edited: it moves to another group
+        index.add(item('/a/1.jpg', 'cc' * 16))
+        self.assertEqual(index.duplicates(), {})
+        self.assertEqual(len(index), 2)
+        self.assertEqual(sorted(index.paths_under('/a')), ['/a/1.jpg', '/a/sub/2.jpg'])
+        self.assertEqual(index.paths_under('/a/sub'), ['/a/sub/2.jpg'])
+        with self.assertRaises(ValueError):
+            index.add(item('/a/3.jpg', 'aa' * 16), {'/a/3.jpg', '/a/4.jpg'})
+
+
+class TestHardlinkRelease(unittest.TestCase):
+    """Test cases for HardlinkIndex.release."""
+
+    def test_release(self):
+        links = HardlinkIndex()
+        st = os.stat_result((0o644, 7, 1, 3, 0, 0, 10, 0, 0, 0))  # inode 7 on device 1, three links
+        self.assertTrue(links.claim('/a/1.jpg', st))
+        self.assertFalse(links.claim('/b/1.jpg', st))
+        self.assertFalse(links.claim('/c/1.jpg', st))
+
+        self.assertEqual(links.primary_of('/c/1.jpg', st), '/a/1.jpg')
+        self.assertIsNone(links.primary_of('/c/1.jpg', os.stat_result((0o644, 8, 1, 1, 0, 0, 10, 0, 0, 0))))
+        self.assertIsNone(links.release('/c/1.jpg'))
+        self.assertNotIn('/c/1.jpg', links)
+        self.assertEqual(links.links, {'/a/1.jpg': {'/b/1.jpg'}})
+        self.assertEqual(links.release('/a/1.jpg'), '/b/1.jpg')
+        self.assertEqual(links.links, {})
+        self.assertEqual(links.paths_under('/b'), ['/b/1.jpg'])
+        self.assertIsNone(links.release('/b/1.jpg'))
+        # Forgotten: a new file on the inode is claimed again
+        self.assertTrue(links.claim('/d/1.jpg', st))
+        self.assertIsNone(links.release('/never/claimed.jpg'))
+
+
+class WatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, 'in'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts):
+        path = os.path.join(self.root, *parts)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(64))
+        return path
+
+
+@unittest.skipUnless(HAS_INOTIFY, "inotify is not available")
+class TestInotifyWatcher(WatcherTestCase):
+    """Test cases for InotifyWatcher."""
+
+    def test_events(self):
+        watcher = InotifyWatcher([self.root], 'jpg')
+        try:
+            new = self.write('in', 'a.jpg')
+            self.write('in', 'ignored.txt')
+            events = collect(watcher, lambda e: (EVENT_CHANGED, new) in e)
+            self.assertIn((EVENT_CHANGED, new), events)
+            self.assertFalse([path for _, path in events if path.endswith('.txt')])
+
+            # A directory moved in is watched, and its files are reported
+            outside = self.tmp.name + '_outside'
+            os.makedirs(os.path.join(outside, 'deep'))
+            with open(os.path.join(outside, 'deep', 'b.jpg'), 'wb') as f:
+                f.write(b'x')
+            moved = os.path.join(self.root, 'moved')
+            shutil.move(outside, moved)
+            moved_file = os.path.join(moved, 'deep', 'b.jpg')
+            self.assertIn((EVENT_CHANGED, moved_file), collect(watcher, lambda e: (EVENT_CHANGED, moved_file) in e))
+            later = self.write('moved', 'deep', 'c.jpg')
+            self.assertIn((EVENT_CHANGED, later), collect(watcher, lambda e: (EVENT_CHANGED, later) in e))
+
+            os.remove(new)
+            shutil.rmtree(moved)
+            events = collect(watcher, lambda e: (EVENT_REMOVED, moved) in e)
+            self.assertIn((EVENT_REMOVED, new), events)
+            self.assertIn((EVENT_REMOVED, moved), events)
+            self.assertEqual(watcher.watch_count, 2)
+
+            # A directory whose creation was missed (e.g. queue overflow) is watched again
+            os.makedirs(os.path.join(self.root, 'lost'))
+            collect(watcher, lambda e: False, timeout=0.3)
+            watcher._unwatch_tree(os.path.join(self.root, 'lost'))
+            self.assertEqual(watcher.watch_count, 2)
+            watcher.rewatch(self.root)
+            self.assertEqual(watcher.watch_count, 3)
+            found = self.write('lost', 'd.jpg')
+            self.assertIn((EVENT_CHANGED, found), collect(watcher, lambda e: (EVENT_CHANGED, found) in e))
+
+            # interrupt() wakes up a blocking read
+            watcher.interrupt()
+            self.assertEqual(watcher.read_events(), [])
+        finally:
+            watcher.close()
+
+
+class TestPollingWatcher(WatcherTestCase):
+    """Test cases for PollingWatcher."""
+
+    def test_events(self):
+        existing = self.write('in', 'old.jpg')
+        watcher = PollingWatcher([self.root], 'jpg', interval=0.05)
+        self.assertEqual(watcher.read_events(), [])
+        self.assertEqual(watcher.read_events(0.01), [])
+
+        new = self.write('in', 'new.jpg')
+        os.remove(existing)
+        self.assertEqual(sorted(watcher.read_events()), [(EVENT_CHANGED, new), (EVENT_REMOVED, existing)])
+        watcher.interrupt()
+        self.assertEqual(watcher.read_events(), [])
+
+
+class TestWatchService(WatcherTestCase):
+    """Test cases for WatchService."""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            Image.new('RGB', (8, 8), (i * 60, 0, 0)).save(os.path.join(self.root, 'in', f'{i}.jpg'))
+
+    def watch(self, use_inotify):
+        service = WatchService([self.root], 'jpg', settle_time=0.1, poll_interval=0.1, use_inotify=use_inotify)
+        deltas = queue.Queue()
+        service.subscribe(deltas.put)
+        service.start()
+        self.assertTrue(service.wait_ready(10))
+        self.addCleanup(service.stop)
+        return service, deltas
+
+    def check_service(self, use_inotify):
+        service, deltas = self.watch(use_inotify)
+        self.assertEqual(len(deltas.get(timeout=10)), 3)
+
+        copy = os.path.join(self.root, 'in', 'copy.jpg')
+        shutil.copy2(os.path.join(self.root, 'in', '1.jpg'), copy)
+        batch = deltas.get(timeout=10)
+        self.assertEqual(len(batch), 1)
+        self.assertTrue(batch[0].is_duplicate)
+        self.assertEqual(batch[0].paths, {copy, os.path.join(self.root, 'in', '1.jpg')})
+        self.assertEqual(service.result().duplicate_groups_count, 1)
+
+        # The copy is edited: the duplicate group splits again and a new group appears
+        time.sleep(0.01)
+        Image.new('RGB', (8, 8), (0, 0, 255)).save(copy)
+        batch = deltas.get(timeout=10)
+        self.assertEqual(sorted(len(delta.paths) for delta in batch), [1, 1])
+        self.assertEqual(service.result().duplicate_groups_count, 0)
+
+        os.remove(copy)
+        batch = deltas.get(timeout=10)
+        self.assertEqual(len(batch), 1)
+        self.assertTrue(batch[0].removed)
+        self.assertEqual(service.result().total_files_scanned, 3)
+
+    def test_inotify(self):
+        if not HAS_INOTIFY:
+            self.skipTest("inotify is not available")
+        self.check_service(use_inotify=True)
+
+    def test_polling(self):
+        self.check_service(use_inotify=False)
+
+    def check_hardlinks(self, use_inotify):
+        primary = os.path.join(self.root, 'in', '0.jpg')
+        link = os.path.join(self.root, 'in', 'link.jpg')
+        os.link(primary, link)
+        service, deltas = self.watch(use_inotify)
+        self.assertEqual(len(deltas.get(timeout=10)), 3)
+        self.assertEqual(service.result().hardlink_count, 1)
+
+        os.remove(primary)
+        batches = [deltas.get(timeout=10)]
+        while link not in service.index:
+            batches.append(deltas.get(timeout=10))
+        paths = [delta.paths for batch in batches for delta in batch]
+        self.assertIn({link}, paths)
+        self.assertEqual(service.result().total_files_scanned, 3)
+        self.assertEqual(service.result().hardlink_count, 0)
+
+        # The inode is no longer claimed by the deleted path, new links to it are recognized
+        again = os.path.join(self.root, 'in', 'again.jpg')
+        os.link(link, again)
+        os.remove(link)
+        while again not in service.index:
+            deltas.get(timeout=10)
+        self.assertEqual(service.result().total_files_scanned, 3)
+
+    def test_hardlinks_inotify(self):
+        if not HAS_INOTIFY:
+            self.skipTest("inotify is not available")
+        self.check_hardlinks(use_inotify=True)
+
+    def test_hardlinks_polling(self):
+        self.check_hardlinks(use_inotify=False)
+
+    def check_hardlink_writes(self, use_inotify):
+        first = os.path.join(self.root, 'in', '0.jpg')
+        second = os.path.join(self.root, 'in', 'link.jpg')
+        os.link(first, second)
+        service, deltas = self.watch(use_inotify)
+        self.assertEqual(len(deltas.get(timeout=10)), 3)
+        primary, link = (first, second) if first in service.index else (second, first)
+
+        # Written through either path, in place: the group follows the new content, the link stays a link
+        for i, target in enumerate((link, primary)):
+            time.sleep(0.01)
+            Image.new('RGB', (8, 8), (0, 255, i * 100)).save(target)
+            expected = ChecksumImageData.calculate_checksum(target)
+            while service.index.get(primary).checksum != expected:
+                deltas.get(timeout=10)
+            self.assertEqual(service.result().hardlinks, {primary: {link}})
+
+        # A touch of the primary keeps the link as well
+        os.utime(primary, ns=(1_000_000_000, 1_000_000_000))
+        while service.index.get(primary).mtime_ns != 1_000_000_000:
+            deltas.get(timeout=10)
+        self.assertEqual(service.result().hardlinks, {primary: {link}})
+        self.assertNotIn(link, service.index)
+        self.assertEqual(service.result().total_files_scanned, 3)
+
+    def test_hardlink_writes_inotify(self):
+        if not HAS_INOTIFY:
+            self.skipTest("inotify is not available")
+        self.check_hardlink_writes(use_inotify=True)
+
+    def test_hardlink_writes_polling(self):
+        self.check_hardlink_writes(use_inotify=False)
+
+    def test_unsupported_mode(self):
+        with self.assertRaises(ValueError):
+            WatchService([self.root], 'jpg', detection_mode='perceptual')
+
+
+if __name__ == '__main__':
+    unittest.main()
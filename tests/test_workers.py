@@ -0,0 +1,180 @@
+"""
+Unit tests for the executor backends in data.workers.
+
+Tests cover:
+- Compact record tuples from every backend
+- Unknown backend names are rejected
+- Cancellation reaching process-pool workers through shared events
+- Hybrid mode: split worker budget, futures resolved when shutdown cancels reads,
+  EXIF found past the bytes read by the I/O threads
+- Bounded number of in-flight files in the find_duplicates pipeline
+- Checksums computed once, by the workers, with separate stage timing
+"""
+
+import concurrent.futures
+import os
+import struct
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+from data.ImageData import ProcessingCancelled, find_duplicates
+from data.ChecksumImageData import ChecksumImageData
+from data.ScanStats import ScanStats
+from data.workers import EXECUTOR_BACKENDS, HEADER_READ_SIZE, ScanExecutor, extract_record
+from services.ScannerService import ScannerService
+
+
+class TestScanExecutor(unittest.TestCase):
+    """Test cases for ScanExecutor."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'img.jpg')
+        Image.new('RGB', (8, 8), 'blue').save(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backends_return_records(self):
+        st = os.stat(self.path)
+        for backend in EXECUTOR_BACKENDS:
+            with self.subTest(backend=backend):
+                executor = ScanExecutor(backend, max_workers=2)
+                try:
+                    record = executor.submit(self.path, st, use_checksum=True).result(timeout=30)
+                finally:
+                    executor.shutdown()
+                self.assertIsInstance(record, tuple)
+                self.assertEqual(record[:3], (self.path, st.st_mtime_ns, st.st_size))
+                # Workers hash eagerly on every backend
+                self.assertEqual(len(record[4]), 32)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            ScanExecutor('gpu')
+
+    def test_cancel_reaches_process_workers(self):
+        service = ScannerService()
+        executor = ScanExecutor('processes', max_workers=1, controller=service)
+        try:
+            service.cancel()
+            future = executor.submit(self.path)
+            with self.assertRaises(ProcessingCancelled):
+                future.result(timeout=30)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def test_hybrid_splits_worker_budget(self):
+        executor = ScanExecutor('hybrid', max_workers=4)
+        try:
+            self.assertEqual(executor._threads._max_workers + executor._processes._max_workers, 4)
+        finally:
+            executor.shutdown()
+
+    def test_hybrid_futures_resolve_on_shutdown(self):
+        executor = ScanExecutor('hybrid', max_workers=2)
+        with patch('data.workers.read_header', side_effect=lambda path: time.sleep(0.2)):
+            futures = [executor.submit(self.path) for _ in range(6)]
+            executor.shutdown(cancel_futures=True)
+        _, not_done = concurrent.futures.wait(futures, timeout=30)
+        self.assertEqual(not_done, set())
+        self.assertTrue(any(future.cancelled() for future in futures))
+        # Every in-flight slot was given back
+        self.assertEqual(executor._slots._value, executor.max_pending)
+
+    def test_exif_past_header_read(self):
+        date = b'2020:01:02 03:04:05\x00'
+        tiff = (b'MM\x00*' + struct.pack('>I', 8) + struct.pack('>H', 1) +
+                struct.pack('>HHII', 0x9003, 2, len(date), 26) + struct.pack('>I', 0) + date)
+        app1 = b'Exif\x00\x00' + tiff
+        path = os.path.join(self.tmp.name, 'big_icc.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'\xff\xd8')
+            # Large APP2 segments (e.g. an ICC profile) push APP1 past the header read
+            for _ in range(3):
+                f.write(b'\xff\xe2' + struct.pack('>H', 0xFFFF) + b'\0' * (0xFFFF - 2))
+            f.write(b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1)
+            f.write(b'\xff\xda' + struct.pack('>H', 2) + b'\xff\xd9')
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_READ_SIZE)
+        record = extract_record(path, header=header)
+        self.assertEqual(record[3], '2020:01:02 03:04:05')
+
+
+class BoundedRecorder:
+    """Fake executor that finishes tasks on a timer and records the peak number in flight."""
+
+    max_pending = 3
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def submit(self, abs_path, statinfo=None, use_checksum=False, hash_algorithm=None):
+        future = concurrent.futures.Future()
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+        def finish():
+            with self.lock:
+                self.in_flight -= 1
+            future.set_result((abs_path, statinfo.st_mtime_ns, statinfo.st_size, None, None))
+
+        threading.Timer(0.005, finish).start()
+        return future
+
+
+class TestStreamingPipeline(unittest.TestCase):
+    """Test the bounded producer/consumer pipeline of find_duplicates."""
+
+    def test_in_flight_work_is_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(20):
+                with open(os.path.join(tmp, f'img{i}.jpg'), 'wb') as f:
+                    f.write(b'x' * i)
+
+            executor = BoundedRecorder()
+            uniques, duplicates = find_duplicates([tmp], 'jpg', scan_executor=executor)
+
+        self.assertEqual(len(uniques), 20)
+        self.assertEqual(duplicates, {})
+        self.assertLessEqual(executor.peak, BoundedRecorder.max_pending)
+
+    def test_checksums_arrive_precomputed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('a.jpg', 'b.jpg'):
+                Image.new('RGB', (8, 8), 'green').save(os.path.join(tmp, name))
+
+            stats = ScanStats()
+            hashing_threads = set()
+            real_hash = ChecksumImageData.calculate_checksum
+
+            def tracking_hash(*args, **kwargs):
+                hashing_threads.add(threading.current_thread())
+                return real_hash(*args, **kwargs)
+
+            with patch('data.ChecksumImageData.ChecksumImageData.calculate_checksum',
+                       side_effect=tracking_hash) as mock_hash:
+                uniques, duplicates = find_duplicates([tmp], 'jpg', use_checksum=True, stats=stats)
+
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(mock_hash.call_count, 2)
+        self.assertNotIn(threading.current_thread(), hashing_threads)
+        self.assertEqual(stats.get('hashed_files'), 2)
+        self.assertGreater(stats.get('hash_seconds'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 
 import tkinter as tk
-from tkinter import messagebox, filedialog, scrolledtext
+from tkinter import messagebox, filedialog, scrolledtext, simpledialog
 import threading
 import os
 import sys
@@ -11,9 +11,12 @@ from .components.ResultsPanel import ResultsPanel
 from .components.AnimationPanel import AnimationPanel
 from services.ScannerService import ScannerService
 from services.CopyService import CopyService
+from services.WatchService import WatchService
 from data import ImageData
-from data.ScanResult import ScanResult
+from data.ScanResult import ScanResult, MODE_CHECKSUM, MODE_METADATA
 from data.storage import ScanResultStorage
+from data.binary_format import BINARY_EXTENSION
+from data.cache import MetadataCache, ChecksumCache
 
 class MainWindow(tk.Tk):
     def __init__(self):
@@ -24,6 +27,9 @@ class MainWindow(tk.Tk):
         # Services
         self.scanner_service = ScannerService()
         self.copy_service = CopyService()
+        self.watch_service = None
+        self.metadata_cache = MetadataCache()
+        self.checksum_cache = ChecksumCache()
         
         self.current_scan_result = None
         
@@ -42,6 +48,9 @@ class MainWindow(tk.Tk):
         file_menu.add_command(label="Import scan result", command=self._load_results)
         file_menu.add_command(label="Export scan result", command=self._save_results)
         file_menu.add_separator()
+        file_menu.add_command(label="Add scan result to catalog", command=self._save_to_catalog)
+        file_menu.add_command(label="Find checksum in catalog", command=self._find_in_catalog)
+        file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.quit)
         
         # Actions Menu
@@ -55,6 +64,8 @@ class MainWindow(tk.Tk):
         actions_menu.add_separator()
         self.pause_menu_item = actions_menu.add_command(label="Pause", command=self._toggle_pause, state=tk.DISABLED)
         self.cancel_menu_item = actions_menu.add_command(label="Cancel", command=self._cancel_processing, state=tk.DISABLED)
+        actions_menu.add_separator()
+        self.watch_menu_item = actions_menu.add_command(label="Watch folders", command=self._toggle_watch)
         
         # Store menu references for state management
         self.actions_menu = actions_menu
@@ -183,6 +194,9 @@ class MainWindow(tk.Tk):
                 
             def log_cb(msg):
                 self.after(0, lambda m=msg: self._log(m))
+                
+            def folder_status_cb(folder, status):
+                self.after(0, lambda f=folder, st=status: self.folder_panel.update_status(f, st))
 
             self._log(f"Base result {base_result}")
             result = self.scanner_service.scan(
@@ -191,7 +205,10 @@ class MainWindow(tk.Tk):
                 use_checksum=use_checksum,
                 progress_callback=progress_cb,
                 log_callback=log_cb,
-                base_result=base_result
+                base_result=base_result,
+                metadata_cache=self.metadata_cache,
+                checksum_cache=self.checksum_cache,
+                folder_status_callback=folder_status_cb
             )
             self._log(f"Scan result {result}")
 
@@ -227,6 +244,7 @@ class MainWindow(tk.Tk):
         self.actions_menu.entryconfig(1, state=state)  # Merge with Result
         self.actions_menu.entryconfig(2, state=state)  # Generate Report
         self.actions_menu.entryconfig(3, state=state)  # Archive distinct images
+        self.actions_menu.entryconfig(8, state=state)  # Watch folders
         
         # Enable/disable pause and cancel during processing
         self.actions_menu.entryconfig(5, state=ctrl_state)  # Pause
@@ -245,6 +263,40 @@ class MainWindow(tk.Tk):
             self.actions_menu.entryconfig(5, label="Resume")
             self.status_label.config(text="Paused")
 
+    def _toggle_watch(self):
+        if self.watch_service:
+            self.watch_service.stop(wait=False)
+            # Keep the last live state for export, report and copy
+            self.current_scan_result = self.watch_service.result()
+            self.watch_service = None
+            self.actions_menu.entryconfig(0, state=tk.NORMAL)  # Scan files
+            self.actions_menu.entryconfig(1, state=tk.NORMAL)  # Merge with Result
+            self.actions_menu.entryconfig(8, label="Watch folders")
+            self.status_label.config(text="Watch stopped")
+            return
+        
+        folders = self.folder_panel.get_folders()
+        if not folders:
+            messagebox.showwarning("Warning", "Please add at least one folder.")
+            return
+        extensions = self.control_panel.get_extension()
+        if not extensions:
+            messagebox.showwarning("Warning", "Please specify valid file extension(s). Check the validation message.")
+            return
+        detection_mode = MODE_CHECKSUM if self.control_panel.get_use_checksum() else MODE_METADATA
+        
+        self.results_panel.custom_clear()
+        self.watch_service = WatchService(folders, extensions, detection_mode=detection_mode,
+                                          metadata_cache=self.metadata_cache, checksum_cache=self.checksum_cache)
+        # Deltas arrive on the watch thread; the list is updated on the Tk thread
+        self.watch_service.subscribe(lambda deltas: self.after(0, lambda d=deltas: self.results_panel.apply_delta(d)))
+        # A scan would replace the live results, so scans wait until the watch is stopped
+        self.actions_menu.entryconfig(0, state=tk.DISABLED)  # Scan files
+        self.actions_menu.entryconfig(1, state=tk.DISABLED)  # Merge with Result
+        self.actions_menu.entryconfig(8, label="Stop watching")
+        self.status_label.config(text="Watching folders...")
+        self.watch_service.start(log_callback=lambda msg: self.after(0, lambda m=msg: self._log(m)))
+
     def _cancel_processing(self):
         self.scanner_service.cancel()
         self.copy_service.cancel() # Try cancel copy if running
@@ -257,7 +309,7 @@ class MainWindow(tk.Tk):
             
         filepath = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            filetypes=[("JSON files", "*.json"), ("Binary results", f"*{BINARY_EXTENSION}")]
         )
         if not filepath: return
         
@@ -270,7 +322,8 @@ class MainWindow(tk.Tk):
     def _load_results(self):
         filepath = filedialog.askopenfilename(
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            filetypes=[("Scan results", f"*.json *{BINARY_EXTENSION}"), ("JSON files", "*.json"),
+                       ("Binary results", f"*{BINARY_EXTENSION}")]
         )
         if not filepath: return
         
@@ -283,6 +336,33 @@ class MainWindow(tk.Tk):
         else:
             messagebox.showerror("Error", "Failed to load results.")
 
+    def _save_to_catalog(self):
+        if not self.current_scan_result:
+            messagebox.showinfo("Info", "No results to add.")
+            return
+        
+        scan_id = ScanResultStorage.save_to_catalog(self.current_scan_result)
+        if scan_id is not None:
+            self._log(f"Added scan result to catalog as scan {scan_id}")
+        else:
+            messagebox.showerror("Error", "Failed to add results to catalog.")
+
+    def _find_in_catalog(self):
+        digest = simpledialog.askstring("Find in catalog", "Checksum (hex):", parent=self)
+        if not digest: return
+        
+        try:
+            bytes.fromhex(digest.strip())
+        except ValueError:
+            messagebox.showerror("Error", "Not a hexadecimal checksum.")
+            return
+        groups = ScanResultStorage.query_catalog(digest=digest.strip(), limit=100)
+        self._log(f"Catalog: {len(groups)} groups with checksum {digest.strip()}")
+        for scan_id, img_data, paths in groups:
+            self._log(f"  scan {scan_id}: {img_data.filename} ({len(paths)} files)")
+            for path in sorted(paths):
+                self._log(f"    {path}")
+
     def _auto_load_results(self):
         """Automatically load results from default storage if available."""
         if ScanResultStorage.storage_exists():
@@ -356,6 +436,7 @@ class MainWindow(tk.Tk):
             "=== Dataset Report ===",
             f"Total Files Scanned: {res.total_files_scanned}",
             f"Duplicate Groups: {res.duplicate_groups_count}",
+            f"Hardlinked Paths (not copies): {res.hardlink_count}",
             f"Detection Mode: {res.detection_mode}",
             f"Scan Time: {res.timestamp}"
         ]
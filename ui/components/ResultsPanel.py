@@ -1,4 +1,5 @@
 
+import bisect
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 from PIL import Image, ImageTk
@@ -42,14 +43,18 @@ class ResultsPanel(tk.Frame):
         self.preview_label.pack(fill=tk.BOTH, expand=True)
         self.paned_window.add(preview_frame)
         
-        self.duplicates_data = {} # Map Index -> (ImageData, [paths])
+        self.duplicates_data = [] # Row -> (ImageData, paths or None for unique items)
+        self._rows = [] # Row -> (label, repr of the group key), sorted like the list
+        self._labels = {} # repr of the group key -> label, for the live updates of apply_delta
         self.tk_image = None # Keep reference
 
     def custom_clear(self):
         self.groups_list.delete(0, tk.END)
         self.details_text.delete(1.0, tk.END)
         self.preview_label.config(image="", text="No Preview")
-        self.duplicates_data = {}
+        self.duplicates_data = []
+        self._rows = []
+        self._labels = {}
 
     def populate(self, scan_result):
         self.custom_clear()
@@ -66,36 +71,91 @@ class ResultsPanel(tk.Frame):
         stats_text = (f"Scan: {ts_str} | Mode: {mode} | "
                       f"Total Files: {scan_result.total_files_scanned} | "
                       f"Duplicate Groups: {scan_result.duplicate_groups_count}")
+        if scan_result.hardlink_count:
+            stats_text += f" | Hardlinks: {scan_result.hardlink_count}"
         self.stats_label.config(text=stats_text, font=("Arial", 9, "bold"), fg="black")
 
         # Collect all items to display
-        # List of tuples: (displayed_text, ImageData, paths_list_or_None)
+        # List of tuples: (ImageData, paths_or_None)
         items = []
 
         # Add duplicates
         for img_data, paths in scan_result.duplicates.items():
-            items.append((f"{img_data.filename} ({len(paths)} copies)", img_data, paths))
+            items.append((img_data, paths))
 
         # Add uniques (if any are explicitly interesting, e.g. from merge)
         # Note: In standard scan, uniques are usually not shown in this list. 
         # But user requested "list of scan result items". 
         # For Merge scan, 'uniques' are the result.
         for img_data in scan_result.uniques:
-            items.append((f"{img_data.filename}", img_data, None))
+            items.append((img_data, None))
 
+        self._fill(items)
+
+    def apply_delta(self, deltas):
+        """
+        Apply GroupDelta updates (see services.WatchService) to the list.
+        
+        Only the rows of changed groups are touched, so the list stays usable
+        while a watch updates it. Must be called on the Tk thread.
+        """
+        if len(deltas) > len(self._rows):
+            # Larger than the list itself (e.g. the initial state): rebuild it once
+            groups = {row_key: item for (_, row_key), item in zip(self._rows, self.duplicates_data)}
+            for delta in deltas:
+                if delta.removed:
+                    groups.pop(repr(delta.key), None)
+                else:
+                    groups[repr(delta.key)] = (delta.img_data, delta.paths if delta.is_duplicate else None)
+            self.custom_clear()
+            self._fill(list(groups.values()))
+        else:
+            if not self._rows:
+                self.groups_list.delete(0, tk.END) # Drop the empty message
+            for delta in deltas:
+                row_key = repr(delta.key)
+                old_label = self._labels.pop(row_key, None)
+                if old_label is not None:
+                    row = bisect.bisect_left(self._rows, (old_label, row_key))
+                    del self._rows[row]
+                    del self.duplicates_data[row]
+                    self.groups_list.delete(row)
+                if delta.removed:
+                    continue
+                paths = delta.paths if delta.is_duplicate else None
+                label = self._label(delta.img_data, paths)
+                row = bisect.bisect_left(self._rows, (label, row_key))
+                self._rows.insert(row, (label, row_key))
+                self.duplicates_data.insert(row, (delta.img_data, paths))
+                self.groups_list.insert(row, label)
+                self._labels[row_key] = label
+            if not self._rows:
+                self._show_empty_message()
+
+        files = sum(len(paths) if paths else 1 for _, paths in self.duplicates_data)
+        groups_count = sum(1 for _, paths in self.duplicates_data if paths)
+        self.stats_label.config(text=f"Live | Total Files: {files} | Duplicate Groups: {groups_count}",
+                                font=("Arial", 9, "bold"), fg="black")
+
+    def _label(self, img_data, paths):
+        return f"{img_data.filename} ({len(paths)} copies)" if paths else f"{img_data.filename}"
+
+    def _fill(self, items):
+        """Show (ImageData, paths or None) items sorted by label."""
         if not items:
             self._show_empty_message()
             return
             
-        # Sort items by filename
-        items.sort(key=lambda x: x[0])
+        # Sort items by filename (ties by group, so apply_delta can find rows by bisection)
+        rows = sorted((((self._label(img_data, paths), repr(img_data.group_key)), img_data, paths)
+                       for img_data, paths in items), key=lambda row: row[0])
 
-        idx = 0
-        for label, img_data, paths in items:
+        for (label, row_key), img_data, paths in rows:
             self.groups_list.insert(tk.END, label)
             # Store data: (ImageData, paths) -> paths is None for unique items
-            self.duplicates_data[idx] = (img_data, paths)
-            idx += 1
+            self.duplicates_data.append((img_data, paths))
+            self._rows.append((label, row_key))
+            self._labels[row_key] = label
             
     def _show_empty_message(self):
         self.groups_list.insert(tk.END, "[No items found]")
@@ -107,7 +167,7 @@ class ResultsPanel(tk.Frame):
             return
         
         index = selection[0]
-        if index in self.duplicates_data:
+        if index < len(self.duplicates_data):
             img_data, paths = self.duplicates_data[index]
             self._show_details(img_data, paths)
             